@@ -1,5 +1,9 @@
 #!/bin/bash
 
+# Crawls the results; with extract_data_all.py recording the run state,
+# the same list is one query:
+# python src/autosim/ssm/run_state.py -d run_state.sqlite incomplete -s extract
+
 # File containing list of .inp filenames
 input_list="abaqus_mesh/mesh_list_run1.txt"
 
@@ -7,13 +11,13 @@ while read inp_file; do
     # Remove ".inp" extension
     basename="${inp_file%.inp}"
 
-    # Path to the 95th percentile file
-    txt_file="simulation_results/${basename}/${basename}_strain_percentiles_95.txt"
+    # Path to the header of the results, see postproc/result_store.py
+    header_file="simulation_results/${basename}/${basename}_results/header.json"
 
     # Check if file exists
-    if [[ -f "$txt_file" ]]; then
-        # Count number of lines (skip header if present)
-        num_lines=$(grep -cv '^#' "$txt_file")
+    if [[ -f "$header_file" ]]; then
+        # Number of frames
+        num_lines=$(grep -o '"n_frames": [0-9]*' "$header_file" | grep -o '[0-9]*$')
 
         if [[ $num_lines -lt 81 ]]; then
             echo "$basename"
@@ -1,17 +1,254 @@
+"""Extract the results of every simulation of a mesh list, concurrently.
+
+Every subject is one abaqus python run of
+extract_data_strain_vs_strain_rate.py, at most as many at once as the cores
+and the Abaqus license tokens allow (concurrency).  A subject whose results
+(result_store.py) are newer than its .odb is skipped, unless forced.  The
+output of every run is logged to simulation_results/<b>/<b>_extract.log,
+its wall time and outcome are printed as it finishes, recorded in the run
+state of the campaign, and summarized at the end.
+
+To run, from the repository root, e.g., with 8 license tokens of which an
+extraction takes one:
+source ~/autotwin/autosim/.venv/bin/activate
+python postproc/extract_data_all.py -l abaqus_mesh/mesh_list_run1.txt -t 8
+"""
+
+import argparse
+import os
+import time
+from pathlib import Path
+
 import numpy as np
-import subprocess
 
-# Load list of input filenames
-input_list = np.loadtxt("abaqus_mesh/mesh_list_run1.txt", dtype=str)
+from autosim.ssm.executor import Job, failure_summary, run_jobs
+from autosim.ssm.run_state import DONE, FAILED, connect, record_stage
+from result_store import HEADER, read_results, results_folder
+
+N_FRAMES = 81  # frames of complete results
+EXTRACT_SCRIPT = "postproc/extract_data_strain_vs_strain_rate.py"
+COMMAND = ["abaqus", "python", EXTRACT_SCRIPT]
+
+
+def concurrency(cores, tokens=None, tokens_per_job=1):
+    """Return the extractions that can run at once.
+
+    Args:
+        cores: The cores; an extraction takes one.
+        tokens: The Abaqus license tokens available, None for no limit.
+        tokens_per_job: The tokens an extraction checks out.
+
+    Returns:
+        The smaller of the cores and the jobs the tokens allow, at least
+        one.
+    """
+    if tokens is not None:
+        cores = min(cores, tokens // tokens_per_job)
+    return max(cores, 1)
+
+
+def is_current(results, basename):
+    """Return True if the results of a subject are newer than its .odb.
+
+    Args:
+        results: The simulation results folder.
+        basename: The subject.
+    """
+    basepath = os.path.join(results, basename)
+    odb = os.path.join(basepath, basename + ".odb")
+    header = os.path.join(results_folder(basepath, basename), HEADER)
+    if not os.path.isfile(odb) or not os.path.isfile(header):
+        return False
+    return os.path.getmtime(header) >= os.path.getmtime(odb)
+
+
+def extraction_job(results, basename, command=COMMAND, arguments=()):
+    """Return the extraction job of a subject.
+
+    Args:
+        results: The simulation results folder, passed to the script as
+            --results.
+        basename: The subject.
+        command: The command of the extraction script.
+        arguments: More arguments of the script, after the subject.
+    """
+    log_file = Path(results, basename, basename + "_extract.log")
+    return Job(
+        name=basename,
+        command=[*command, basename, *arguments, "--results", str(results)],
+        log_file=log_file,
+    )
+
+
+def n_frames(results, basename):
+    """Return the frames of the results of a subject, 0 if it has none."""
+    basepath = os.path.join(results, basename)
+    try:
+        folder = results_folder(basepath, basename)
+        return read_results(folder, ["percentiles_95"]).header["n_frames"]
+    except IOError:
+        return 0
+
+
+def extract_all(
+    basenames,
+    results="simulation_results",
+    cores=None,
+    tokens=None,
+    tokens_per_job=1,
+    force=False,
+    command=COMMAND,
+    arguments=(),
+    run_state=None,
+):
+    """Extract the results of every subject not yet extracted.
+
+    Args:
+        basenames: The subjects.
+        results: The simulation results folder.
+        cores: The cores, None for all.
+        tokens: The Abaqus license tokens available, None for no limit.
+        tokens_per_job: The tokens an extraction checks out.
+        force: Extract subjects whose results are current too.
+        command: The command of the extraction script.
+        arguments: More arguments of the script, after the subject.
+        run_state: The run-state database, None to record nothing.
+
+    Returns:
+        The results of the extractions, and the skipped subjects.
+    """
+    skipped = [
+        item for item in basenames if not force and is_current(results, item)
+    ]
+    current = set(skipped)
+    jobs = [
+        extraction_job(results, item, command, arguments)
+        for item in basenames
+        if item not in current
+    ]
+    ended = {}
+
+    def on_done(result):
+        frames = n_frames(results, result.name)
+        ok = result.ok and frames >= N_FRAMES
+        ended[result.name] = ok
+        print(
+            "%s %s in %.1f s, %d of %d frames"
+            % (
+                result.name,
+                "done" if ok else "FAILED",
+                result.wall_time,
+                frames,
+                N_FRAMES,
+            )
+        )
+        if run_state is not None:
+            basepath = os.path.join(results, result.name)
+            end = time.time()
+            record_stage(
+                run_state,
+                result.name,
+                "extract",
+                DONE if ok else FAILED,
+                end - result.wall_time,
+                end,
+                inputs=[os.path.join(basepath, result.name + ".odb")],
+                outputs=[results_folder(basepath, result.name)],
+                message="exit status %d, %d of %d frames, see %s"
+                % (result.returncode, frames, N_FRAMES, result.log_file),
+            )
 
-for input_file in input_list:
-    odb_basename = input_file[:-4]  # remove ".inp"
+    n_jobs = concurrency(cores or os.cpu_count() or 1, tokens, tokens_per_job)
+    print(
+        "Extracting %d subject(s), %d at once, skipping %d current"
+        % (len(jobs), n_jobs, len(skipped))
+    )
+    done = run_jobs(jobs, cores=n_jobs, on_done=on_done)
+    # complete only with every frame, even if the script exits with 0
+    done = [
+        item
+        if ended[item.name] or not item.ok
+        else item._replace(returncode=1)
+        for item in done
+    ]
+    return done, skipped
 
-    # Construct the command to run Abaqus Python script
-    cmd = ["abaqus", "python", "postproc/extract_data_strain_vs_strain_rate.py", odb_basename]
 
-    # Run the command and wait for it to finish
-    subprocess.call(cmd)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Extract the results of every simulation of a mesh list."
+    )
+    parser.add_argument(
+        "-l",
+        "--list",
+        required=False,
+        type=str,
+        default="abaqus_mesh/mesh_list_run1.txt",
+        help="Path to the mesh list.",
+    )
+    parser.add_argument(
+        "-r",
+        "--results",
+        required=False,
+        type=str,
+        default="simulation_results",
+        help="Path to the simulation results folder.",
+    )
+    parser.add_argument(
+        "-c",
+        "--cores",
+        required=False,
+        type=int,
+        default=None,
+        help="Cores to use, all by default.",
+    )
+    parser.add_argument(
+        "-t",
+        "--tokens",
+        required=False,
+        type=int,
+        default=None,
+        help="Abaqus license tokens available, no limit by default.",
+    )
+    parser.add_argument(
+        "--tokens-per-job",
+        required=False,
+        type=int,
+        default=1,
+        help="License tokens an extraction checks out.",
+    )
+    parser.add_argument(
+        "-f",
+        "--force",
+        action="store_true",
+        help="Extract subjects whose results are newer than the .odb too.",
+    )
+    parser.add_argument(
+        "-d",
+        "--database",
+        required=False,
+        type=str,
+        default="run_state.sqlite",
+        help="Path to the run-state database.",
+    )
+    args = parser.parse_args()
 
-    # Print confirmation
-    print(odb_basename + " completed")
+    start_time = time.time()
+    input_list = np.loadtxt(args.list, dtype=str, ndmin=1)
+    basenames = [item[:-4] for item in input_list]  # remove ".inp"
+    done, skipped = extract_all(
+        basenames,
+        results=args.results,
+        cores=args.cores,
+        tokens=args.tokens,
+        tokens_per_job=args.tokens_per_job,
+        force=args.force,
+        run_state=connect(Path(args.database).expanduser()),
+    )
+    print(failure_summary(done))
+    print(
+        "Skipped %d current subject(s); %.1f s in all."
+        % (len(skipped), time.time() - start_time)
+    )
+    if not all(item.ok for item in done):
+        raise SystemExit(1)
@@ -1,6 +1,7 @@
 # -*- coding: mbcs -*-
 from odbAccess import openOdb
-from abaqusConstants import INTEGRATION_POINT, MAX_PRINCIPAL
+from odb_fields import QUANTILES, extract_regions, percentiles, statistics
+from result_store import results_folder, statistic_name, write_results
 import numpy as np
 import matplotlib
 matplotlib.use('Agg')
@@ -9,72 +10,87 @@ import os
 import sys
 
 # --- Get command-line arguments ---
+# Optional option: --results <folder>, the simulation results folder, taken
+# out of the arguments before the positional ones are read
+results = "simulation_results"  # default
+if "--results" in sys.argv[:-1]:
+    index = sys.argv.index("--results")
+    results = sys.argv[index + 1]
+    del sys.argv[index:index + 2]
+
 if len(sys.argv) < 2:
-    print("Usage: python scriptname.py <odb_basename> [save_full_txt_file]")
+    print("Usage: python scriptname.py <odb_basename> [save_full_txt_file] [elsets] [quantiles] [--results <folder>]")
     sys.exit(1)
 
 odb_basename = sys.argv[1]
 
-# Optional argument: save_full_txt_file
+# Optional argument: save_full_txt_file, "true" to also write the results as
+# text files
 save_full_txt_file = "false"  # default
 if len(sys.argv) >= 3:
     save_full_txt_file = sys.argv[2].lower()
 
-odb_path = "simulation_results/" + odb_basename + "/" + odb_basename + ".odb"
-save_path = "simulation_results/" + odb_basename + "/"
+# Optional argument: elsets, comma separated, e.g., EB1,EB2 for the gray
+# matter and the CSF, whose statistics are computed in the same pass; the
+# full fields are saved for the first
+elsets = ['EB1']  # default
+if len(sys.argv) >= 4:
+    elsets = sys.argv[3].split(',')
+
+# Optional argument: quantiles, comma separated levels, e.g., 0.5,0.95
+levels = list(QUANTILES)  # default
+if len(sys.argv) >= 5:
+    levels = [float(item) for item in sys.argv[4].split(',')]
+    # check before the ODB is opened and read
+    if not all(0 <= level <= 1 for level in levels):
+        print "Error: quantile levels must be from 0 to 1, got", sys.argv[4]
+        sys.exit(1)
+
+odb_path = os.path.join(results, odb_basename, odb_basename + ".odb")
+save_path = os.path.join(results, odb_basename) + "/"
 print "Opening ODB file:", odb_path
 odb_basename  = os.path.splitext(os.path.basename(odb_path))[0]  # e.g., "example1"
 
 # === Open ODB ===
 odb = openOdb(odb_path)
-instance_name = 'PART-1-1'
-step = list(odb.steps.values())[-1]
-frames = step.frames
-num_frames = len(frames)
-
-region = odb.rootAssembly.instances[instance_name].elementSets['EB1']
-
-# === Initialize data arrays ===
-# We determine number of elements from the first frame
-first_LE = frames[0].fieldOutputs['LE'].getSubset(region=region, position=INTEGRATION_POINT)
-num_elements = len(first_LE.getScalarField(invariant=MAX_PRINCIPAL).values)
-
-strain_data = np.zeros((num_frames, num_elements))
-strain_rate_data = np.zeros((num_frames, num_elements))
-perc_95_data = np.zeros((num_frames, 2))  # Column 0: strain, Column 1: strain rate
-frame_times = np.zeros((num_frames,))
-
-# === Loop through frames ===
-print "Extracting data from %d frames..." % num_frames
-for i, frame in enumerate(frames):
-    frame_times[i] = frame.frameValue
-
-    LE = frame.fieldOutputs['LE'].getSubset(region=region, position=INTEGRATION_POINT)
-    ER = frame.fieldOutputs['ER'].getSubset(region=region, position=INTEGRATION_POINT)
-    
-    LE_values = [v.data for v in LE.getScalarField(invariant=MAX_PRINCIPAL).values]
-    ER_values = [v.data for v in ER.getScalarField(invariant=MAX_PRINCIPAL).values]
-    
-    strain_data[i, :] = LE_values
-    strain_rate_data[i, :] = ER_values
-    
-    perc_95_data[i, 0] = np.percentile(LE_values, 95)
-    perc_95_data[i, 1] = np.percentile(ER_values, 95)
-
-    print "Processed frame %d/%d (time = %.6f)" % (i+1, num_frames, frame.frameValue)
-
-# === Save arrays ===
-if save_full_txt_file:
+
+# === Extract LE and ER of every element set, in one pass, see odb_fields.py ===
+print "Extracting data..."
+frame_times, fields = extract_regions(odb, elsets, names=('LE', 'ER'))
+strain_data = fields[(elsets[0], 'LE')]
+strain_rate_data = fields[(elsets[0], 'ER')]
+print "Extracted %d frames of %d integration points" % strain_data.shape
+
+# === Statistics of every element set and field ===
+arrays = {}
+for (elset, name), values in fields.items():
+    for statistic, result in statistics(values, levels).items():
+        arrays[statistic_name(elset, name, statistic)] = result
+
+perc_95_data = np.column_stack([percentiles(strain_data, 95),
+                                percentiles(strain_rate_data, 95)])
+
+# === Save arrays, to the binary result store, see result_store.py ===
+folder = results_folder(save_path, odb_basename)
+arrays.update({'strain': strain_data,
+               'strain_rate': strain_rate_data,
+               'percentiles_95': perc_95_data})
+write_results(folder, arrays, frame_times, invariant='MAX_PRINCIPAL',
+              region='PART-1-1.' + elsets[0],
+              metadata={'elsets': elsets, 'quantiles': levels})
+print "Saved strain_data, strain_rate_data, and 95th percentile arrays to: ", folder
+
+# === Optionally, also as text ===
+if save_full_txt_file == "true":
     np.savetxt(save_path + odb_basename + '_strain_data.txt', strain_data, fmt='%.6e')
     np.savetxt(save_path + odb_basename + '_strainrate_data.txt', strain_rate_data, fmt='%.6e')
 
-np.savetxt(save_path + odb_basename + '_strain_percentiles_95.txt', perc_95_data,
-           header='95thPercentileStrain\t95thPercentileStrainRate', fmt='%.6e')
-
-np.savetxt(save_path + odb_basename + '_frame_times.txt', frame_times,
-           header='TimePerFrame (s)', fmt='%.8e')
+    np.savetxt(save_path + odb_basename + '_strain_percentiles_95.txt', perc_95_data,
+               header='95thPercentileStrain\t95thPercentileStrainRate', fmt='%.6e')
 
-print "Saved strain_data, strain_rate_data, and 95th percentile arrays to: ", save_path
+    np.savetxt(save_path + odb_basename + '_frame_times.txt', frame_times,
+               header='TimePerFrame (s)', fmt='%.8e')
+    print "Saved text files to: ", save_path
 
 odb.close()
 print "Done."
@@ -0,0 +1,398 @@
+"""Bulk extraction of element field output from an Abaqus ODB.
+
+The max principal value of a field (e.g., LE, ER) at every integration
+point of an element set is read, frame by frame, from the bulk data blocks
+of the field, NumPy arrays, straight into a preallocated frames by points
+array, in place of a Python object per integration point per frame
+(FieldValue.data).  The fields of several element sets (e.g., EB1, the
+gray matter, and EB2, the CSF) are read in the same pass over the frames
+(extract_regions), and their statistics (statistics: quantiles, mean, max,
+and histogram of every frame) are computed on the whole frames by points
+block at once, the quantiles from one partition (np.partition) in place of
+a sort per frame per quantile.
+
+The reader works on the odbAccess object model, so a synthetic in-memory
+ODB (SyntheticOdb) stands in for a real one, to test and benchmark the
+extraction without an Abaqus license.  The module runs under the Python
+2.7 of Abaqus (abaqus python) and Python 3.
+
+To benchmark the bulk against the per-value extraction, and the
+quantiles against np.percentile per frame, outside Abaqus:
+python postproc/odb_fields.py
+"""
+
+from __future__ import division, print_function
+
+import time
+
+import numpy as np
+
+try:
+    from abaqusConstants import INTEGRATION_POINT, MAX_PRINCIPAL
+except ImportError:  # outside Abaqus, for the synthetic ODB
+    INTEGRATION_POINT = "INTEGRATION_POINT"
+    MAX_PRINCIPAL = "MAX_PRINCIPAL"
+
+INSTANCE = "PART-1-1"
+ELSET = "EB1"
+FIELDS = ("LE", "ER")
+QUANTILES = (0.5, 0.9, 0.95, 0.99)
+N_BINS = 50
+
+
+def _scalar_field(frame, name, region):
+    """Return the max principal field of a frame on a region."""
+    field = frame.fieldOutputs[name].getSubset(
+        region=region, position=INTEGRATION_POINT
+    )
+    return field.getScalarField(invariant=MAX_PRINCIPAL)
+
+
+def read_frame_bulk(frame, name, region, out):
+    """Read the max principal field of a frame into an array, block by
+    block.
+
+    Args:
+        frame: The ODB frame.
+        name: The field name, e.g., "LE".
+        region: The element set.
+        out: The (n_points,) array to fill.
+
+    Returns:
+        out.
+    """
+    start = 0
+    for block in _scalar_field(frame, name, region).bulkDataBlocks:
+        data = np.asarray(block.data).ravel()
+        out[start : start + len(data)] = data
+        start += len(data)
+    if start != len(out):
+        raise ValueError(
+            "Field %s has %d values, expected %d." % (name, start, len(out))
+        )
+    return out
+
+
+def read_frame_values(frame, name, region, out):
+    """Read the max principal field of a frame into an array, value by
+    value, as a reference for read_frame_bulk."""
+    out[:] = [v.data for v in _scalar_field(frame, name, region).values]
+    return out
+
+
+def extract_regions(
+    odb,
+    elsets=(ELSET,),
+    names=FIELDS,
+    instance=INSTANCE,
+    read=read_frame_bulk,
+):
+    """Extract max principal fields at the integration points of element
+    sets over every frame of the last step, in one pass over the frames.
+
+    Args:
+        odb: The ODB, from odbAccess.openOdb, or a SyntheticOdb.
+        elsets: The element sets of the instance.
+        names: The field names.
+        instance: The part instance.
+        read: The frame reader, read_frame_bulk or read_frame_values.
+
+    Returns:
+        The (n_frames,) frame times, and the (n_frames, n_points) values by
+        element set and field name.
+
+    Raises:
+        ValueError: If a field has no values on an element set, e.g., it is
+            not in the output requests (see output_profiles.py).
+    """
+    step = list(odb.steps.values())[-1]
+    frames = step.frames
+    sets = odb.rootAssembly.instances[instance].elementSets
+    regions = dict((elset, sets[elset]) for elset in elsets)
+
+    times = np.zeros(len(frames))
+    fields = {}
+    for elset, region in regions.items():
+        for name in names:
+            # the number of integration points, from the blocks of frame 0
+            n_points = sum(
+                np.asarray(block.data).size
+                for block in _scalar_field(
+                    frames[0], name, region
+                ).bulkDataBlocks
+            )
+            if n_points == 0:
+                raise ValueError(
+                    "Field %s has no values on %s." % (name, elset)
+                )
+            fields[(elset, name)] = np.zeros((len(frames), n_points))
+    for i, frame in enumerate(frames):
+        times[i] = frame.frameValue
+        for (elset, name), values in fields.items():
+            read(frame, name, regions[elset], values[i])
+    return times, fields
+
+
+def extract(
+    odb, names=FIELDS, instance=INSTANCE, elset=ELSET, read=read_frame_bulk
+):
+    """Extract max principal fields on one element set, see
+    extract_regions.
+
+    Returns:
+        The (n_frames,) frame times, and the (n_frames, n_points) values by
+        field name.
+    """
+    times, fields = extract_regions(odb, (elset,), names, instance, read)
+    return times, dict((name, fields[(elset, name)]) for name in names)
+
+
+def quantiles(values, levels=QUANTILES):
+    """Return quantiles of every frame (row) of values, interpolated
+    linearly as np.percentile, from one partition of the whole block.
+
+    Args:
+        values: The (n_frames, n_points) values.
+        levels: The quantile levels, from 0 to 1.
+
+    Returns:
+        The (n_frames, n_levels) quantiles.
+
+    Raises:
+        ValueError: If a level is outside 0 to 1.
+    """
+    values = np.asarray(values)
+    levels = np.asarray(levels, dtype=float)
+    if np.any((levels < 0) | (levels > 1)):
+        raise ValueError(
+            "Quantile levels must be from 0 to 1, got %s." % levels.tolist()
+        )
+    positions = levels * (values.shape[1] - 1)
+    lower = np.floor(positions).astype(int)
+    upper = np.minimum(lower + 1, values.shape[1] - 1)
+    fraction = positions - lower
+    kth = np.unique(np.concatenate([lower, upper]))
+    ordered = np.partition(values, kth, axis=1)
+    return ordered[:, lower] + fraction * (
+        ordered[:, upper] - ordered[:, lower]
+    )
+
+
+def percentiles(values, q=95):
+    """Return the q-th percentile of every frame (row) of values."""
+    return quantiles(values, [q / 100.0])[:, 0]
+
+
+def histograms(values, edges):
+    """Count the values of every frame (row) in bins, as np.histogram.
+
+    Args:
+        values: The (n_frames, n_points) values.
+        edges: The (n_bins + 1,) increasing bin edges; the last bin
+            includes its right edge, values outside the edges are not
+            counted.
+
+    Returns:
+        The (n_frames, n_bins) counts.
+    """
+    values = np.asarray(values)
+    n_frames, n_bins = len(values), len(edges) - 1
+    index = np.searchsorted(edges, values, side="right") - 1
+    index[values == edges[-1]] = n_bins - 1
+    inside = (index >= 0) & (index < n_bins)
+    rows = np.broadcast_to(np.arange(n_frames)[:, None], values.shape)
+    counts = np.bincount(
+        rows[inside] * n_bins + index[inside], minlength=n_frames * n_bins
+    )
+    return counts.reshape(n_frames, n_bins)
+
+
+def statistics(values, levels=QUANTILES, bins=N_BINS):
+    """Return the statistics of every frame (row) of values.
+
+    Args:
+        values: The (n_frames, n_points) values.
+        levels: The quantile levels, from 0 to 1.
+        bins: The number of bins, spanning the values of all frames, or the
+            bin edges.
+
+    Returns:
+        The (n_frames, n_levels) quantiles, the (n_frames,) mean and max,
+        the (n_frames, n_bins) histogram, and the bin edges, by name.
+    """
+    values = np.asarray(values)
+    if np.ndim(bins) == 0:
+        edges = np.linspace(values.min(), values.max(), int(bins) + 1)
+    else:
+        edges = np.asarray(bins, dtype=float)
+    return {
+        "quantiles": quantiles(values, levels),
+        "mean": values.mean(axis=1),
+        "max": values.max(axis=1),
+        "histogram": histograms(values, edges),
+        "bin_edges": edges,
+    }
+
+
+class _Block(object):
+    """A bulk data block of a field."""
+
+    def __init__(self, data):
+        self.data = data
+
+
+class _Value(object):
+    """A field value at one integration point."""
+
+    def __init__(self, data):
+        self.data = data
+
+
+class _ScalarField(object):
+    """A scalar field, with its values and bulk data blocks."""
+
+    def __init__(self, data, block_size):
+        self._data = data
+        self._block_size = block_size
+
+    @property
+    def values(self):
+        return [_Value(float(item)) for item in self._data]
+
+    @property
+    def bulkDataBlocks(self):
+        size = self._block_size
+        return [
+            _Block(self._data[start : start + size].reshape(-1, 1))
+            for start in range(0, len(self._data), size)
+        ]
+
+
+class _FieldOutput(object):
+    """A field output of a frame, its max principal values by element
+    set."""
+
+    def __init__(self, data, block_size):
+        self._data = data
+        self._block_size = block_size
+
+    def getSubset(self, region=None, position=None):
+        return _FieldOutput({region: self._data[region]}, self._block_size)
+
+    def getScalarField(self, invariant=None):
+        (data,) = self._data.values()
+        return _ScalarField(data, self._block_size)
+
+
+class _Frame(object):
+    def __init__(self, value, fields, block_size):
+        self.frameValue = value
+        self.fieldOutputs = dict(
+            (name, _FieldOutput(data, block_size))
+            for name, data in fields.items()
+        )
+
+
+class _Namespace(object):
+    def __init__(self, **items):
+        self.__dict__.update(items)
+
+
+class SyntheticOdb(object):
+    """An in-memory stand-in for an ODB: one step of frames, with the max
+    principal fields of element sets.
+
+    Args:
+        regions: The (n_frames, n_points) values by field name, by element
+            set.
+        times: The (n_frames,) frame times.
+        block_size: The values per bulk data block, as Abaqus splits a
+            field by element type.
+    """
+
+    def __init__(self, regions, times, block_size=100000):
+        names = set(name for fields in regions.values() for name in fields)
+        frames = [
+            _Frame(
+                float(value),
+                dict(
+                    (
+                        name,
+                        dict(
+                            (elset, fields[name][i])
+                            for elset, fields in regions.items()
+                        ),
+                    )
+                    for name in names
+                ),
+                block_size,
+            )
+            for i, value in enumerate(times)
+        ]
+        self.steps = {"Step-1": _Namespace(frames=frames)}
+        instance = _Namespace(
+            elementSets=dict((item, item) for item in regions)
+        )
+        self.rootAssembly = _Namespace(instances={INSTANCE: instance})
+
+    def close(self):
+        pass
+
+
+def synthetic_odb(
+    n_frames, n_points, seed=0, block_size=100000, elsets=(ELSET,)
+):
+    """Return a SyntheticOdb with random LE and ER fields, and the fields.
+
+    Args:
+        n_frames: The frames.
+        n_points: The integration points of every element set.
+        seed: The random seed.
+        block_size: The values per bulk data block.
+        elsets: The element sets.
+
+    Returns:
+        The ODB, and the values by field name, by element set.
+    """
+    rng = np.random.RandomState(seed)
+    regions = dict(
+        (
+            elset,
+            dict(
+                (name, rng.lognormal(size=(n_frames, n_points)))
+                for name in FIELDS
+            ),
+        )
+        for elset in elsets
+    )
+    times = np.linspace(0.0, 0.08, n_frames)
+    return SyntheticOdb(regions, times, block_size), regions
+
+
+if __name__ == "__main__":
+    odb, _ = synthetic_odb(n_frames=21, n_points=200000)
+    elapsed = {}
+    for read in (read_frame_values, read_frame_bulk):
+        start = time.time()
+        extract(odb, read=read)
+        elapsed[read.__name__] = time.time() - start
+        print("%s: %.3f s" % (read.__name__, elapsed[read.__name__]))
+    print(
+        "Speedup: %.0fx"
+        % (elapsed["read_frame_values"] / elapsed["read_frame_bulk"])
+    )
+
+    _, fields = extract(odb)
+    levels = [100.0 * item for item in QUANTILES]
+    start = time.time()
+    for values in fields.values():
+        for row in values:
+            np.percentile(row, levels)
+    per_frame = time.time() - start
+    start = time.time()
+    for values in fields.values():
+        quantiles(values)
+    print(
+        "Quantiles, np.percentile per frame: %.3f s, quantiles: %.3f s"
+        % (per_frame, time.time() - start)
+    )
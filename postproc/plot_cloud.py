@@ -1,71 +1,248 @@
-import matplotlib.pyplot as plt
-import numpy as np
+"""Plot the strain against the strain rate of every integration point, one
+figure per frame, with the 95th percentiles of the frame.
+
+The figure and its static artists (axes, limits, labels) are built once per
+process, and every frame updates only the point offsets, the percentile
+lines and crosshair, and the title, before it is saved.  The frames are
+spread across a process pool, each worker memory-mapping the results (see
+result_store.py), or, optionally, written in order to one animation, a
+.gif or an .mp4 (which needs ffmpeg).
+
+To run, from the repository root:
+python postproc/plot_cloud.py IXI013-HH-1212-T1_run1 -p 8
+python postproc/plot_cloud.py IXI013-HH-1212-T1_run1 -a cloud.gif
+"""
+
+import argparse
 import os
+from multiprocessing import Pool
+
+import matplotlib
+
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt  # noqa: E402
+import numpy as np  # noqa: E402
+from matplotlib.animation import FFMpegWriter, PillowWriter  # noqa: E402
+
+from result_store import read_results, results_folder  # noqa: E402
+
+NAMES = ["percentiles_95", "strain", "strain_rate"]
+
 
-# --- File setup ---
-basename = "IXI013-HH-1212-T1_run1"
-basepath = os.path.join("simulation_results", basename)
-
-percentile_fname = os.path.join(basepath, basename + "_strain_percentiles_95.txt")
-time_fname = os.path.join(basepath, basename + "_frame_times.txt")
-strain_data_fname = os.path.join(basepath, basename + '_strain_data.txt')
-strain_rate_data_fname = os.path.join(basepath, basename + '_strainrate_data.txt')
-cloud_viz_path = os.path.join(basepath, "cloud_viz")
-
-# --- Create output folder ---
-if not os.path.exists(cloud_viz_path):
-    os.makedirs(cloud_viz_path)
-
-# --- Load data ---
-percentile_data = np.loadtxt(percentile_fname)
-time_data = np.loadtxt(time_fname)
-strain_data = np.loadtxt(strain_data_fname)
-strain_rate_data = np.loadtxt(strain_rate_data_fname)
-
-num_frames = strain_data.shape[0]
-
-# --- Compute fixed axis limits ---
-x_all = strain_rate_data.flatten()
-y_all = strain_data.flatten()
-x_min, x_max = np.min(x_all), np.max(x_all)
-y_min, y_max = np.min(y_all), np.max(y_all)
-x_pad = 0.05 * (x_max - x_min)
-y_pad = 0.05 * (y_max - y_min)
-x_limits = (x_min - x_pad, x_max + x_pad)
-y_limits = (y_min - y_pad, y_max + y_pad)
-
-# --- Loop through frames ---
-for i in range(num_frames):
-    x = strain_rate_data[i]
-    y = strain_data[i]
-    x95 = percentile_data[i, 1]
-    y95 = percentile_data[i, 0]
-
-    plt.figure(figsize=(6, 5), dpi=150)
-
-    # Point cloud
-    plt.scatter(x, y, color='gray', alpha=0.5)
-
-    # 95th percentile lines
-    plt.axhline(y95, color='red', linestyle='-')
-    plt.axvline(x95, color='blue', linestyle='-')
-
-    # Crosshair
-    plt.scatter([x95], [y95], marker='o', color='white', edgecolor='black', s=120, zorder=3)
-    plt.scatter([x95], [y95], marker='+', color='black', s=120, linewidths=2, zorder=4)
+def axis_limits(strain_data, strain_rate_data):
+    """Return the x (strain rate) and y (strain) limits of every frame, the
+    range of all frames padded by 5%."""
+    x_min, x_max = np.min(strain_rate_data), np.max(strain_rate_data)
+    y_min, y_max = np.min(strain_data), np.max(strain_data)
+    x_pad = 0.05 * (x_max - x_min)
+    y_pad = 0.05 * (y_max - y_min)
+    return (x_min - x_pad, x_max + x_pad), (y_min - y_pad, y_max + y_pad)
+
+
+def build_figure(limits):
+    """Build the figure and the artists that change from frame to frame.
+
+    Args:
+        limits: The x and y limits, see axis_limits.
+
+    Returns:
+        The figure, and the artists by name: cloud, x95 and y95 (the
+        percentile lines), circle and cross (the crosshair), and title.
+    """
+    figure = plt.figure(figsize=(6, 5), dpi=150)
+    axes = figure.gca()
+    empty = np.empty((0, 2))
+    artists = {
+        # Point cloud
+        "cloud": axes.scatter(
+            empty[:, 0], empty[:, 1], color="gray", alpha=0.5
+        ),
+        # 95th percentile lines
+        "y95": axes.axhline(0.0, color="red", linestyle="-"),
+        "x95": axes.axvline(0.0, color="blue", linestyle="-"),
+        # Crosshair
+        "circle": axes.scatter(
+            [0.0],
+            [0.0],
+            marker="o",
+            color="white",
+            edgecolor="black",
+            s=120,
+            zorder=3,
+        ),
+        "cross": axes.scatter(
+            [0.0],
+            [0.0],
+            marker="+",
+            color="black",
+            s=120,
+            linewidths=2,
+            zorder=4,
+        ),
+        "title": axes.set_title(""),
+    }
 
     # Labels and limits
-    plt.xlabel("Strain Rate (Max Principal)")
-    plt.ylabel("Strain (Max Principal)")
-    plt.title("Frame %d (t = %.3f s)" % (i, time_data[i]))
-    plt.grid(True)
-    plt.xlim(x_limits)
-    plt.ylim(y_limits)
-    plt.tight_layout()
-
-    # Save PNG
-    fig_path = os.path.join(cloud_viz_path, "frame_%03d.png" % i)
-    plt.savefig(fig_path)
-    plt.close()
-
-    print("Saved:", fig_path)
+    axes.set_xlabel("Strain Rate (Max Principal)")
+    axes.set_ylabel("Strain (Max Principal)")
+    axes.grid(True)
+    axes.set_xlim(limits[0])
+    axes.set_ylim(limits[1])
+    figure.tight_layout()
+    return figure, artists
+
+
+def update_frame(artists, results, i):
+    """Update the artists to frame i of the results."""
+    x = results.arrays["strain_rate"][i]
+    y = results.arrays["strain"][i]
+    x95 = results.arrays["percentiles_95"][i, 1]
+    y95 = results.arrays["percentiles_95"][i, 0]
+
+    artists["cloud"].set_offsets(np.column_stack([x, y]))
+    artists["y95"].set_ydata([y95, y95])
+    artists["x95"].set_xdata([x95, x95])
+    artists["circle"].set_offsets([[x95, y95]])
+    artists["cross"].set_offsets([[x95, y95]])
+    artists["title"].set_text(
+        "Frame %d (t = %.3f s)" % (i, results.frame_times[i])
+    )
+    return list(artists.values())
+
+
+def frame_path(output_folder, i):
+    """Return the PNG of frame i."""
+    return os.path.join(output_folder, "frame_%03d.png" % i)
+
+
+def render_frames(results_path, frames, output_folder):
+    """Render frames to PNGs, with one figure, in one process.
+
+    Args:
+        results_path: The results folder of the subject.
+        frames: The frame indices.
+        output_folder: The folder of the PNGs.
+
+    Returns:
+        The PNGs.
+    """
+    results = read_results(results_path, NAMES)
+    limits = axis_limits(
+        results.arrays["strain"], results.arrays["strain_rate"]
+    )
+    figure, artists = build_figure(limits)
+    paths = []
+    for i in frames:
+        update_frame(artists, results, i)
+        paths.append(frame_path(output_folder, i))
+        figure.savefig(paths[-1])
+    plt.close(figure)
+    return paths
+
+
+def render_pool(results_path, output_folder, processes=None):
+    """Render every frame to PNGs, spread across a process pool.
+
+    Args:
+        results_path: The results folder of the subject.
+        output_folder: The folder of the PNGs, created if needed.
+        processes: The workers, None for all cores.
+
+    Returns:
+        The PNGs, in frame order.
+    """
+    if not os.path.exists(output_folder):
+        os.makedirs(output_folder)
+    n_frames = read_results(results_path, []).header["n_frames"]
+    processes = min(processes or os.cpu_count() or 1, n_frames)
+    # interleaved, so every worker gets early and late frames alike
+    chunks = [list(range(n_frames))[k::processes] for k in range(processes)]
+    if processes == 1:
+        rendered = [render_frames(results_path, chunks[0], output_folder)]
+    else:
+        with Pool(processes) as pool:
+            rendered = pool.starmap(
+                render_frames,
+                [(results_path, chunk, output_folder) for chunk in chunks],
+            )
+    return sorted(path for paths in rendered for path in paths)
+
+
+def render_animation(results_path, output_file, fps=10):
+    """Render every frame, in order, to one animation.
+
+    Args:
+        results_path: The results folder of the subject.
+        output_file: The .gif, or .mp4 (with ffmpeg).
+        fps: The frames per second.
+    """
+    results = read_results(results_path, NAMES)
+    limits = axis_limits(
+        results.arrays["strain"], results.arrays["strain_rate"]
+    )
+    figure, artists = build_figure(limits)
+    if output_file.endswith(".gif"):
+        writer = PillowWriter(fps=fps)
+    else:
+        writer = FFMpegWriter(fps=fps)
+    with writer.saving(figure, output_file, figure.dpi):
+        for i in range(results.header["n_frames"]):
+            update_frame(artists, results, i)
+            writer.grab_frame()
+    plt.close(figure)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Plot the strain against the strain rate of every frame."
+    )
+    parser.add_argument(
+        "basename",
+        nargs="?",
+        default="IXI013-HH-1212-T1_run1",
+        help="The subject.",
+    )
+    parser.add_argument(
+        "-r",
+        "--results",
+        required=False,
+        type=str,
+        default="simulation_results",
+        help="Path to the simulation results folder.",
+    )
+    parser.add_argument(
+        "-p",
+        "--processes",
+        required=False,
+        type=int,
+        default=None,
+        help="Workers rendering PNGs, all cores by default.",
+    )
+    parser.add_argument(
+        "-a",
+        "--animation",
+        required=False,
+        type=str,
+        default=None,
+        help="Path to a .gif or .mp4 to render, in place of PNGs.",
+    )
+    parser.add_argument(
+        "--fps",
+        required=False,
+        type=int,
+        default=10,
+        help="Frames per second of the animation.",
+    )
+    args = parser.parse_args()
+
+    # --- File setup ---
+    basepath = os.path.join(args.results, args.basename)
+    results_path = results_folder(basepath, args.basename)
+
+    if args.animation is not None:
+        render_animation(results_path, args.animation, args.fps)
+        print("Saved:", args.animation)
+    else:
+        cloud_viz_path = os.path.join(basepath, "cloud_viz")
+        paths = render_pool(results_path, cloud_viz_path, args.processes)
+        print("Saved %d frames to: %s" % (len(paths), cloud_viz_path))
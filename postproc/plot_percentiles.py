@@ -2,17 +2,19 @@ import matplotlib.pyplot as plt
 import numpy as np
 import os
 
+from result_store import read_results, results_folder
+
 # --- File setup ---
 basename = "IXI013-HH-1212-T1_run1"
 basepath = os.path.join("simulation_results", basename)
 
-percentile_fname = os.path.join(basepath, basename + "_strain_percentiles_95.txt")
-time_fname = os.path.join(basepath, basename + "_frame_times.txt")
+results_path = results_folder(basepath, basename)
 fig_fname = os.path.join(basepath, basename + "_strain_percentiles_95.png")
 
 # --- Load data ---
-percentile = np.loadtxt(percentile_fname)
-time = np.loadtxt(time_fname)
+results = read_results(results_path, ["percentiles_95"])
+percentile = results.arrays["percentiles_95"]
+time = results.frame_times
 
 strain_rate_95 = percentile[:, 1]
 strain_95 = percentile[:, 0]
@@ -1,6 +1,11 @@
 import matplotlib.pyplot as plt
 import numpy as np
 import os
+import time
+from pathlib import Path
+
+from autosim.ssm.run_state import connect, DONE, FAILED, record_stage
+from result_store import read_results, results_folder
 
 # --- Parameters ---
 highlight_basename = "IXI013-HH-1212-T1_run1"
@@ -9,6 +14,11 @@ highlight_basename = "IXI013-HH-1212-T1_run1"
 # Load list of input filenames
 input_list = np.loadtxt("abaqus_mesh/mesh_list_run1.txt", dtype=str)
 
+# Record which simulations made it into the figure in the run state
+run_state = connect(Path("run_state.sqlite"))
+started = time.time()
+problems = {}  # message by basename of the simulations left out
+
 # --- Containers ---
 all_strain = []
 all_strain_rate = []
@@ -23,27 +33,29 @@ for input_file in input_list:
     odb_basename = input_file[:-4]  # remove ".inp"
     basepath = os.path.join("simulation_results", odb_basename)
 
-    percentile_fname = os.path.join(basepath, odb_basename + "_strain_percentiles_95.txt")
-    time_fname = os.path.join(basepath, odb_basename + "_frame_times.txt")
+    results_path = results_folder(basepath, odb_basename)
 
-    if not os.path.isfile(percentile_fname):
-        print("Missing:", percentile_fname)
+    try:
+        results = read_results(results_path, ["percentiles_95"])
+    except IOError as e:
+        print("Missing:", results_path)
+        problems[odb_basename] = "missing: " + str(e)
         continue
 
     try:
-        percentile = np.loadtxt(percentile_fname)
+        percentile = results.arrays["percentiles_95"]
 
         # Skip simulations with <81 frames
         if percentile.shape[0] < 81:
             print("Skipping %s (only %d frames)" % (odb_basename, percentile.shape[0]))
+            problems[odb_basename] = "only %d frames" % percentile.shape[0]
             continue
 
         strain_rate_95 = percentile[:, 1]
         strain_95 = percentile[:, 0]
 
         if highlight_basename == odb_basename:
-            if os.path.isfile(time_fname):
-                highlight_time = np.loadtxt(time_fname)
+            highlight_time = results.frame_times
             highlight_strain_rate = strain_rate_95
             highlight_strain = strain_95
         else:
@@ -52,7 +64,8 @@ for input_file in input_list:
             labels.append(odb_basename)
 
     except Exception as e:
-        print("Error reading %s: %s" % (percentile_fname, str(e)))
+        print("Error reading %s: %s" % (results_path, str(e)))
+        problems[odb_basename] = "error reading: " + str(e)
         continue
 
 # --- Plotting ---
@@ -93,3 +106,17 @@ plt.tight_layout()
 output_fig = "postproc/strain_percentile_summary_%s.png"%(highlight_basename)
 plt.savefig(output_fig)
 print("Saved figure to:", output_fig)
+
+for input_file in input_list:
+    odb_basename = input_file[:-4]
+    record_stage(
+        run_state,
+        odb_basename,
+        "plot",
+        FAILED if odb_basename in problems else DONE,
+        started,
+        time.time(),
+        inputs=[results_folder(os.path.join("simulation_results", odb_basename), odb_basename)],
+        outputs=[output_fig],
+        message=problems.get(odb_basename, ""),
+    )
@@ -0,0 +1,222 @@
+"""Binary result store of the strain and strain rate extraction.
+
+The results of a subject are a folder, <basename>_results, next to its
+.odb, of one .npy per array, which readers memory-map, and a small JSON
+header, header.json, of the units, invariant, region, frame times, and the
+dtype and shape of every array:
+* strain, strain_rate: (n_frames, n_points) float32, the max principal LE
+  and ER at every integration point of the region
+* percentiles_95: (n_frames, 2) float64, the 95th percentile of strain
+  (column 0) and strain rate (column 1) of every frame
+* <elset>_<field>_<statistic>, e.g., EB2_ER_quantiles: the statistics of a
+  field on an element set (see odb_fields.statistics), of the quantile
+  levels of the header
+
+The header is written last, so a folder without one is incomplete.  The
+full fields are optional; a subject with only its percentiles is enough
+for plot_percentiles*.py.
+
+The module runs under the Python 2.7 of Abaqus (abaqus python), which
+writes the results, and Python 3, which plots them.
+
+To convert the text results of extract_data_strain_vs_strain_rate.py
+(_strain_data.txt, _strainrate_data.txt, _strain_percentiles_95.txt,
+_frame_times.txt) of every subject of a mesh list, from the repository
+root:
+python postproc/result_store.py -l abaqus_mesh/mesh_list_run1.txt
+"""
+
+from __future__ import division, print_function
+
+import argparse
+import json
+import os
+from collections import namedtuple
+
+import numpy as np
+
+HEADER = "header.json"
+RESULTS_SUFFIX = "_results"
+FIELD_DTYPE = np.float32  # the text results keep 7 significant digits
+UNITS = {
+    "strain": "1",
+    "strain_rate": "1/s",
+    "percentiles_95": ["1", "1/s"],
+    "frame_times": "s",
+}
+
+Results = namedtuple("Results", ["header", "arrays", "frame_times"])
+
+
+def statistic_name(elset, field, statistic):
+    """Return the array name of a statistic, e.g., EB1_LE_quantiles."""
+    return "%s_%s_%s" % (elset, field, statistic)
+
+
+def write_header(path, header):
+    """Write a header as JSON, as bytes, the same under Python 2 and 3,
+    whose json.dumps returns a str of bytes and of text, respectively."""
+    text = json.dumps(header, indent=1, sort_keys=True)  # ASCII only
+    with open(path, "wb") as file:
+        file.write(text.encode("utf-8"))
+
+
+def read_header(path):
+    """Read a header written by write_header."""
+    with open(path, "rb") as file:
+        return json.loads(file.read().decode("utf-8"))
+
+
+def results_folder(basepath, basename):
+    """Return the results folder of a subject, e.g.,
+    simulation_results/<basename>/<basename>_results."""
+    return os.path.join(basepath, basename + RESULTS_SUFFIX)
+
+
+def write_results(
+    folder, arrays, frame_times, invariant, region, metadata=None
+):
+    """Write the arrays of a subject, then its header.
+
+    Args:
+        folder: The results folder, created if needed.
+        arrays: The arrays by name, e.g., strain, strain_rate, and
+            percentiles_95; strain and strain_rate are stored as float32.
+        frame_times: The (n_frames,) frame times, in seconds.
+        invariant: The invariant of the fields, e.g., "MAX_PRINCIPAL".
+        region: The region of the fields, e.g., "PART-1-1.EB1".
+        metadata: More header entries, e.g., the quantile levels.
+
+    Returns:
+        The header.
+    """
+    if not os.path.isdir(folder):
+        os.makedirs(folder)
+    header_file = os.path.join(folder, HEADER)
+    if os.path.isfile(header_file):
+        os.remove(header_file)  # incomplete until rewritten
+
+    entries = {}
+    for name, values in arrays.items():
+        values = np.asarray(values)
+        if name in ("strain", "strain_rate"):
+            values = values.astype(FIELD_DTYPE)
+        np.save(os.path.join(folder, name + ".npy"), values)
+        entries[name] = {
+            "dtype": values.dtype.str,
+            "shape": list(values.shape),
+            "units": UNITS.get(name),
+        }
+    header = {
+        "invariant": invariant,
+        "region": region,
+        "n_frames": len(frame_times),
+        "frame_times": [float(item) for item in frame_times],
+        "units": {"frame_times": UNITS["frame_times"]},
+        "arrays": entries,
+    }
+    header.update(metadata or {})
+    write_header(header_file, header)
+    return header
+
+
+def read_results(folder, names=None, mmap_mode="r"):
+    """Read the results of a subject, memory-mapping its arrays.
+
+    Args:
+        folder: The results folder.
+        names: The arrays to read, None for all of the header.
+        mmap_mode: The memory-map mode of np.load, None to read into
+            memory.
+
+    Returns:
+        The header, the arrays by name, and the (n_frames,) frame times.
+
+    Raises:
+        IOError: If the folder has no header, or an array is missing.
+    """
+    header_file = os.path.join(folder, HEADER)
+    if not os.path.isfile(header_file):
+        raise IOError("No results header: %s" % header_file)
+    header = read_header(header_file)
+    if names is None:
+        names = sorted(header["arrays"])
+    missing = [name for name in names if name not in header["arrays"]]
+    if missing:
+        raise IOError("No array(s) %s in %s" % (missing, folder))
+    arrays = dict(
+        (name, np.load(os.path.join(folder, name + ".npy"), mmap_mode))
+        for name in names
+    )
+    return Results(header, arrays, np.array(header["frame_times"]))
+
+
+def convert_text(
+    basepath, basename, invariant="MAX_PRINCIPAL", region="PART-1-1.EB1"
+):
+    """Convert the text results of a subject to the binary store.
+
+    Args:
+        basepath: The folder of the text results, simulation_results/
+            <basename>.
+        basename: The subject.
+        invariant: The invariant of the fields.
+        region: The region of the fields.
+
+    Returns:
+        The results folder.
+
+    Raises:
+        IOError: If the percentiles or the frame times are missing.
+    """
+    prefix = os.path.join(basepath, basename)
+    arrays = {
+        "percentiles_95": np.loadtxt(
+            prefix + "_strain_percentiles_95.txt", ndmin=2
+        )
+    }
+    frame_times = np.loadtxt(prefix + "_frame_times.txt", ndmin=1)
+    # the full fields are optional
+    for name, suffix in (
+        ("strain", "_strain_data.txt"),
+        ("strain_rate", "_strainrate_data.txt"),
+    ):
+        if os.path.isfile(prefix + suffix):
+            arrays[name] = np.loadtxt(prefix + suffix, ndmin=2)
+    folder = results_folder(basepath, basename)
+    write_results(folder, arrays, frame_times, invariant, region)
+    return folder
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Convert text results to the binary result store."
+    )
+    parser.add_argument(
+        "-l",
+        "--list",
+        required=False,
+        type=str,
+        default="abaqus_mesh/mesh_list_run1.txt",
+        help="Path to the mesh list.",
+    )
+    parser.add_argument(
+        "-r",
+        "--results",
+        required=False,
+        type=str,
+        default="simulation_results",
+        help="Path to the simulation results folder.",
+    )
+    args = parser.parse_args()
+
+    for input_file in np.loadtxt(args.list, dtype=str, ndmin=1):
+        basename = input_file[:-4]  # remove ".inp"
+        try:
+            folder = convert_text(
+                os.path.join(args.results, basename), basename
+            )
+        except IOError as error:
+            print("Skipping %s: %s" % (basename, error))
+            continue
+        print("Converted:", folder)
@@ -0,0 +1,331 @@
+"""This module writes compact Abaqus *Amplitude cards, such as AMP-1 of
+abaqus_inp_files/loads.inp, a measured trace tabulated every microsecond
+over some 28,000 lines, mostly zeros.
+
+A load curve is either read from the *Amplitude cards of an .inp file or
+generated from a parametric pulse (pulse): a rise to the peak, a fall back
+to zero, the whole pulse lasting its duration, shaped as a sine, haversine,
+or triangle, after a start delay and held at zero up to an end time.
+
+The curve is then simplified to a reduced set of breakpoints that Abaqus,
+which interpolates an amplitude linearly in time, follows within a
+tolerance (simplify, the Ramer-Douglas-Peucker algorithm on the error in
+amplitude), and the largest and root-mean-square errors at the original
+samples are reported.
+
+To run, from the repository root, to reduce every amplitude of loads.inp
+within 0.1% of its peak:
+source ~/autotwin/autosim/.venv/bin/activate
+python src/autosim/ssm/amplitude.py \
+    -i abaqus_inp_files/loads.inp \
+    -o abaqus_inp_files/loads_compact.inp \
+    -r 1e-3
+
+or to generate a half-sine pulse as AMP-1, with AMP-2 held at zero:
+python src/autosim/ssm/amplitude.py \
+    -o loads_pulse.inp \
+    --shape sine --rise 0.004 --peak 8000 --duration 0.008 \
+    --start 0.00007 --end 0.08
+
+To use a compact deck, include it in place of loads.inp in
+base_template.inp.
+
+To test:
+pytest --cov --cov-report=term-missing
+"""
+
+import argparse
+import re
+from pathlib import Path
+from typing import Final, NamedTuple
+
+import numpy as np
+
+PAIRS_PER_LINE: Final[int] = 4  # Abaqus reads up to 8 values per line
+RELATIVE_TOLERANCE: Final[float] = 1e-3  # of the peak magnitude
+SAMPLE_INTERVAL: Final[float] = 1e-6  # seconds, as loads.inp
+SHAPES: Final[tuple[str, ...]] = ("sine", "haversine", "triangle")
+KEYWORD: Final[re.Pattern] = re.compile(
+    r"^\*amplitude\s*,.*?name\s*=\s*([^,\s]+)", re.IGNORECASE
+)
+
+
+class Reduction(NamedTuple):
+    """An amplitude reduced to breakpoints, and its error."""
+
+    name: str
+    points: np.ndarray  # (n, 2) float, time and amplitude
+    n_original: int
+    max_error: float  # at the original samples
+    rms_error: float
+
+
+def read_amplitudes(path: Path) -> dict[str, np.ndarray]:
+    """Read the tabular *Amplitude cards of an .inp file.
+
+    Args:
+        path: The .inp file.
+
+    Returns:
+        The (n, 2) time and amplitude points, by amplitude name, in file
+        order.
+    """
+    amplitudes: dict[str, list[float]] = {}
+    current: list[float] | None = None
+    with open(path) as file:
+        for line in file:
+            stripped = line.strip()
+            if stripped.startswith("**") or not stripped:
+                continue
+            if stripped.startswith("*"):
+                match = KEYWORD.match(stripped)
+                current = None
+                if match is not None:
+                    current = amplitudes.setdefault(match.group(1), [])
+                continue
+            if current is not None:
+                current.extend(
+                    float(item) for item in stripped.split(",") if item.strip()
+                )
+    return {
+        name: np.array(values).reshape(-1, 2)
+        for name, values in amplitudes.items()
+    }
+
+
+def pulse(
+    shape: str,
+    rise: float,
+    peak: float,
+    duration: float,
+    start: float = 0.0,
+    end: float | None = None,
+    dt: float = SAMPLE_INTERVAL,
+) -> np.ndarray:
+    """Sample a pulse: zero, a rise to the peak, a fall to zero, then zero.
+
+    Args:
+        shape: "sine" (quarter sines up and down, a half sine if the rise
+            is half the duration), "haversine" (half cosines, with zero
+            slope at the ends and the peak), or "triangle" (linear).
+        rise: The time from the start of the pulse to its peak.
+        peak: The peak amplitude.
+        duration: The time from the start of the pulse to its end.
+        start: The time the pulse starts.
+        end: The time of the last point, None for the end of the pulse.
+        dt: The sample interval.
+
+    Returns:
+        The (n, 2) time and amplitude points.
+
+    Raises:
+        ValueError: If the shape is unknown or the times are inconsistent.
+    """
+    if shape not in SHAPES:
+        raise ValueError(f"Unknown shape {shape!r}, expected one of {SHAPES}.")
+    end = start + duration if end is None else end
+    if not 0 < rise < duration or start < 0 or end < start + duration:
+        msg = f"Inconsistent pulse: rise {rise}, duration {duration},"
+        msg += f" start {start}, end {end}."
+        raise ValueError(msg)
+
+    n_pulse = round(duration / dt)
+    tau = np.linspace(0.0, duration, n_pulse + 1)
+    # phase 0 to 1 on the rise, 1 to 0 on the fall
+    phase = np.where(
+        tau <= rise, tau / rise, (duration - tau) / (duration - rise)
+    )
+    if shape == "sine":
+        values = np.sin(0.5 * np.pi * phase)
+    elif shape == "haversine":
+        values = 0.5 * (1.0 - np.cos(np.pi * phase))
+    else:
+        values = phase
+    times = start + tau
+    points = np.column_stack([times, peak * values])
+    if start > 0:
+        points = np.vstack([[0.0, 0.0], points])
+    if end > times[-1]:
+        points = np.vstack([points, [end, 0.0]])
+    return points
+
+
+def simplify(points: np.ndarray, tolerance: float) -> np.ndarray:
+    """Keep a reduced set of points whose linear interpolation stays within
+    a tolerance of every point (Ramer-Douglas-Peucker, on the amplitude).
+
+    Args:
+        points: The (n, 2) time and amplitude points, time increasing.
+        tolerance: The largest error in amplitude.
+
+    Returns:
+        The sorted indices of the kept points, with the first and last.
+    """
+    n = len(points)
+    if n <= 2:
+        return np.arange(n)
+    times, values = points[:, 0], points[:, 1]
+    keep = np.zeros(n, dtype=bool)
+    keep[[0, -1]] = True
+    segments = [(0, n - 1)]
+    while segments:
+        first, last = segments.pop()
+        if last - first < 2:
+            continue
+        inner = slice(first + 1, last)
+        slope = (values[last] - values[first]) / (times[last] - times[first])
+        line = values[first] + slope * (times[inner] - times[first])
+        errors = np.abs(values[inner] - line)
+        worst = int(np.argmax(errors))
+        if errors[worst] > tolerance:
+            split = first + 1 + worst
+            keep[split] = True
+            segments += [(first, split), (split, last)]
+    return np.flatnonzero(keep)
+
+
+def reduce_amplitude(
+    name: str, points: np.ndarray, tolerance: float
+) -> Reduction:
+    """Reduce an amplitude to breakpoints, and measure the error.
+
+    Args:
+        name: The amplitude name.
+        points: The (n, 2) time and amplitude points.
+        tolerance: The largest error in amplitude.
+
+    Returns:
+        The reduction.
+    """
+    reduced = points[simplify(points, tolerance)]
+    errors = points[:, 1] - np.interp(points[:, 0], *reduced.T)
+    return Reduction(
+        name=name,
+        points=reduced,
+        n_original=len(points),
+        max_error=float(np.max(np.abs(errors), initial=0.0)),
+        rms_error=float(np.sqrt(np.mean(errors**2))) if len(errors) else 0.0,
+    )
+
+
+def amplitude_card(name: str, points: np.ndarray) -> str:
+    """Format a tabular *Amplitude card.
+
+    Args:
+        name: The amplitude name.
+        points: The (n, 2) time and amplitude points.
+
+    Returns:
+        The card, PAIRS_PER_LINE pairs per line.
+    """
+    lines = [f"*Amplitude, name={name}"]
+    for row in range(0, len(points), PAIRS_PER_LINE):
+        pairs = points[row : row + PAIRS_PER_LINE]
+        lines.append(", ".join(f"{t:.9g}, {a:.9g}" for t, a in pairs))
+    return "\n".join(lines) + "\n"
+
+
+def write_amplitudes(reductions: list[Reduction], path: Path) -> None:
+    """Write the *Amplitude cards of reduced amplitudes to an .inp file."""
+    path.write_text(
+        "".join(amplitude_card(item.name, item.points) for item in reductions)
+    )
+
+
+def report(item: Reduction) -> str:
+    """Describe a reduction: its points before and after, and its error."""
+    peak = float(np.max(np.abs(item.points[:, 1]), initial=0.0))
+    relative = item.max_error / peak if peak > 0 else 0.0
+    return (
+        f"{item.name}: {item.n_original} -> {len(item.points)} points,"
+        f" max error {item.max_error:.6g} ({relative:.3%} of peak),"
+        f" rms error {item.rms_error:.6g}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Write compact *Amplitude cards, from an .inp file or "
+        "a parametric pulse."
+    )
+    parser.add_argument(
+        "-i",
+        "--input",
+        required=False,
+        type=str,
+        help="Path to an .inp file with tabular *Amplitude cards.",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        required=True,
+        type=str,
+        help="Path to the .inp file to write.",
+    )
+    parser.add_argument(
+        "-t",
+        "--tolerance",
+        required=False,
+        type=float,
+        default=None,
+        help="Largest error in amplitude, overrides --relative.",
+    )
+    parser.add_argument(
+        "-r",
+        "--relative",
+        required=False,
+        type=float,
+        default=RELATIVE_TOLERANCE,
+        help="Largest error as a fraction of the peak of each amplitude.",
+    )
+    parser.add_argument("--shape", choices=SHAPES, help="Pulse shape.")
+    parser.add_argument("--rise", type=float, help="Time to the peak.")
+    parser.add_argument("--peak", type=float, help="Peak amplitude.")
+    parser.add_argument("--duration", type=float, help="Pulse duration.")
+    parser.add_argument(
+        "--start", type=float, default=0.0, help="Pulse start time."
+    )
+    parser.add_argument(
+        "--end", type=float, default=None, help="Time of the last point."
+    )
+    args = parser.parse_args()
+
+    if args.input is not None:
+        amplitudes = read_amplitudes(Path(args.input).expanduser())
+    elif args.shape is not None:
+        missing = [
+            f"--{name}"
+            for name in ("rise", "peak", "duration")
+            if getattr(args, name) is None
+        ]
+        if missing:
+            parser.error(f"A pulse (--shape) needs {', '.join(missing)}.")
+        try:
+            points = pulse(
+                args.shape,
+                args.rise,
+                args.peak,
+                args.duration,
+                args.start,
+                args.end,
+            )
+        except ValueError as error:
+            parser.error(str(error))
+        # AMP-2 holds the other DOFs at zero, see step_case1.inp
+        amplitudes = {
+            "AMP-1": points,
+            "AMP-2": np.array([[0.0, 0.0], [points[-1, 0], 0.0]]),
+        }
+    else:
+        parser.error("Give an input file (-i) or a pulse shape (--shape).")
+
+    reductions = []
+    for name, points in amplitudes.items():
+        peak = float(np.max(np.abs(points[:, 1]), initial=0.0))
+        tolerance = args.tolerance
+        if tolerance is None:
+            tolerance = args.relative * peak
+        reductions.append(reduce_amplitude(name, points, tolerance))
+        print(report(reductions[-1]))
+    write_amplitudes(reductions, Path(args.output).expanduser())
+    print(f"Wrote {args.output}")
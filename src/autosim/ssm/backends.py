@@ -0,0 +1,428 @@
+"""This module submits batch jobs through one interface (Backend) to a local
+process, SGE, or Slurm, or to an in-process fake scheduler for tests and
+benchmarks of the batch orchestration on a laptop.
+
+A job is a Submission: the mesh passed to the job script, and the slots
+(cores) and h_rt (wall time limit) it asks for.  Every backend can
+* submit a job, returning its job ID,
+* submit an array of jobs as one job ID, the meshes listed one per line in
+  a file, of which the job script reads line TASK_ID (see
+  submit_job_sge.sh),
+* poll the job IDs still queued or running (active), and
+* cancel a job.
+
+The job script sees its slots as NSLOTS (SGE, local) or
+SLURM_CPUS_PER_TASK (Slurm).
+
+The fake scheduler runs on a simulated clock, advanced by its sleep in
+place of time.sleep.  A job waits a queue delay after its submission, then
+starts in submission order once enough of the cluster slots are free, and
+runs for its duration, by default its expected_h.
+
+To test:
+pytest --cov --cov-report=term-missing
+"""
+
+import getpass
+import math
+import os
+import re
+import subprocess
+import time
+from pathlib import Path
+from typing import Final, NamedTuple, Protocol
+
+SUBMIT_SCRIPT: Final[str] = "submit_job_sge.sh"
+LOG_FOLDER: Final[Path] = Path("logs")  # job logs and array mesh lists
+POLL_TIMEOUT: Final[float] = 300.0  # seconds before a queue poll gives up
+
+
+class Submission(NamedTuple):
+    """A job to submit, with its resources and expected wall time."""
+
+    mesh: str  # file name in the mesh folder, as in the mesh list
+    slots: int
+    h_rt: str  # hh:mm:ss
+    expected_h: float  # predicted wall time, hours
+
+
+class Backend(Protocol):
+    """Submits, polls, and cancels batch jobs."""
+
+    def submit(self, submission: Submission) -> str:
+        """Submit a job and return its job ID."""
+        ...
+
+    def submit_array(self, submissions: list[Submission]) -> str:
+        """Submit jobs as one array job and return its job ID."""
+        ...
+
+    def active(self, job_ids: set[str]) -> set[str]:
+        """Return the job IDs among job_ids that are queued or running."""
+        ...
+
+    def cancel(self, job_id: str) -> None:
+        """Cancel a queued or running job."""
+        ...
+
+
+def h_rt_seconds(h_rt: str) -> int:
+    """Return the seconds of an h_rt, e.g., 3600 for "01:00:00"."""
+    hours, minutes, seconds = (int(item) for item in h_rt.split(":"))
+    return (hours * 60 + minutes) * 60 + seconds
+
+
+def _array_resources(submissions: list[Submission]) -> tuple[int, str]:
+    """Return the slots and h_rt of an array, the largest of its tasks.
+
+    Raises:
+        ValueError: If the array is empty.
+    """
+    if not submissions:
+        raise ValueError("An array job needs at least one submission.")
+    slots = max(item.slots for item in submissions)
+    h_rt = max((item.h_rt for item in submissions), key=h_rt_seconds)
+    return slots, h_rt
+
+
+def _write_mesh_list(submissions: list[Submission], folder: Path) -> Path:
+    """Write the meshes of an array job, one per line, line i for task i."""
+    folder.mkdir(parents=True, exist_ok=True)
+    path = folder.joinpath(f"array_{time.time_ns()}.txt")
+    path.write_text("".join(f"{item.mesh}\n" for item in submissions))
+    return path
+
+
+def _run(command: list[str], what: str) -> str:
+    """Run a scheduler command and return its stdout.
+
+    Raises:
+        RuntimeError: If the command fails.
+    """
+    result = subprocess.run(
+        command, capture_output=True, text=True, check=False
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"{command[0]} failed for {what}: {result.stderr}")
+    return result.stdout
+
+
+def _poll(command: list[str]) -> str | None:
+    """Run a queue listing command and return its stdout, or None, with a
+    message, if it fails or times out, e.g., while the scheduler is busy.
+    """
+    try:
+        result = subprocess.run(
+            command,
+            capture_output=True,
+            text=True,
+            check=False,
+            timeout=POLL_TIMEOUT,
+        )
+    except subprocess.TimeoutExpired:
+        print(f"[{time.ctime()}] {command[0]} timed out, polling again later")
+        return None
+    if result.returncode != 0:
+        print(
+            f"[{time.ctime()}] {command[0]} failed with exit status"
+            f" {result.returncode}, polling again later: {result.stderr}"
+        )
+        return None
+    return result.stdout
+
+
+class SgeBackend:
+    """Submits jobs with qsub, polls them with qstat, cancels with qdel."""
+
+    def __init__(
+        self, script: str = SUBMIT_SCRIPT, log_folder: Path = LOG_FOLDER
+    ):
+        self.script = script
+        self.log_folder = log_folder
+
+    def _qsub(self, options: list[str], argument: str) -> str:
+        stdout = _run(["qsub", *options, self.script, argument], argument)
+        # e.g., Your job 123456 ("submit_job_sge.sh") has been submitted
+        # or Your job-array 123456.1-4:1 ("submit_job_sge.sh") has been ...
+        match = re.search(r"Your job(?:-array)? (\d+)", stdout)
+        if match is None:
+            raise RuntimeError(f"qsub gave no job ID for {argument}: {stdout}")
+        return match.group(1)
+
+    def submit(self, submission: Submission) -> str:
+        """Submit a job and return its job ID.
+
+        Raises:
+            RuntimeError: If qsub fails or its output has no job ID.
+        """
+        options = ["-pe", "omp", str(submission.slots)]
+        options += ["-l", f"h_rt={submission.h_rt}"]
+        return self._qsub(options, submission.mesh)
+
+    def submit_array(self, submissions: list[Submission]) -> str:
+        """Submit jobs as one array job and return its job ID."""
+        slots, h_rt = _array_resources(submissions)
+        mesh_list = _write_mesh_list(submissions, self.log_folder)
+        options = ["-t", f"1-{len(submissions)}", "-pe", "omp", str(slots)]
+        options += ["-l", f"h_rt={h_rt}"]
+        return self._qsub(options, str(mesh_list))
+
+    def active(self, job_ids: set[str]) -> set[str]:
+        """Return the job IDs among job_ids that are queued or running, all
+        of them if qstat fails."""
+        stdout = _poll(["qstat", "-u", getpass.getuser()])
+        if stdout is None:
+            return set(job_ids)
+        listed = {
+            line.split()[0]
+            for line in stdout.splitlines()
+            if line.strip() and line.split()[0].isdigit()
+        }
+        return job_ids & listed
+
+    def cancel(self, job_id: str) -> None:
+        """Cancel a queued or running job with qdel."""
+        _run(["qdel", job_id], job_id)
+
+
+class SlurmBackend:
+    """Submits jobs with sbatch, polls them with squeue, cancels with
+    scancel."""
+
+    def __init__(
+        self, script: str = SUBMIT_SCRIPT, log_folder: Path = LOG_FOLDER
+    ):
+        self.script = script
+        self.log_folder = log_folder
+
+    def _sbatch(self, options: list[str], argument: str) -> str:
+        command = ["sbatch", "--parsable", *options, self.script, argument]
+        stdout = _run(command, argument)
+        # e.g., 123456 or 123456;cluster
+        job_id = stdout.strip().split(";")[0]
+        if not job_id.isdigit():
+            msg = f"sbatch gave no job ID for {argument}: {stdout}"
+            raise RuntimeError(msg)
+        return job_id
+
+    def submit(self, submission: Submission) -> str:
+        """Submit a job and return its job ID.
+
+        Raises:
+            RuntimeError: If sbatch fails or its output has no job ID.
+        """
+        options = [
+            f"--cpus-per-task={submission.slots}",
+            f"--time={submission.h_rt}",
+            f"--output={self.log_folder}/%x-%j.out",
+        ]
+        return self._sbatch(options, submission.mesh)
+
+    def submit_array(self, submissions: list[Submission]) -> str:
+        """Submit jobs as one array job and return its job ID."""
+        slots, h_rt = _array_resources(submissions)
+        mesh_list = _write_mesh_list(submissions, self.log_folder)
+        options = [
+            f"--array=1-{len(submissions)}",
+            f"--cpus-per-task={slots}",
+            f"--time={h_rt}",
+            f"--output={self.log_folder}/%x-%A_%a.out",
+        ]
+        return self._sbatch(options, str(mesh_list))
+
+    def active(self, job_ids: set[str]) -> set[str]:
+        """Return the job IDs among job_ids that are queued or running, all
+        of them if squeue fails."""
+        stdout = _poll(["squeue", "-h", "-u", getpass.getuser(), "-o", "%i"])
+        if stdout is None:
+            return set(job_ids)
+        # array tasks are listed as <job ID>_<task> or <job ID>_[<tasks>]
+        listed = {line.split("_")[0].strip() for line in stdout.splitlines()}
+        return job_ids & listed
+
+    def cancel(self, job_id: str) -> None:
+        """Cancel a queued or running job with scancel."""
+        _run(["scancel", job_id], job_id)
+
+
+class LocalBackend:
+    """Runs every job as a local process of the job script, at once."""
+
+    def __init__(
+        self, script: str = SUBMIT_SCRIPT, log_folder: Path = LOG_FOLDER
+    ):
+        self.script = script
+        self.log_folder = log_folder
+        self.processes: dict[str, list[subprocess.Popen]] = {}
+
+    def _start(
+        self, argument: str, slots: int, name: str, task_id: int | None
+    ) -> subprocess.Popen:
+        env = {**os.environ, "NSLOTS": str(slots)}
+        if task_id is not None:
+            env["SGE_TASK_ID"] = str(task_id)
+        self.log_folder.mkdir(parents=True, exist_ok=True)
+        with open(self.log_folder.joinpath(f"{name}.log"), "w") as log:
+            return subprocess.Popen(
+                ["bash", self.script, argument],
+                stdout=log,
+                stderr=subprocess.STDOUT,
+                env=env,
+            )
+
+    def submit(self, submission: Submission) -> str:
+        """Start a job and return its job ID."""
+        job_id = str(len(self.processes) + 1)
+        process = self._start(
+            submission.mesh, submission.slots, f"local-{job_id}", None
+        )
+        self.processes[job_id] = [process]
+        return job_id
+
+    def submit_array(self, submissions: list[Submission]) -> str:
+        """Start the tasks of an array job and return its job ID."""
+        slots, _ = _array_resources(submissions)
+        mesh_list = _write_mesh_list(submissions, self.log_folder)
+        job_id = str(len(self.processes) + 1)
+        self.processes[job_id] = [
+            self._start(str(mesh_list), slots, f"local-{job_id}.{task}", task)
+            for task in range(1, len(submissions) + 1)
+        ]
+        return job_id
+
+    def active(self, job_ids: set[str]) -> set[str]:
+        """Return the job IDs among job_ids with a process still running."""
+        return {
+            job_id
+            for job_id in job_ids
+            if any(item.poll() is None for item in self.processes[job_id])
+        }
+
+    def cancel(self, job_id: str) -> None:
+        """Kill the processes of a job."""
+        for item in self.processes[job_id]:
+            if item.poll() is None:
+                item.kill()
+                item.wait()
+
+
+class FakeScheduler:
+    """Simulates a cluster queue with a number of slots, on a simulated
+    clock."""
+
+    def __init__(
+        self,
+        slots: int = 16,
+        queue_delay: float = 0.0,
+        durations: dict[str, float] | None = None,
+    ):
+        """
+        Args:
+            slots: The slots of the cluster.
+            queue_delay: The seconds a job waits after its submission.
+            durations: The seconds a job runs, by mesh; 3600 expected_h for
+                the others.
+        """
+        self.slots = slots
+        self.queue_delay = queue_delay
+        self.durations = durations or {}
+        self.clock = 0.0  # seconds
+        self.submitted: list[Submission] = []
+        self.started: dict[str, float] = {}  # start time by task ID
+        self._queued: list[tuple[str, Submission, float]] = []
+        self._running: dict[str, tuple[int, float]] = {}  # slots, end
+        self._tasks: dict[str, list[str]] = {}  # task IDs by job ID
+
+    def _enqueue(self, task_id: str, submission: Submission) -> None:
+        if submission.slots > self.slots:
+            msg = f"Job {submission.mesh} asks for {submission.slots} slots"
+            msg += f" of {self.slots}."
+            raise ValueError(msg)
+        self.submitted.append(submission)
+        eligible = self.clock + self.queue_delay
+        self._queued.append((task_id, submission, eligible))
+
+    def submit(self, submission: Submission) -> str:
+        """Queue a job and return its job ID.
+
+        Raises:
+            ValueError: If the job asks for more slots than the cluster.
+        """
+        job_id = str(len(self._tasks) + 1)
+        self._enqueue(job_id, submission)
+        self._tasks[job_id] = [job_id]
+        self._advance(self.clock)
+        return job_id
+
+    def submit_array(self, submissions: list[Submission]) -> str:
+        """Queue the tasks of an array job and return its job ID."""
+        _array_resources(submissions)
+        job_id = str(len(self._tasks) + 1)
+        self._tasks[job_id] = []
+        for task, submission in enumerate(submissions, start=1):
+            self._enqueue(f"{job_id}.{task}", submission)
+            self._tasks[job_id].append(f"{job_id}.{task}")
+        self._advance(self.clock)
+        return job_id
+
+    def _start_jobs(self) -> None:
+        """Start queued jobs, in order, while the first eligible one fits."""
+        free = self.slots - sum(slots for slots, _ in self._running.values())
+        waiting = []
+        blocked = False
+        for task_id, submission, eligible in self._queued:
+            if blocked or eligible > self.clock or submission.slots > free:
+                blocked = blocked or (
+                    eligible <= self.clock and submission.slots > free
+                )
+                waiting.append((task_id, submission, eligible))
+                continue
+            duration = self.durations.get(
+                submission.mesh, submission.expected_h * 3600.0
+            )
+            self._running[task_id] = (submission.slots, self.clock + duration)
+            self.started[task_id] = self.clock
+            free -= submission.slots
+        self._queued = waiting
+
+    def _advance(self, until: float) -> None:
+        """Run the simulation up to a time."""
+        while True:
+            self._start_jobs()
+            events = [end for _, end in self._running.values()]
+            events += [
+                eligible
+                for _, _, eligible in self._queued
+                if eligible > self.clock
+            ]
+            next_event = min(events, default=math.inf)
+            if next_event > until:
+                break
+            self.clock = next_event
+            self._running = {
+                task_id: (slots, end)
+                for task_id, (slots, end) in self._running.items()
+                if end > self.clock
+            }
+        self.clock = max(self.clock, until)
+
+    def sleep(self, seconds: float) -> None:
+        """Advance the simulated clock, in place of time.sleep."""
+        self._advance(self.clock + seconds)
+
+    def active(self, job_ids: set[str]) -> set[str]:
+        """Return the job IDs among job_ids with a task queued or running."""
+        unfinished = set(self._running)
+        unfinished.update(task_id for task_id, _, _ in self._queued)
+        return {
+            job_id
+            for job_id in job_ids
+            if unfinished.intersection(self._tasks[job_id])
+        }
+
+    def cancel(self, job_id: str) -> None:
+        """Remove the tasks of a job from the queue and the cluster."""
+        tasks = set(self._tasks[job_id])
+        self._queued = [item for item in self._queued if item[0] not in tasks]
+        for task_id in tasks:
+            self._running.pop(task_id, None)
@@ -1,6 +1,6 @@
-"""This module reads a segmentation in .npy format and returns the center
-of geometry of the segmented assembly, allowing for certain segmentation
-IDs to be ignored.
+"""This module reads a segmentation in .npy, .npz, .spn, or .raw format
+(see segmentation_io.py) and returns the center of geometry of the segmented
+assembly, allowing for certain segmentation IDs to be ignored.
 
 To run:
 source ~/automesh/autosim/.venv/bin/activate
@@ -8,6 +8,15 @@ python ~/automesh/autosim/ssm/center_of_geometry.py \
     -i ~/automesh/autosim/ssm/letter_f.npy \
     -r 0
 
+For segmentations too large to hold several copies in memory, add
+--stream to memory map the .npy and walk it in slabs:
+python ~/automesh/autosim/ssm/center_of_geometry.py \
+    -i ~/scratch/ixi/input/IXI012-HH-1211-T1_large.npy \
+    -r 0 --stream --slab-size 32
+
+For a whole ensemble directory in parallel, with cached results, see
+ensemble_statistics.py.
+
 To test:
 pytest --cov --cov-report=term-missing
 
@@ -21,6 +30,12 @@ from typing import List, NamedTuple
 
 import numpy as np
 
+from autosim.ssm.segmentation_io import (
+    SLAB_SIZE,
+    SUFFIXES,
+    read_segmentation,
+)
+
 
 class CliCommand(NamedTuple):
     """A full command line with arguments, equilvalent to what the user would
@@ -63,9 +78,6 @@ def center_of_geometry(xx: Segmentation) -> np.ndarray:
         msg += f" Valid IDs: {included_ids}, remove IDs: {xx.remove}"
         raise ValueError(msg)
 
-    # Get the coordinates of the valid IDs
-    indices = np.argwhere(np.isin(xx.segmentation, included_ids))
-
     # Account for the offset of the indices
     # which is +0.5 in each of the (x, y, z) directions
     indices_offset = indices + 0.5
@@ -75,6 +87,77 @@ def center_of_geometry(xx: Segmentation) -> np.ndarray:
     return cog
 
 
+def center_of_geometry_streaming(
+    xx: CliCommand, slab_size: int = SLAB_SIZE
+) -> np.ndarray:
+    """Calculate the center of geometry of a segmented assembly without
+    loading the whole segmentation into memory.
+
+    A .npy or .raw file is memory mapped and walked in slabs of `slab_size`
+    planes along the first (slowest-varying, z) axis, so each slab is a
+    contiguous read.  For every slab, the number of kept voxels per index
+    along each axis is accumulated into exact integer per-axis sums and
+    counts.  No N x 3 index array is ever built, and the result equals
+    that of center_of_geometry() with the +0.5 voxel-center offset.
+
+    Args:
+        xx: The command line interface structure.
+        slab_size: The number of first-axis planes read per slab.
+
+    Returns:
+        numpy.ndarray: The center of geometry coordinates.
+
+    Raises:
+        ValueError: If the slab size is not positive or if the
+            segmentation does not include valid IDs.
+    """
+    if slab_size < 1:
+        raise ValueError(f"Slab size must be positive, got {slab_size}.")
+
+    remove = xx.remove if xx.remove is not None else []
+
+    segmentation = read_segmentation(xx.input_file, narrow_dtype=False)
+    ndim = segmentation.ndim
+    n_planes = segmentation.shape[0]
+
+    count = 0  # number of kept voxels
+    sums = np.zeros(ndim, dtype=np.int64)  # per-axis sums of voxel indices
+
+    for start in range(0, n_planes, slab_size):
+        slab = np.asarray(segmentation[start : start + slab_size])
+        keep = ~np.isin(slab, remove)
+
+        n_keep = int(np.count_nonzero(keep))
+        if n_keep == 0:
+            continue
+        count += n_keep
+
+        for axis in range(ndim):
+            others = tuple(aa for aa in range(ndim) if aa != axis)
+            # number of kept voxels at each index along this axis
+            per_index = np.count_nonzero(keep, axis=others).astype(np.int64)
+            index = np.arange(slab.shape[axis], dtype=np.int64)
+            if axis == 0:
+                index += start  # slab offset along the first axis
+            sums[axis] += per_index @ index
+
+    if count == 0:
+        unique_ids = set()
+        for start in range(0, n_planes, slab_size):
+            slab = np.asarray(segmentation[start : start + slab_size])
+            unique_ids.update(np.unique(slab).tolist())
+        included_ids = sorted(unique_ids - set(remove))
+        msg = "Segmentation does not include valid IDs."
+        msg += f" Valid IDs: {included_ids}, remove IDs: {remove}"
+        raise ValueError(msg)
+
+    # Account for the offset of the indices
+    # which is +0.5 in each of the (x, y, z) directions
+    cog = sums / count + 0.5
+
+    return cog
+
+
 def segmentation_and_remove_ids(xx: CliCommand) -> Segmentation:
     """Load the segmentation and ignore IDs from the command line
     interface.
@@ -87,8 +170,8 @@ def segmentation_and_remove_ids(xx: CliCommand) -> Segmentation:
         SegWithRemoveIDs: The segmentation and ignore IDs structure.
     """
 
-    # Load the segmentation
-    segmentation = np.load(xx.input_file)
+    # Load the segmentation, narrowed to the smallest integer type
+    segmentation = read_segmentation(xx.input_file)
 
     # Get the ignore IDs
     remove = xx.remove
@@ -111,17 +194,18 @@ def cli(input_file: Path, remove: list[int]) -> CliCommand:
 
     Raises:
         FileNotFoundError: If the input file does not exist.
-        ValueError: If the input file is not a .npy file or if remove IDs
-            are invalid.
+        ValueError: If the input file is not a .npy, .npz, .spn, or .raw
+            file or if remove IDs are invalid.
     """
 
     # Input file must exist
     if not input_file.is_file():
         raise FileNotFoundError(f"File {input_file} not found.")
 
-    # Input must be a .npy file
-    if input_file.suffix != ".npy":
-        raise ValueError(f"File {input_file} must be a .npy file.")
+    # Input must be a supported segmentation file
+    if input_file.suffix not in SUFFIXES:
+        msg = f"File {input_file} must be one of {', '.join(SUFFIXES)}."
+        raise ValueError(msg)
 
     # Remove IDs must be integers
     if remove and not all(isinstance(i, int) for i in remove):
@@ -147,7 +231,8 @@ if __name__ == "__main__":
         "--input",
         required=True,
         type=str,
-        help="Path to the segmentation file in .npy format.",
+        help="Path to the segmentation file in .npy, .npz, .spn, or .raw "
+        "format.",
     )
     parser.add_argument(
         "-r",
@@ -159,13 +244,30 @@ if __name__ == "__main__":
         default=[],
         help="List of segmentation IDs to ignore.",
     )
+    parser.add_argument(
+        "-s",
+        "--stream",
+        action="store_true",
+        help="Memory map the segmentation and process it in slabs.",
+    )
+    parser.add_argument(
+        "--slab-size",
+        required=False,
+        type=int,
+        default=SLAB_SIZE,
+        help="Number of first-axis planes per slab with --stream.",
+    )
     args = parser.parse_args()
 
     aa: CliCommand = cli(
         input_file=Path(args.input),
         remove=args.remove,
     )
-    bb: Segmentation = segmentation_and_remove_ids(aa)
     # Calculate the center of geometry
-    cc: np.ndarray = center_of_geometry(bb)
+    cc: np.ndarray
+    if args.stream:
+        cc = center_of_geometry_streaming(aa, args.slab_size)
+    else:
+        bb: Segmentation = segmentation_and_remove_ids(aa)
+        cc = center_of_geometry(bb)
     print(f"Center of Geometry: {cc}")
@@ -0,0 +1,228 @@
+"""This module crops a segmentation to the tight bounding box of its kept
+(non-removed) IDs, with an optional padding margin, before meshing.
+
+Cropping shifts voxel indices by the lower corner of the box, the offset.
+The center of geometry passed to automesh as a translation must be shifted
+by the same offset, so that the mesh coordinates are identical to those
+from the uncropped segmentation:
+
+    (i - offset) * scale - (cog - offset) * scale = i * scale - cog * scale
+
+The sidecar of a crop records the content hash of its source, the remove
+IDs, and the padding, and a crop with the same is not written again.
+
+To run:
+source ~/autotwin/autosim/.venv/bin/activate
+python ~/autotwin/autosim/src/autosim/ssm/crop.py \
+    -i ~/scratch/ixi/input/IXI012-HH-1211-T1_large.npy \
+    -o ~/scratch/ixi/cropped/IXI012-HH-1211-T1_large.npy \
+    -r 0 -p 1
+
+To test:
+pytest --cov --cov-report=term-missing
+"""
+
+import argparse
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+
+from autosim.ssm.ensemble_statistics import file_digest
+from autosim.ssm.label_statistics import (
+    LabelStatistics,
+    combine,
+    label_statistics,
+)
+from autosim.ssm.segmentation_io import (
+    read_segmentation,
+    read_sidecar,
+    write_sidecar,
+)
+
+
+class BoundingBox(NamedTuple):
+    """Half-open voxel index box: voxels in [lower, upper) along each
+    axis."""
+
+    lower: np.ndarray  # (3,) inclusive lower voxel index
+    upper: np.ndarray  # (3,) exclusive upper voxel index
+
+
+class CropResult(NamedTuple):
+    """The cropped segmentation file and its placement in the source."""
+
+    output_file: Path
+    offset: np.ndarray  # (3,) voxel index of the crop origin in the source
+    shape: tuple[int, ...]  # shape of the cropped segmentation
+
+
+def bounding_box(
+    stats: LabelStatistics,
+    remove: list[int],
+    shape: tuple[int, ...],
+    padding: int = 0,
+) -> BoundingBox:
+    """Calculate the tight bounding box of the kept IDs, grown by padding
+    voxels on every side and clipped to the segmentation.
+
+    Args:
+        stats: The per-label statistics of the segmentation.
+        remove: Segmentation IDs to exclude, possibly an empty list.
+        shape: The shape of the segmentation.
+        padding: The non-negative margin, in voxels.
+
+    Returns:
+        The bounding box.
+
+    Raises:
+        ValueError: If the padding is negative, or no IDs are kept.
+    """
+    if padding < 0:
+        raise ValueError(f"Padding must be non-negative, got {padding}.")
+
+    kept = combine(stats, remove)
+    lower = np.maximum(kept.lower[0] - padding, 0)
+    upper = np.minimum(kept.upper[0] + padding, np.asarray(shape))
+    return BoundingBox(lower=lower, upper=upper)
+
+
+def crop(segmentation: np.ndarray, box: BoundingBox) -> np.ndarray:
+    """Return the part of a segmentation inside a bounding box.
+
+    Args:
+        segmentation: The segmentation, possibly memory mapped.
+        box: The bounding box.
+
+    Returns:
+        A view of the segmentation inside the box.
+    """
+    return segmentation[
+        box.lower[0] : box.upper[0],
+        box.lower[1] : box.upper[1],
+        box.lower[2] : box.upper[2],
+    ]
+
+
+def cropped_center_of_geometry(
+    cog: np.ndarray, offset: np.ndarray
+) -> np.ndarray:
+    """Shift a center of geometry into the voxel indices of a crop.
+
+    Args:
+        cog: The center of geometry in source voxel indices.
+        offset: The crop offset.
+
+    Returns:
+        The center of geometry in cropped voxel indices.
+    """
+    return np.asarray(cog) - np.asarray(offset)
+
+
+def crop_segmentation(
+    input_file: Path,
+    output_file: Path,
+    remove: list[int],
+    padding: int = 0,
+    stats: LabelStatistics | None = None,
+    digest: str | None = None,
+) -> CropResult:
+    """Write the segmentation cropped to its kept IDs as a .npy file, and
+    record the offset and source in the sidecar of the output, unless the
+    output is a crop of the same source content, remove IDs, and padding.
+
+    Args:
+        input_file: The segmentation file, in any supported format.
+        output_file: The cropped .npy file to write.
+        remove: Segmentation IDs to exclude, possibly an empty list.
+        padding: The non-negative margin, in voxels.
+        stats: The per-label statistics of the segmentation, computed if
+            None.
+        digest: The content hash of the segmentation file, computed if
+            None.
+
+    Returns:
+        The cropped file, offset, and shape.
+    """
+    if digest is None:
+        digest = file_digest(input_file)
+    identity = {
+        "source_digest": digest,
+        "remove": sorted(remove),
+        "padding": padding,
+    }
+    sidecar = read_sidecar(output_file) if output_file.is_file() else {}
+    if all(sidecar.get(key) == value for key, value in identity.items()):
+        return CropResult(
+            output_file=output_file,
+            offset=np.asarray(sidecar["offset"]),
+            shape=np.load(output_file, mmap_mode="r").shape,
+        )
+
+    segmentation = read_segmentation(input_file)
+    if stats is None:
+        stats = label_statistics(segmentation)
+
+    box = bounding_box(stats, remove, segmentation.shape, padding)
+    cropped = np.ascontiguousarray(crop(segmentation, box))
+
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    np.save(output_file, cropped)
+    write_sidecar(
+        output_file,
+        offset=box.lower.tolist(),
+        source=str(input_file),
+        source_shape=list(segmentation.shape),
+        **identity,
+    )
+
+    return CropResult(
+        output_file=output_file, offset=box.lower, shape=cropped.shape
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Crop a segmentation to the bounding box of its kept IDs."
+    )
+    parser.add_argument(
+        "-i",
+        "--input",
+        required=True,
+        type=str,
+        help="Path to the segmentation file.",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        required=True,
+        type=str,
+        help="Path to the cropped segmentation file in .npy format.",
+    )
+    parser.add_argument(
+        "-r",
+        "--remove",
+        required=False,
+        type=int,
+        nargs="*",
+        default=[],
+        help="List of segmentation IDs to ignore.",
+    )
+    parser.add_argument(
+        "-p",
+        "--padding",
+        required=False,
+        type=int,
+        default=0,
+        help="Margin, in voxels, around the bounding box.",
+    )
+    args = parser.parse_args()
+
+    result = crop_segmentation(
+        input_file=Path(args.input).expanduser(),
+        output_file=Path(args.output).expanduser(),
+        remove=args.remove,
+        padding=args.padding,
+    )
+    print(f"Cropped to shape {result.shape} at offset {result.offset}.")
+    print(f"Wrote {result.output_file}")
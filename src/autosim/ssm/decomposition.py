@@ -0,0 +1,257 @@
+"""This module decomposes .exo meshes for parallel simulation with SEACAS
+decomp, running several decompositions at once.
+
+Every mesh is moved into its own subfolder of the .exo folder, as
+mesh_to_sim.py expects, and decomp runs with that subfolder as its working
+directory, passed to the process rather than set with os.chdir, so the
+stage can run in parallel and be imported.  decomp writes the pieces
+<name>.exo.<N>.<rank> next to the mesh; a mesh whose N pieces all exist
+and are newer than the mesh is skipped.
+
+Concurrency is bounded by a core and a memory budget (see executor.py),
+with the memory of each decomposition estimated from the size of its mesh.
+
+The number of pieces can be chosen per mesh, from its number of elements
+and a target range of elements per rank (select_processors).  The element
+count is read from the netCDF header of the .exo file only, the num_elem
+dimension, without loading the mesh.
+
+To test:
+pytest --cov --cov-report=term-missing
+"""
+
+import math
+import struct
+from pathlib import Path
+from typing import BinaryIO, Final, NamedTuple
+
+from autosim.ssm.executor import Job, JobResult, run_jobs
+
+DECOMP: Final[str] = "decomp"  # SEACAS decomp script
+MEMORY_FACTOR: Final[float] = 8.0  # decomp memory per byte of the mesh
+LOG_FILE: Final[str] = "decomp.log"
+ELEMENTS_PER_RANK: Final[tuple[int, int]] = (20_000, 60_000)  # low, high
+NC_DIMENSION: Final[int] = 0x0A  # netCDF classic tag of the dimension list
+
+
+class Decomposition(NamedTuple):
+    """The decomposition of one mesh."""
+
+    mesh: Path  # the mesh in its subfolder
+    processors: int
+    skipped: bool  # True if the pieces were current
+    result: JobResult | None  # None if skipped
+
+
+def _read_int(file: BinaryIO, size: int) -> int:
+    """Read a big-endian integer of 4 or 8 bytes."""
+    return struct.unpack(">i" if size == 4 else ">q", file.read(size))[0]
+
+
+def element_count(exo_file: Path) -> int:
+    """Read the number of elements of an .exo mesh from its header.
+
+    Classic, 64-bit offset, and 64-bit data netCDF files are read directly;
+    their dimensions come first in the header.  netCDF-4 (HDF5) files need
+    the optional netCDF4 package.
+
+    Args:
+        exo_file: The .exo mesh.
+
+    Returns:
+        The num_elem dimension.
+
+    Raises:
+        ValueError: If the file has no num_elem dimension, or is netCDF-4
+            and netCDF4 is not installed.
+    """
+    with open(exo_file, "rb") as file:
+        magic = file.read(4)
+        if magic[:3] == b"CDF" and magic[3] in (1, 2, 5):
+            size = 8 if magic[3] == 5 else 4  # CDF-5 has 64-bit counts
+            _read_int(file, size)  # number of records
+            tag = _read_int(file, 4)
+            n_dimensions = _read_int(file, size)
+            if tag == NC_DIMENSION:
+                for _ in range(n_dimensions):
+                    length = _read_int(file, size)
+                    name = file.read(length).decode()
+                    file.read(-length % 4)  # names are padded to 4 bytes
+                    value = _read_int(file, size)
+                    if name == "num_elem":
+                        return value
+            raise ValueError(f"File {exo_file} has no num_elem dimension.")
+
+    try:
+        import netCDF4  # optional, for netCDF-4 (HDF5) files
+    except ImportError as error:
+        msg = f"File {exo_file} is not a classic netCDF file; reading it"
+        msg += " needs the netCDF4 package."
+        raise ValueError(msg) from error
+    with netCDF4.Dataset(exo_file) as dataset:
+        if "num_elem" not in dataset.dimensions:
+            raise ValueError(f"File {exo_file} has no num_elem dimension.")
+        return dataset.dimensions["num_elem"].size
+
+
+def select_processors(
+    n_elements: int,
+    elements_per_rank: tuple[int, int] = ELEMENTS_PER_RANK,
+    multiple: int = 1,
+) -> int:
+    """Choose the number of ranks of a mesh: the fewest, in multiples of
+    `multiple` (e.g., the cores of a node), that keep the elements per rank
+    at most the high end of the target range, unless that puts fewer than
+    the low end on a rank and fewer ranks are possible.
+
+    Args:
+        n_elements: The number of elements of the mesh.
+        elements_per_rank: The target (low, high) elements per rank.
+        multiple: The granularity of the number of ranks.
+
+    Returns:
+        The number of ranks, at least one.
+
+    Raises:
+        ValueError: If the target range or multiple is invalid.
+    """
+    low, high = elements_per_rank
+    if not 0 < low <= high or multiple < 1:
+        msg = f"Invalid elements per rank {elements_per_rank}"
+        msg += f" or multiple {multiple}."
+        raise ValueError(msg)
+
+    ranks = max(math.ceil(n_elements / high), 1)
+    ranks = math.ceil(ranks / multiple) * multiple
+    if ranks > multiple and n_elements / ranks < low:
+        ranks -= multiple  # rounding up left the ranks underloaded
+    return ranks
+
+
+def pieces(mesh: Path, processors: int) -> list[Path]:
+    """Return the existing decomposed pieces of a mesh.
+
+    Args:
+        mesh: The .exo mesh.
+        processors: The number of pieces.
+
+    Returns:
+        The sorted <name>.exo.<N>.<rank> files next to the mesh.
+    """
+    return sorted(mesh.parent.glob(f"{mesh.name}.{processors}.*"))
+
+
+def is_decomposed(mesh: Path, processors: int) -> bool:
+    """Return True if all pieces of a mesh exist and are newer than it.
+
+    Args:
+        mesh: The .exo mesh.
+        processors: The number of pieces.
+    """
+    found = pieces(mesh, processors)
+    if len(found) != processors:
+        return False
+    source = mesh.stat().st_mtime_ns
+    return all(item.stat().st_mtime_ns >= source for item in found)
+
+
+def find_meshes(exo_folder: Path) -> list[Path]:
+    """Find the meshes of an .exo folder, both new ones and those moved
+    into their subfolders by an earlier run.
+
+    Args:
+        exo_folder: The .exo folder.
+
+    Returns:
+        The sorted .exo meshes, one per name.
+    """
+    meshes = {item.name: item for item in exo_folder.glob("*/*.exo")}
+    meshes = {
+        name: item
+        for name, item in meshes.items()
+        if item.parent.name == item.stem
+    }
+    meshes.update({item.name: item for item in exo_folder.glob("*.exo")})
+    return sorted(meshes.values())
+
+
+def move_to_subfolder(exo_file: Path) -> Path:
+    """Move a mesh into the subfolder named after it, unless it or the
+    subfolder already holds it.
+
+    Args:
+        exo_file: The .exo mesh in the .exo folder or its subfolder.
+
+    Returns:
+        The mesh in its subfolder.
+    """
+    if exo_file.parent.name == exo_file.stem:
+        return exo_file
+    subfolder = exo_file.parent.joinpath(exo_file.stem)
+    subfolder.mkdir(parents=True, exist_ok=True)
+    destination = subfolder.joinpath(exo_file.name)
+    if not destination.exists():
+        exo_file.rename(destination)
+        print(f"Moved {exo_file} to {destination}")
+    else:
+        print(f"File {destination} already exists, skipping move.")
+    return destination
+
+
+def decompose(
+    exo_files: list[Path],
+    processors: int | list[int],
+    cores: int | None = None,
+    memory_gb: float | None = None,
+    decomp: str = DECOMP,
+) -> list[Decomposition]:
+    """Decompose meshes concurrently, skipping those already decomposed.
+
+    Args:
+        exo_files: The .exo meshes, see find_meshes.
+        processors: The number of pieces, for all meshes or per mesh.
+        cores: The core budget, None for all cores.
+        memory_gb: The memory budget, in GB, None for no memory limit.
+        decomp: The decomp command.
+
+    Returns:
+        The decomposition of every mesh, in the order of exo_files.
+    """
+    meshes = [move_to_subfolder(item) for item in exo_files]
+    if isinstance(processors, int):
+        processors = [processors] * len(meshes)
+
+    jobs = []
+    for mesh, n in zip(meshes, processors):
+        if is_decomposed(mesh, n):
+            print(f"Skipping {mesh.name}, pieces are current.")
+            continue
+        jobs.append(
+            Job(
+                name=str(mesh),
+                command=[decomp, "--processors", str(n), mesh.name],
+                log_file=mesh.parent.joinpath(LOG_FILE),
+                memory_gb=mesh.stat().st_size * MEMORY_FACTOR / 1e9,
+                cwd=mesh.parent,
+            )
+        )
+
+    def report(result: JobResult) -> None:
+        status = "done" if result.ok else f"FAILED ({result.returncode})"
+        print(f"  {result.name}: {status} in {result.wall_time:.1f} seconds")
+
+    print(f"Decomposing {len(jobs)} mesh(es)")
+    results = {
+        item.name: item
+        for item in run_jobs(jobs, cores, memory_gb, on_done=report)
+    }
+
+    return [
+        Decomposition(
+            mesh=mesh,
+            processors=n,
+            skipped=str(mesh) not in results,
+            result=results.get(str(mesh)),
+        )
+        for mesh, n in zip(meshes, processors)
+    ]
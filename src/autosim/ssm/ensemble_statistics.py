@@ -0,0 +1,374 @@
+"""This module computes the center of geometry and per-label statistics for
+every segmentation of an ensemble, in parallel, and writes one table of
+results.
+
+Results are cached, keyed on file, content hash, and remove IDs, so a
+rerun only processes new or changed segmentations.  When size and
+modification time are unchanged, a file is not reread at all; when only
+the modification time changed, the file is rehashed and reused if its
+content is unchanged.  A file that fails to process is reported, and the
+rows of the others are still written and cached.
+
+To run:
+source ~/autotwin/autosim/.venv/bin/activate
+python ~/autotwin/autosim/src/autosim/ssm/ensemble_statistics.py \
+    -i ~/scratch/ixi/input/ \
+    -r 0 \
+    -o ~/scratch/ixi/ensemble_statistics.csv \
+    -j 8
+
+or with a glob:
+python ~/autotwin/autosim/src/autosim/ssm/ensemble_statistics.py \
+    -i "~/scratch/ixi/input/*_large.npy" -r 0 -o large.json
+
+To test:
+pytest --cov --cov-report=term-missing
+"""
+
+import argparse
+import csv
+import glob
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Final, NamedTuple
+
+from autosim.ssm.label_statistics import (
+    centroids,
+    combine,
+    label_statistics,
+)
+from autosim.ssm.segmentation_io import SUFFIXES, read_segmentation
+
+CHUNK_SIZE: Final[int] = 1 << 22  # bytes read per hashing step
+COLUMNS: Final[list[str]] = [
+    "file",
+    "size",
+    "mtime_ns",
+    "digest",
+    "remove",
+    "voxels",
+    "cog_x",
+    "cog_y",
+    "cog_z",
+    "lower_x",
+    "lower_y",
+    "lower_z",
+    "upper_x",
+    "upper_y",
+    "upper_z",
+    "ids",
+    "counts",
+]
+
+
+class BatchResult(NamedTuple):
+    """Rows of the results table, the files that were (re)computed or
+    taken from the cache, and the error messages of files that failed."""
+
+    rows: list[dict]
+    computed: list[Path]
+    reused: list[Path]
+    failed: dict[Path, str]
+
+
+def file_digest(path: Path) -> str:
+    """Calculate the content hash of a file, reading it in chunks.
+
+    Args:
+        path: The file to hash.
+
+    Returns:
+        The hexadecimal BLAKE2b digest of the file content.
+    """
+    hasher = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as file:
+        while chunk := file.read(CHUNK_SIZE):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def expand_inputs(pattern: str) -> list[Path]:
+    """Expand a directory or glob pattern to a sorted list of segmentation
+    files.
+
+    Args:
+        pattern: A directory, whose .npy, .npz, .spn, and .raw files are
+            used, or a glob pattern.
+
+    Returns:
+        The sorted, resolved list of matching files.
+
+    Raises:
+        FileNotFoundError: If nothing matches.
+    """
+    path = Path(pattern).expanduser()
+    if path.is_dir():
+        files = sorted(
+            item for item in path.iterdir() if item.suffix in SUFFIXES
+        )
+    else:
+        files = sorted(Path(item) for item in glob.glob(str(path)))
+        files = [item for item in files if item.is_file()]
+
+    if not files:
+        raise FileNotFoundError(f"No segmentation files match {pattern}.")
+
+    return [item.resolve() for item in files]
+
+
+def subject_row(path: Path, remove: list[int], digest: str) -> dict:
+    """Calculate the table row of one segmentation.
+
+    Args:
+        path: The segmentation file.
+        remove: Segmentation IDs to exclude from the assembly.
+        digest: The content hash of the file.
+
+    Returns:
+        The row, with the columns of COLUMNS.
+    """
+    stat = path.stat()
+    stats = label_statistics(read_segmentation(path))
+    kept = combine(stats, remove)
+    cog = centroids(kept)[0]
+    lower = kept.lower[0]
+    upper = kept.upper[0]
+
+    return {
+        "file": str(path),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "digest": digest,
+        "remove": " ".join(map(str, sorted(remove))),
+        "voxels": int(kept.counts[0]),
+        "cog_x": float(cog[0]),
+        "cog_y": float(cog[1]),
+        "cog_z": float(cog[2]),
+        "lower_x": int(lower[0]),
+        "lower_y": int(lower[1]),
+        "lower_z": int(lower[2]),
+        "upper_x": int(upper[0]),
+        "upper_y": int(upper[1]),
+        "upper_z": int(upper[2]),
+        "ids": " ".join(map(str, stats.ids.tolist())),
+        "counts": " ".join(map(str, stats.counts.tolist())),
+    }
+
+
+def cache_key(row: dict) -> tuple[str, str, str]:
+    """Return the cache key of a row: file, content hash, and sorted remove
+    IDs."""
+    return (row["file"], row["digest"], row["remove"])
+
+
+def _process(
+    path: Path, remove: list[int], cached: list[dict]
+) -> tuple[dict, bool]:
+    """Worker: hash a file and compute its row unless a cached row of the
+    file and remove IDs has the same content hash.
+
+    Returns:
+        The row and whether it was computed (True) or reused (False).
+    """
+    digest = file_digest(path)
+    for row in cached:
+        if row["digest"] == digest:
+            stat = path.stat()
+            row = dict(row, size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+            return row, False
+    return subject_row(path, remove, digest), True
+
+
+def load_cache(cache_file: Path) -> dict[tuple[str, str, str], dict]:
+    """Load cached rows, keyed on file, content hash, and remove IDs (see
+    cache_key).
+
+    Args:
+        cache_file: The JSON cache, which need not exist.
+
+    Returns:
+        The cached rows, possibly empty.
+    """
+    if not cache_file.is_file():
+        return {}
+    with open(cache_file, "r") as file:
+        rows = json.load(file)
+    return {cache_key(row): row for row in rows}
+
+
+def write_table(
+    rows: list[dict], output_file: Path, columns: list[str] = COLUMNS
+) -> None:
+    """Write the table of results as .csv or .json, based on the suffix.
+
+    Args:
+        rows: The table rows.
+        output_file: The .csv or .json file to write.
+        columns: The .csv columns, in order.
+
+    Raises:
+        ValueError: If the suffix is neither .csv nor .json.
+    """
+    if output_file.suffix == ".csv":
+        with open(output_file, "w", newline="") as file:
+            writer = csv.DictWriter(file, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(rows)
+    elif output_file.suffix == ".json":
+        with open(output_file, "w") as file:
+            json.dump(rows, file, indent=2)
+    else:
+        raise ValueError(f"File {output_file} must be a .csv or .json file.")
+
+
+def batch_statistics(
+    files: list[Path],
+    remove: list[int],
+    cache_file: Path | None = None,
+    max_workers: int | None = None,
+) -> BatchResult:
+    """Calculate the table rows of many segmentations with a process pool,
+    reusing cached rows of unchanged files.  A file that fails is left out
+    of the rows, with its error message in failed.
+
+    Args:
+        files: The segmentation files.
+        remove: Segmentation IDs to exclude from the assembly.
+        cache_file: The JSON cache to read and update, or None for no
+            caching.
+        max_workers: The size of the process pool, None for all cores.
+
+    Returns:
+        The rows in the order of files, the computed and reused files, and
+        the error messages of the failed files.
+    """
+    key = " ".join(map(str, sorted(remove)))
+    cache = load_cache(cache_file) if cache_file is not None else {}
+    # Cached rows of the same file and remove IDs, one per content hash
+    candidates: dict[str, list[dict]] = {}
+    for (file, _, other), row in cache.items():
+        if other == key:
+            candidates.setdefault(file, []).append(row)
+
+    rows: dict[str, dict] = {}
+    reused: list[Path] = []
+    pending: dict[Path, list[dict]] = {}
+    for path in files:
+        cached = candidates.get(str(path), [])
+        stat = path.stat()
+        current = [
+            row
+            for row in cached
+            if row["size"] == stat.st_size
+            and row["mtime_ns"] == stat.st_mtime_ns
+        ]
+        if current:
+            rows[str(path)] = current[0]
+            reused.append(path)
+        else:
+            pending[path] = cached
+
+    computed: list[Path] = []
+    failed: dict[Path, str] = {}
+    if pending:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                path: executor.submit(_process, path, remove, cached)
+                for path, cached in pending.items()
+            }
+            for path, future in futures.items():
+                try:
+                    row, is_computed = future.result()
+                except (
+                    OSError,
+                    ValueError,
+                    MemoryError,
+                    BrokenProcessPool,
+                ) as error:
+                    failed[path] = f"{type(error).__name__}: {error}"
+                    continue
+                rows[str(path)] = row
+                (computed if is_computed else reused).append(path)
+
+    ordered = [rows[str(path)] for path in files if str(path) in rows]
+
+    if cache_file is not None:
+        cache.update((cache_key(row), row) for row in rows.values())
+        with open(cache_file, "w") as file:
+            json.dump(list(cache.values()), file, indent=2)
+
+    return BatchResult(
+        rows=ordered, computed=computed, reused=reused, failed=failed
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Calculate the center of geometry and per-label "
+        "statistics of every segmentation in a directory or glob."
+    )
+    parser.add_argument(
+        "-i",
+        "--input",
+        required=True,
+        type=str,
+        help="Directory of segmentations, or a glob pattern.",
+    )
+    parser.add_argument(
+        "-r",
+        "--remove",
+        required=False,
+        type=int,
+        nargs="*",
+        default=[],
+        help="List of segmentation IDs to ignore.",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        required=True,
+        type=str,
+        help="Path to the results table in .csv or .json format.",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        required=False,
+        type=int,
+        default=os.cpu_count(),
+        help="Number of worker processes.",
+    )
+    parser.add_argument(
+        "-c",
+        "--cache",
+        required=False,
+        type=str,
+        default=None,
+        help="Path to the JSON result cache, default <output>.cache.json.",
+    )
+    args = parser.parse_args()
+
+    output = Path(args.output).expanduser()
+    cache = (
+        Path(args.cache).expanduser()
+        if args.cache is not None
+        else output.with_name(output.name + ".cache.json")
+    )
+    result = batch_statistics(
+        files=expand_inputs(args.input),
+        remove=args.remove,
+        cache_file=cache,
+        max_workers=args.jobs,
+    )
+    write_table(result.rows, output)
+    print(f"Computed {len(result.computed)} file(s).")
+    print(f"Reused {len(result.reused)} cached file(s).")
+    for path, message in result.failed.items():
+        print(f"Failed {path}: {message}")
+    print(f"Wrote {output}")
+    if result.failed:
+        raise SystemExit(1)
@@ -0,0 +1,213 @@
+"""This module runs external commands, such as automesh, concurrently under
+a core and memory budget.
+
+Every job declares the cores and memory it needs.  Jobs are started in
+order, and a later job that fits the remaining budget is started ahead of
+an earlier one that does not (backfill).  A job that needs more than the
+whole budget is run alone, so it cannot block the queue.  The output of
+every job is streamed to its own log file, not held in memory, and every
+job reports its exit status and wall time.
+
+Example:
+    jobs = [
+        Job(name="a", command=["automesh", ...], log_file=Path("a.log")),
+        Job(name="b", command=["automesh", ...], log_file=Path("b.log")),
+    ]
+    results = run_jobs(jobs, cores=8, memory_gb=64.0)
+    print(failure_summary(results))
+
+To test:
+pytest --cov --cov-report=term-missing
+"""
+
+import os
+import subprocess
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import Final, NamedTuple
+
+POLL_INTERVAL: Final[float] = 0.05  # seconds between checks on running jobs
+NOT_STARTED: Final[int] = 127  # exit status of a command that cannot start
+
+
+class Job(NamedTuple):
+    """An external command and the resources it needs."""
+
+    name: str
+    command: list[str]
+    log_file: Path  # stdout and stderr of the command
+    cores: int = 1
+    memory_gb: float = 0.0
+    cwd: Path | None = None
+
+
+class JobResult(NamedTuple):
+    """The outcome of a job."""
+
+    name: str
+    returncode: int  # negative if terminated by a signal, as in subprocess
+    wall_time: float  # seconds
+    log_file: Path
+
+    @property
+    def ok(self) -> bool:
+        """True if the command exited with status zero."""
+        return self.returncode == 0
+
+
+class _Running(NamedTuple):
+    """A started job, its process, and start time."""
+
+    index: int
+    job: Job
+    process: subprocess.Popen
+    start: float
+
+
+def _fits(
+    job: Job,
+    cores_free: int,
+    memory_free: float | None,
+    idle: bool,
+) -> bool:
+    """Return True if a job can start with the free resources; any job can
+    start when nothing else is running."""
+    if idle:
+        return True
+    if job.cores > cores_free:
+        return False
+    return memory_free is None or job.memory_gb <= memory_free
+
+
+def run_jobs(
+    jobs: list[Job],
+    cores: int | None = None,
+    memory_gb: float | None = None,
+    on_done: Callable[[JobResult], None] | None = None,
+    poll_interval: float = POLL_INTERVAL,
+) -> list[JobResult]:
+    """Run jobs concurrently under a core and memory budget.
+
+    Args:
+        jobs: The jobs to run.
+        cores: The core budget, None for all cores.
+        memory_gb: The memory budget, in GB, None for no memory limit.
+        on_done: Called with the result of every job as it finishes.
+        poll_interval: The seconds between checks on running jobs.
+
+    Returns:
+        The results, in the order of jobs.
+
+    Raises:
+        ValueError: If the core budget is not positive, or a job needs
+            fewer than one core.
+    """
+    if cores is None:
+        cores = os.cpu_count() or 1
+    if cores < 1:
+        raise ValueError(f"Core budget must be positive, got {cores}.")
+    for job in jobs:
+        if job.cores < 1:
+            msg = f"Job {job.name} must need at least one core,"
+            msg += f" got {job.cores}."
+            raise ValueError(msg)
+
+    pending = list(enumerate(jobs))
+    running: list[_Running] = []
+    results: list[JobResult | None] = [None] * len(jobs)
+
+    try:
+        while pending or running:
+            # start every pending job that fits, in order
+            cores_free = cores - sum(item.job.cores for item in running)
+            memory_free = (
+                None
+                if memory_gb is None
+                else memory_gb - sum(item.job.memory_gb for item in running)
+            )
+            waiting = []
+            for index, job in pending:
+                if _fits(job, cores_free, memory_free, idle=not running):
+                    job.log_file.parent.mkdir(parents=True, exist_ok=True)
+                    # the process writes to its own copy of the log, so
+                    # ours is closed once it has started, or failed to
+                    with open(job.log_file, "w") as log:
+                        try:
+                            process = subprocess.Popen(
+                                job.command,
+                                stdout=log,
+                                stderr=subprocess.STDOUT,
+                                cwd=job.cwd,
+                            )
+                        except OSError as error:
+                            # e.g., a missing executable fails this job only
+                            log.write(f"{error}\n")
+                            process = None
+                    if process is None:
+                        result = JobResult(
+                            name=job.name,
+                            returncode=NOT_STARTED,
+                            wall_time=0.0,
+                            log_file=job.log_file,
+                        )
+                        results[index] = result
+                        if on_done is not None:
+                            on_done(result)
+                        continue
+                    running.append(
+                        _Running(index, job, process, time.monotonic())
+                    )
+                    cores_free -= job.cores
+                    if memory_free is not None:
+                        memory_free -= job.memory_gb
+                else:
+                    waiting.append((index, job))
+            pending = waiting
+
+            time.sleep(poll_interval)
+
+            still_running = []
+            for item in running:
+                returncode = item.process.poll()
+                if returncode is None:
+                    still_running.append(item)
+                    continue
+                result = JobResult(
+                    name=item.job.name,
+                    returncode=returncode,
+                    wall_time=time.monotonic() - item.start,
+                    log_file=item.job.log_file,
+                )
+                results[item.index] = result
+                if on_done is not None:
+                    on_done(result)
+            running = still_running
+    finally:
+        # on an interrupt, do not leave orphan processes behind
+        for item in running:
+            item.process.kill()
+            item.process.wait()
+
+    return results
+
+
+def failure_summary(results: list[JobResult]) -> str:
+    """Summarize the failed jobs of a run.
+
+    Args:
+        results: The results of a run.
+
+    Returns:
+        One line per failed job, with its exit status and log file, after a
+        count of succeeded and failed jobs.
+    """
+    failed = [item for item in results if not item.ok]
+    n_succeeded = len(results) - len(failed)
+    lines = [f"{n_succeeded} job(s) succeeded, {len(failed)} job(s) failed."]
+    for item in failed:
+        lines.append(
+            f"  FAILED {item.name}: exit status {item.returncode} after "
+            f"{item.wall_time:.1f} s, see {item.log_file}"
+        )
+    return "\n".join(lines)
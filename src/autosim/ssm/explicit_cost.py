@@ -0,0 +1,442 @@
+"""This module predicts the cost of an Abaqus/Explicit job before it is
+submitted: the stable time increment, the number of increments, and the
+approximate wall time, for every mesh of an ensemble.
+
+The model is an input template, e.g., base_template.inp, whose *INCLUDE
+files give the materials, the section and rigid body assignments of the
+element sets (assembly.inp), and the step (step_case1.inp).  Include paths
+are resolved from the job folder of submit_job_sge.sh,
+simulation_results/<job>/, next to the template.  The mesh include
+(@MESHFILE@) is replaced by each mesh, read with inp_reader.py.
+
+For every deformable element set, the stable time increment is
+
+    dt = L / c * (sqrt(1 + xi^2) - xi)
+
+with L the shortest element edge, c = sqrt((K + 4 G / 3) / rho) the
+dilatational wave speed from the instantaneous bulk and shear moduli, and
+xi the linear bulk viscosity of the step.  Element sets of a rigid body do
+not limit the increment.  The wall time is the number of increments times
+the number of deformable elements times a per-element cost, divided by
+the cores; calibrate the cost from a finished job.
+
+Units are those of the model, e.g., m, kg/m^3, Pa, and s.
+
+To run:
+source ~/autotwin/autosim/.venv/bin/activate
+python ~/autotwin/autosim/src/autosim/ssm/explicit_cost.py \
+    -t ~/autotwin/autosim/base_template.inp \
+    -m ~/autotwin/autosim/abaqus_mesh/ \
+    -o ~/autotwin/autosim/explicit_cost.csv \
+    -n 16
+
+To test:
+pytest --cov --cov-report=term-missing
+"""
+
+import argparse
+import math
+import os
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Final, NamedTuple
+
+import numpy as np
+
+from autosim.ssm.ensemble_statistics import write_table
+from autosim.ssm.inp_reader import InpMesh, read_mesh
+
+BULK_VISCOSITY: Final[float] = 0.06  # Abaqus/Explicit default, linear
+CHUNK_SIZE: Final[int] = 1 << 20  # elements per edge length step
+COLUMNS: Final[list[str]] = [
+    "mesh",
+    "elements",
+    "controlling_elset",
+    "min_length",
+    "wave_speed",
+    "stable_increment",
+    "step_time",
+    "increments",
+    "wall_time_h",
+    "h_rt",
+    "exceeds_limit",
+]
+# Hex edges, as pairs of local node indices, in Abaqus order
+EDGES: Final[np.ndarray] = np.array(
+    [
+        [0, 1],
+        [1, 2],
+        [2, 3],
+        [3, 0],
+        [4, 5],
+        [5, 6],
+        [6, 7],
+        [7, 4],
+        [0, 4],
+        [1, 5],
+        [2, 6],
+        [3, 7],
+    ]
+)
+ELEMENT_COST: Final[float] = 1.0e-6  # s per element per increment per core
+MESH_PLACEHOLDER: Final[str] = "@MESHFILE@"
+SAFETY_FACTOR: Final[float] = 1.5  # h_rt margin over the predicted time
+TIME_LIMIT_H: Final[float] = 24.0  # hours, the queue limit of h_rt
+# Abaqus/Explicit bulk-to-shear ratio of an incompressible (D1 = 0) model
+INCOMPRESSIBLE_RATIO: Final[float] = 20.0
+
+
+class Material(NamedTuple):
+    """The density and instantaneous moduli of a material."""
+
+    name: str
+    density: float
+    bulk: float
+    shear: float
+
+    @property
+    def wave_speed(self) -> float:
+        """The dilatational wave speed."""
+        return math.sqrt((self.bulk + 4.0 * self.shear / 3.0) / self.density)
+
+
+class Model(NamedTuple):
+    """What the template gives, apart from the mesh."""
+
+    materials: dict[str, Material]  # by upper-cased material name
+    sections: dict[str, str]  # material name, by element set name
+    rigid: set[str]  # element sets of rigid bodies
+    step_time: float
+    bulk_viscosity: float
+
+
+class Block(NamedTuple):
+    """A keyword line, its parameters, and its data lines."""
+
+    keyword: str  # upper-cased, e.g., "*ELASTIC"
+    parameters: dict[str, str]  # upper-cased names
+    data: list[list[float | str | None]]  # None for an empty field
+
+
+def _field(text: str) -> float | str | None:
+    """A number, the text of a non-numeric field, or None if empty."""
+    if not text.strip():
+        return None
+    try:
+        return float(text)
+    except ValueError:
+        return text.strip()
+
+
+def _blocks(path: Path, job_folder: Path) -> Iterator[Block]:
+    """Yield the keyword blocks of an input file, following *INCLUDE files
+    but the mesh.
+
+    Args:
+        path: The input file.
+        job_folder: The folder include paths are relative to.
+    """
+    block = None
+    with open(path, "r") as file:
+        for line in file:
+            line = line.strip()
+            if not line or line.startswith("**"):
+                continue
+            if not line.startswith("*"):
+                if block is not None:
+                    # by position, e.g., ", 0.08" leaves the first empty
+                    fields = [_field(item) for item in line.split(",")]
+                    while fields and fields[-1] is None:
+                        fields.pop()  # a trailing comma
+                    block.data.append(fields)
+                continue
+            if block is not None:
+                yield block
+            items = line.split(",")
+            parameters = {}
+            for item in items[1:]:
+                name, _, value = item.partition("=")
+                parameters[name.strip().upper()] = value.strip()
+            keyword = items[0].strip().upper()
+            if keyword == "*INCLUDE":
+                block = None
+                include = parameters["INPUT"]
+                if MESH_PLACEHOLDER not in include:
+                    # lexically, since the job folder need not exist yet
+                    path = Path(os.path.normpath(job_folder.joinpath(include)))
+                    yield from _blocks(path, job_folder)
+                continue
+            block = Block(keyword, parameters, [])
+    if block is not None:
+        yield block
+
+
+def _material(name: str, blocks: list[Block]) -> Material:
+    """Calculate the instantaneous moduli of a material from its blocks.
+
+    Raises:
+        ValueError: If the density or stiffness is missing.
+    """
+    density = bulk = sound_speed = None
+    shear = g_sum = k_sum = 0.0
+    for block in blocks:
+        values = [item for row in block.data for item in row]
+        kind = block.parameters.get("TYPE", "").upper()
+        if block.keyword == "*DENSITY":
+            density = values[0]
+        elif block.keyword == "*ELASTIC":
+            modulus, poisson = values[0], values[1]
+            bulk = modulus / (3.0 * (1.0 - 2.0 * poisson))
+            shear = modulus / (2.0 * (1.0 + poisson))
+        elif block.keyword == "*HYPERELASTIC":
+            model = " ".join(block.parameters).upper()
+            if "NEO HOOKE" in model:
+                shear, d1 = 2.0 * values[0], values[1]
+            elif "OGDEN" in model:
+                n = int(block.parameters.get("N", 1))
+                shear, d1 = sum(values[0 : 2 * n : 2]), values[2 * n]
+            else:
+                msg = f"Hyperelastic model of {name} is not supported."
+                raise ValueError(msg)
+            bulk = INCOMPRESSIBLE_RATIO * shear if d1 == 0 else 2.0 / d1
+        elif block.keyword == "*EOS" and kind == "USUP":
+            sound_speed = values[0]  # c0 of Us = c0 + s Up
+        elif block.keyword == "*VISCOELASTIC":
+            # long-term moduli are given, the increment needs instantaneous
+            g_sum = sum(row[0] for row in block.data)
+            k_sum = sum(row[1] for row in block.data)
+
+    if density is not None and sound_speed is not None:
+        bulk = density * sound_speed**2
+    if density is None or bulk is None:
+        raise ValueError(f"Material {name} needs a density and stiffness.")
+    return Material(
+        name=name,
+        density=density,
+        bulk=bulk / (1.0 - k_sum),
+        shear=shear / (1.0 - g_sum),
+    )
+
+
+def read_model(template: Path, job_folder: Path | None = None) -> Model:
+    """Read the materials, sections, rigid bodies, and step of a template.
+
+    Args:
+        template: The input template, with *INCLUDE files.
+        job_folder: The folder include paths are relative to, by default
+            simulation_results/job/ next to the template.
+
+    Returns:
+        The model.
+
+    Raises:
+        ValueError: If the template has no *Dynamic, Explicit step.
+    """
+    if job_folder is None:
+        job_folder = template.parent.joinpath("simulation_results", "job")
+
+    materials: dict[str, list[Block]] = {}
+    sections: dict[str, str] = {}
+    rigid: set[str] = set()
+    step_time = None
+    bulk_viscosity = BULK_VISCOSITY
+    current = None
+    for block in _blocks(template, job_folder):
+        if block.keyword == "*MATERIAL":
+            current = block.parameters["NAME"].upper()
+            materials[current] = []
+            continue
+        if block.keyword in (
+            "*DENSITY",
+            "*ELASTIC",
+            "*HYPERELASTIC",
+            "*EOS",
+            "*VISCOELASTIC",
+        ):
+            if current is not None:
+                materials[current].append(block)
+            continue
+        current = None
+        if block.keyword == "*SOLID SECTION":
+            elset = block.parameters["ELSET"].split(".")[-1]
+            sections[elset] = block.parameters["MATERIAL"].upper()
+        elif block.keyword == "*RIGID BODY":
+            rigid.add(block.parameters["ELSET"].split(".")[-1])
+        elif block.keyword == "*DYNAMIC" and "EXPLICIT" in block.parameters:
+            step_time = float(block.data[0][1])
+        elif block.keyword == "*BULK VISCOSITY":
+            linear = block.data[0][0] if block.data[0] else None
+            if linear is not None:
+                bulk_viscosity = float(linear)
+
+    if step_time is None:
+        raise ValueError(f"Template {template} has no explicit step.")
+
+    return Model(
+        materials={
+            name: _material(name, blocks) for name, blocks in materials.items()
+        },
+        sections=sections,
+        rigid=rigid,
+        step_time=step_time,
+        bulk_viscosity=bulk_viscosity,
+    )
+
+
+def min_edge_lengths(mesh: InpMesh) -> np.ndarray:
+    """Calculate the shortest edge of every element, in chunks.
+
+    Args:
+        mesh: The hex mesh.
+
+    Returns:
+        The (n_elements,) shortest edge lengths, in element order.
+    """
+    sorter = np.argsort(mesh.node_ids)
+    lengths = np.empty(len(mesh.element_ids))
+    for start in range(0, len(lengths), CHUNK_SIZE):
+        connectivity = np.asarray(
+            mesh.connectivity[start : start + CHUNK_SIZE]
+        )
+        rows = sorter[
+            np.searchsorted(mesh.node_ids, connectivity, sorter=sorter)
+        ]
+        points = np.asarray(mesh.coordinates)[rows]  # (n, 8, 3)
+        edges = points[:, EDGES[:, 1]] - points[:, EDGES[:, 0]]
+        lengths[start : start + CHUNK_SIZE] = np.sqrt(
+            (edges**2).sum(axis=2)
+        ).min(axis=1)
+    return lengths
+
+
+def predict(
+    mesh_file: Path,
+    model: Model,
+    cores: int = 1,
+    element_cost: float = ELEMENT_COST,
+    time_limit: float = TIME_LIMIT_H,
+    cache: bool = True,
+) -> dict:
+    """Predict the stable increment and wall time of one mesh.
+
+    Args:
+        mesh_file: The mesh in .inp format.
+        model: The model of the template.
+        cores: The cores of the job.
+        element_cost: The seconds per element per increment on one core.
+        time_limit: The h_rt limit of the queue, in hours.
+        cache: Use and write the .npz sidecar of the mesh if True (see
+            inp_reader.py).
+
+    Returns:
+        The table row, with the columns of COLUMNS.
+
+    Raises:
+        ValueError: If the mesh has no deformable element set with a
+            section.
+    """
+    mesh = read_mesh(mesh_file, cache)
+    lengths = min_edge_lengths(mesh)
+    sorter = np.argsort(mesh.element_ids)
+    damping = math.sqrt(1.0 + model.bulk_viscosity**2) - model.bulk_viscosity
+
+    increment, controlling, n_elements = math.inf, None, 0
+    length = speed = math.nan
+    for elset, ids in mesh.elsets.items():
+        if elset in model.rigid or elset not in model.sections:
+            continue
+        material = model.materials[model.sections[elset]]
+        rows = sorter[np.searchsorted(mesh.element_ids, ids, sorter=sorter)]
+        n_elements += len(rows)
+        shortest = float(lengths[rows].min())
+        dt = shortest / material.wave_speed * damping
+        if dt < increment:
+            increment, controlling = dt, elset
+            length, speed = shortest, material.wave_speed
+
+    if controlling is None:
+        raise ValueError(f"Mesh {mesh_file} has no deformable element set.")
+
+    increments = math.ceil(model.step_time / increment)
+    wall_time_h = increments * n_elements * element_cost / cores / 3600.0
+    h_rt = math.ceil(wall_time_h * SAFETY_FACTOR)
+    return {
+        "mesh": str(mesh_file),
+        "elements": n_elements,
+        "controlling_elset": controlling,
+        "min_length": length,
+        "wave_speed": speed,
+        "stable_increment": increment,
+        "step_time": model.step_time,
+        "increments": increments,
+        "wall_time_h": wall_time_h,
+        "h_rt": f"{h_rt:02d}:00:00",
+        "exceeds_limit": wall_time_h > time_limit,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Predict the stable time increment and wall time of "
+        "Abaqus/Explicit jobs."
+    )
+    parser.add_argument(
+        "-t",
+        "--template",
+        required=True,
+        type=str,
+        help="Path to the input template, e.g., base_template.inp.",
+    )
+    parser.add_argument(
+        "-m",
+        "--meshes",
+        required=True,
+        type=str,
+        nargs="+",
+        help="Mesh .inp files, or folders of them.",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        required=False,
+        type=str,
+        default=None,
+        help="Path to the table in .csv or .json format.",
+    )
+    parser.add_argument(
+        "-n",
+        "--cores",
+        required=False,
+        type=int,
+        default=16,
+        help="Cores per job.",
+    )
+    parser.add_argument(
+        "-c",
+        "--element-cost",
+        required=False,
+        type=float,
+        default=ELEMENT_COST,
+        help="Seconds per element per increment on one core.",
+    )
+    args = parser.parse_args()
+
+    model = read_model(Path(args.template).expanduser().resolve())
+    mesh_files = []
+    for item in map(Path, args.meshes):
+        item = item.expanduser()
+        mesh_files += sorted(item.glob("*.inp")) if item.is_dir() else [item]
+
+    rows = [
+        predict(path, model, args.cores, args.element_cost)
+        for path in mesh_files
+    ]
+    for row in rows:
+        flag = "  EXCEEDS LIMIT" if row["exceeds_limit"] else ""
+        print(
+            f"{Path(row['mesh']).name}: dt {row['stable_increment']:.3e} s,"
+            f" {row['increments']} increments,"
+            f" {row['wall_time_h']:.2f} h, h_rt {row['h_rt']}{flag}"
+        )
+    if args.output is not None:
+        write_table(rows, Path(args.output).expanduser(), COLUMNS)
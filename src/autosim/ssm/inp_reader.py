@@ -0,0 +1,353 @@
+"""This module reads hexahedral meshes in Abaqus .inp format, such as those
+written by automesh and voxel_mesh.py, into NumPy arrays, and caches them
+in a .npz sidecar that later reads memory map.
+
+The file is read in chunks of whole lines.  Keyword lines (*NODE,
+*ELEMENT, *ELSET) set the current section, and the data lines between
+keywords are parsed in one np.fromstring call per chunk, with no Python
+object per line.  Element sets come from the ELSET= parameter of *ELEMENT
+and from *ELSET blocks, including GENERATE.
+
+The sidecar of mesh.inp is mesh.inp.npz.  It records the size and
+modification time of the .inp file, and is parsed again when either
+changes.  Its arrays are memory mapped from the uncompressed .npz file, so
+a cached read costs little more than reading the zip directory.
+
+Example:
+    mesh = read_mesh(Path("abaqus_mesh/IXI012-HH-1211-T1_large.inp"))
+    graymatter = mesh.elsets["EB1"]  # element IDs
+
+To run:
+source ~/autotwin/autosim/.venv/bin/activate
+python ~/autotwin/autosim/src/autosim/ssm/inp_reader.py \
+    -i ~/autotwin/autosim/abaqus_mesh/IXI012-HH-1211-T1_large.inp
+
+To test:
+pytest --cov --cov-report=term-missing
+"""
+
+import argparse
+import os
+import re
+import zipfile
+from pathlib import Path
+from typing import Final, NamedTuple
+
+import numpy as np
+
+CHUNK_SIZE: Final[int] = 1 << 26  # bytes read per parsing step
+ELSET_PREFIX: Final[str] = "elset:"  # sidecar array name prefix
+KEYWORD: Final[re.Pattern] = re.compile(r"^\*.*$", re.MULTILINE)
+NODES_PER_ELEMENT: Final[int] = 8
+
+
+class InpMesh(NamedTuple):
+    """The nodes, hex elements, and element sets of an .inp mesh."""
+
+    node_ids: np.ndarray  # (n_nodes,) int64
+    coordinates: np.ndarray  # (n_nodes, 3) float64
+    element_ids: np.ndarray  # (n_elements,) int64
+    connectivity: np.ndarray  # (n_elements, 8) int64 node IDs
+    elsets: dict[str, np.ndarray]  # element IDs, by element set name
+
+
+def cache_path(path: Path) -> Path:
+    """Return the .npz sidecar path of an .inp file, e.g., mesh.inp.npz."""
+    return path.with_name(path.name + ".npz")
+
+
+def _parameters(keyword: str) -> dict[str, str]:
+    """Parse the upper-cased parameters of a keyword line, e.g.,
+    *ELEMENT, TYPE=C3D8R, ELSET=EB1 gives {"TYPE": "C3D8R", "ELSET":
+    "EB1"}.  Parameters without a value map to ""."""
+    parameters = {}
+    for item in keyword.split(",")[1:]:
+        name, _, value = item.partition("=")
+        parameters[name.strip().upper()] = value.strip()
+    return parameters
+
+
+def _values(data: str, dtype: type) -> np.ndarray:
+    """Parse the comma-separated numbers of data lines, in one call."""
+    # a trailing comma continues a data line on the next line
+    text = data.replace(",\n", ",").replace("\n", ",").strip().strip(",")
+    if not text:
+        return np.empty(0, dtype=dtype)
+    return np.fromstring(text, dtype=dtype, sep=",")
+
+
+class _Parser:
+    """Accumulates the flat values of every section across chunks."""
+
+    def __init__(self):
+        self.section: str | None = None  # "node", "element", or "elset"
+        self.elset: str = ""
+        self.generate: bool = False
+        self.nodes: list[np.ndarray] = []
+        self.elements: list[np.ndarray] = []
+        # flat values by element set name, from *ELEMENT, *ELSET, and
+        # *ELSET, GENERATE data
+        self.blocks: dict[str, list[np.ndarray]] = {}
+        self.listed: dict[str, list[np.ndarray]] = {}
+        self.generated: dict[str, list[np.ndarray]] = {}
+
+    def keyword(self, line: str) -> None:
+        """Set the section of a keyword line."""
+        if line.startswith("**"):
+            return  # a comment leaves the section unchanged
+        name = line.split(",")[0].strip().upper()
+        parameters = _parameters(line)
+        if name == "*NODE":
+            self.section = "node"
+        elif name == "*ELEMENT":
+            element_type = parameters.get("TYPE", "")
+            if not element_type.upper().startswith("C3D8"):
+                msg = f"Element type {element_type} is not an 8-node hex."
+                raise ValueError(msg)
+            self.section = "element"
+            self.elset = parameters.get("ELSET", "")
+        elif name == "*ELSET":
+            self.section = "elset"
+            self.elset = parameters["ELSET"]
+            self.generate = "GENERATE" in parameters
+        else:
+            self.section = None
+
+    def data(self, text: str) -> None:
+        """Parse the data lines of the current section."""
+        if self.section == "node":
+            self.nodes.append(_values(text, np.float64))
+        elif self.section == "element":
+            values = _values(text, np.int64)
+            self.elements.append(values)
+            if self.elset:
+                self.blocks.setdefault(self.elset, []).append(values)
+        elif self.section == "elset" and self.generate:
+            # one start, end, increment range per line; the increment
+            # defaults to 1
+            for line in text.splitlines():
+                values = _values(line, np.int64)
+                if values.size == 2:
+                    values = np.append(values, 1)
+                if values.size:
+                    self.generated.setdefault(self.elset, []).append(values)
+        elif self.section == "elset":
+            self.listed.setdefault(self.elset, []).append(
+                _values(text, np.int64)
+            )
+
+    def mesh(self) -> InpMesh:
+        """Assemble the mesh from the parsed values."""
+        width = NODES_PER_ELEMENT + 1
+        nodes = np.concatenate([np.empty(0)] + self.nodes).reshape(-1, 4)
+        elements = np.concatenate(
+            [np.empty(0, dtype=np.int64)] + self.elements
+        ).reshape(-1, width)
+
+        pieces: dict[str, list[np.ndarray]] = {}
+        for name, values in self.blocks.items():
+            ids = np.concatenate(values).reshape(-1, width)[:, 0]
+            pieces.setdefault(name, []).append(ids)
+        for name, values in self.listed.items():
+            pieces.setdefault(name, []).extend(values)
+        for name, values in self.generated.items():
+            ranges = np.concatenate(values).reshape(-1, 3)
+            pieces.setdefault(name, []).extend(
+                np.arange(start, end + 1, step) for start, end, step in ranges
+            )
+        elsets = {
+            name: np.concatenate(values).astype(np.int64)
+            for name, values in pieces.items()
+        }
+
+        return InpMesh(
+            node_ids=nodes[:, 0].astype(np.int64),
+            coordinates=np.ascontiguousarray(nodes[:, 1:]),
+            element_ids=np.ascontiguousarray(elements[:, 0]),
+            connectivity=np.ascontiguousarray(elements[:, 1:]),
+            elsets=elsets,
+        )
+
+
+def parse_inp(path: Path, chunk_size: int = CHUNK_SIZE) -> InpMesh:
+    """Parse an .inp mesh, reading it in chunks of whole lines.
+
+    Args:
+        path: The .inp file.
+        chunk_size: The number of bytes read per step.
+
+    Returns:
+        The mesh.
+
+    Raises:
+        ValueError: If the mesh has elements other than 8-node hexes.
+    """
+    parser = _Parser()
+    remainder = ""
+    with open(path, "r") as file:
+        while True:
+            chunk = file.read(chunk_size)
+            text = remainder + chunk
+            if chunk:
+                # keep the partial last line for the next chunk
+                cut = text.rfind("\n") + 1
+                text, remainder = text[:cut], text[cut:]
+            position = 0
+            for match in KEYWORD.finditer(text):
+                parser.data(text[position : match.start()])
+                parser.keyword(match.group())
+                position = match.end()
+            parser.data(text[position:])
+            if not chunk:
+                break
+    return parser.mesh()
+
+
+def write_cache(mesh: InpMesh, path: Path) -> Path:
+    """Write the .npz sidecar of a parsed .inp file.
+
+    Args:
+        mesh: The parsed mesh.
+        path: The .inp file, whose size and modification time are recorded.
+
+    Returns:
+        The sidecar path.
+    """
+    stat = path.stat()
+    arrays = {
+        "source_stat": np.array([stat.st_size, stat.st_mtime_ns]),
+        "node_ids": mesh.node_ids,
+        "coordinates": mesh.coordinates,
+        "element_ids": mesh.element_ids,
+        "connectivity": mesh.connectivity,
+    }
+    for name, ids in mesh.elsets.items():
+        arrays[ELSET_PREFIX + name] = ids
+
+    output = cache_path(path)
+    temporary = output.with_name(output.name + f".{os.getpid()}.tmp")
+    with open(temporary, "wb") as file:
+        np.savez(file, **arrays)  # uncompressed, so members can be mapped
+    temporary.replace(output)  # readers never see a partial sidecar
+    return output
+
+
+def load_npz_mmap(path: Path) -> dict[str, np.ndarray]:
+    """Memory map every array of an uncompressed .npz file.
+
+    Args:
+        path: The .npz file, as written by np.savez.
+
+    Returns:
+        The read-only arrays, by name.
+
+    Raises:
+        ValueError: If a member is compressed.
+    """
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, "rb") as file:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                msg = f"Member {info.filename} of {path} is compressed."
+                raise ValueError(msg)
+            # skip the local file header: 30 bytes, the name, and the extra
+            file.seek(info.header_offset + 26)
+            name_length, extra_length = np.frombuffer(
+                file.read(4), dtype="<u2"
+            )
+            file.seek(
+                info.header_offset + 30 + int(name_length) + int(extra_length)
+            )
+            version = np.lib.format.read_magic(file)
+            read_header = (
+                np.lib.format.read_array_header_1_0
+                if version == (1, 0)
+                else np.lib.format.read_array_header_2_0
+            )
+            shape, fortran_order, dtype = read_header(file)
+            name = info.filename.removesuffix(".npy")
+            if 0 in shape:
+                arrays[name] = np.empty(shape, dtype=dtype)
+            else:
+                arrays[name] = np.memmap(
+                    file,
+                    dtype=dtype,
+                    mode="r",
+                    offset=file.tell(),
+                    shape=shape,
+                    order="F" if fortran_order else "C",
+                )
+    return arrays
+
+
+def read_cache(path: Path) -> InpMesh | None:
+    """Read the .npz sidecar of an .inp file, memory mapped.
+
+    Args:
+        path: The .inp file.
+
+    Returns:
+        The mesh, or None if there is no sidecar or the .inp file changed
+        since it was written.
+    """
+    sidecar = cache_path(path)
+    if not sidecar.is_file():
+        return None
+    arrays = load_npz_mmap(sidecar)
+    stat = path.stat()
+    if arrays["source_stat"].tolist() != [stat.st_size, stat.st_mtime_ns]:
+        return None
+    return InpMesh(
+        node_ids=arrays["node_ids"],
+        coordinates=arrays["coordinates"],
+        element_ids=arrays["element_ids"],
+        connectivity=arrays["connectivity"],
+        elsets={
+            name.removeprefix(ELSET_PREFIX): ids
+            for name, ids in arrays.items()
+            if name.startswith(ELSET_PREFIX)
+        },
+    )
+
+
+def read_mesh(path: Path, cache: bool = True) -> InpMesh:
+    """Read an .inp mesh from its sidecar, or parse it and write the
+    sidecar.
+
+    Args:
+        path: The .inp file.
+        cache: Use and write the .npz sidecar if True.
+
+    Returns:
+        The mesh, memory mapped when read from the sidecar.
+    """
+    if cache:
+        mesh = read_cache(path)
+        if mesh is not None:
+            return mesh
+    mesh = parse_inp(path)
+    if cache:
+        write_cache(mesh, path)
+    return mesh
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Read an .inp mesh and write its .npz sidecar."
+    )
+    parser.add_argument(
+        "-i",
+        "--input",
+        required=True,
+        type=str,
+        help="Path to the mesh file in .inp format.",
+    )
+    args = parser.parse_args()
+
+    input_file = Path(args.input).expanduser()
+    mesh = read_mesh(input_file)
+    print(f"Nodes: {len(mesh.node_ids)}")
+    print(f"Elements: {len(mesh.element_ids)}")
+    for name, ids in mesh.elsets.items():
+        print(f"  {name}: {len(ids)} elements")
+    print(f"Sidecar: {cache_path(input_file)}")
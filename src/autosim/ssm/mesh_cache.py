@@ -0,0 +1,275 @@
+"""This module caches automesh outputs, content addressed, so unchanged
+subjects are not meshed again.
+
+The key of a mesh is the hash of
+  * the content of the segmentation that automesh reads,
+  * the automesh command, with the input, output, and metrics paths
+    replaced by their roles, so moving the output folder keeps the key, and
+  * the automesh version, or, for the built-in mesher, the content hash of
+    voxel_mesh.py.
+
+A manifest in the output folder records the key of every output mesh, and
+its source key: the hash of the content of the segmentation before it is
+cropped, the settings that give the automesh command, and the version.  A
+mesh is skipped when its output exists with the recorded source key,
+before the segmentation is read, or else with the recorded key.  Otherwise,
+if a cache folder is given and holds the key, the outputs are copied from
+the cache, e.g., after only the output folder changed.  Otherwise automesh
+runs and its outputs are stored in the cache under the key.
+
+To test:
+pytest --cov --cov-report=term-missing
+"""
+
+import functools
+import hashlib
+import json
+import shutil
+import subprocess
+from pathlib import Path
+from typing import Final
+
+from autosim.ssm import voxel_mesh
+from autosim.ssm.ensemble_statistics import file_digest
+
+MANIFEST: Final[str] = "mesh_manifest.json"
+PATH_OPTIONS: Final[dict[str, str]] = {
+    "-i": "<input>",
+    "--input": "<input>",
+    "-o": "<output>",
+    "--output": "<output>",
+    "--metrics": "<metrics>",
+}
+
+
+@functools.cache
+def automesh_version(automesh: Path) -> str:
+    """Return the version of an automesh binary.
+
+    Args:
+        automesh: The automesh binary.
+
+    Returns:
+        The output of `automesh --version`, or, if that fails, the content
+        hash of the binary.
+    """
+    try:
+        result = subprocess.run(
+            [str(automesh), "--version"],
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+    except OSError:
+        result = None
+    if result is not None and result.returncode == 0:
+        return result.stdout.strip()
+    if Path(automesh).is_file():
+        return file_digest(Path(automesh))
+    return ""
+
+
+@functools.cache
+def builtin_version() -> str:
+    """Return the version of the built-in mesher, the content hash of
+    voxel_mesh.py, so any change to the mesher is a new version."""
+    return "autosim.voxel_mesh " + file_digest(Path(voxel_mesh.__file__))
+
+
+def normalized_command(command: list[str]) -> list[str]:
+    """Replace the binary and the input, output, and metrics paths of an
+    automesh command by their roles, keeping output suffixes.
+
+    Args:
+        command: The automesh command.
+
+    Returns:
+        The command independent of the location of its files.
+    """
+    normalized = ["<automesh>"]
+    previous = None
+    for item in command[1:]:
+        role = PATH_OPTIONS.get(previous) if previous is not None else None
+        normalized.append(role + Path(item).suffix if role else item)
+        previous = item
+    return normalized
+
+
+def mesh_key(command: list[str], input_digest: str, version: str) -> str:
+    """Calculate the cache key of an automesh run.
+
+    Args:
+        command: The automesh command.
+        input_digest: The content hash of the segmentation read by
+            automesh.
+        version: The automesh version.
+
+    Returns:
+        The hexadecimal BLAKE2b key.
+    """
+    identity = {
+        "command": normalized_command(command),
+        "input": input_digest,
+        "version": version,
+    }
+    text = json.dumps(identity, sort_keys=True)
+    return hashlib.blake2b(text.encode(), digest_size=20).hexdigest()
+
+
+def source_key(input_digest: str, settings: dict, version: str) -> str:
+    """Calculate the source key of a mesh, known before the segmentation
+    is read.
+
+    Args:
+        input_digest: The content hash of the segmentation, before it is
+            cropped.
+        settings: The settings that, with the segmentation, give the
+            automesh command, as JSON values.
+        version: The automesh version.
+
+    Returns:
+        The hexadecimal BLAKE2b key.
+    """
+    identity = {
+        "settings": settings,
+        "source": input_digest,
+        "version": version,
+    }
+    text = json.dumps(identity, sort_keys=True)
+    return hashlib.blake2b(text.encode(), digest_size=20).hexdigest()
+
+
+def load_manifest(folder: Path) -> dict[str, dict]:
+    """Load the manifest of an output folder.
+
+    Args:
+        folder: The output folder, whose manifest need not exist.
+
+    Returns:
+        The record of every output file, keyed on file name, possibly empty.
+    """
+    path = folder.joinpath(MANIFEST)
+    if not path.is_file():
+        return {}
+    with open(path, "r") as file:
+        return json.load(file)
+
+
+def write_manifest(folder: Path, manifest: dict[str, dict]) -> None:
+    """Write the manifest of an output folder, replacing the previous one
+    in one step, so an interrupted write leaves it intact.
+
+    Args:
+        folder: The output folder.
+        manifest: The record of every output file, keyed on file name.
+    """
+    path = folder.joinpath(MANIFEST)
+    partial = path.with_name(path.name + ".tmp")
+    with open(partial, "w") as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+    partial.replace(path)
+
+
+def _cache_entry(cache: Path, key: str) -> Path:
+    """The cache folder of a key."""
+    return cache.joinpath(key[:2], key)
+
+
+def is_current(
+    key: str,
+    outputs: list[Path],
+    manifest: dict[str, dict],
+    field: str = "key",
+) -> bool:
+    """Return True if every output exists as recorded with the key.
+
+    Args:
+        key: The cache key, or the source key.
+        outputs: The output files of the run.
+        manifest: The manifest of the output folder.
+        field: The record of the key, "key" or "source".
+    """
+    for path in outputs:
+        record = manifest.get(path.name)
+        if (
+            record is None
+            or record.get(field) != key
+            or not path.is_file()
+            or path.stat().st_size != record["size"]
+        ):
+            return False
+    return True
+
+
+def restore(
+    key: str,
+    outputs: list[Path],
+    manifest: dict[str, dict],
+    cache: Path | None,
+    source: str | None = None,
+) -> bool:
+    """Make the outputs of a run available without running it.
+
+    Args:
+        key: The cache key.
+        outputs: The output files of the run.
+        manifest: The manifest of the output folder, updated for restored
+            outputs.
+        cache: The cache folder, or None for no cache.
+        source: The source key, recorded for the outputs, or None.
+
+    Returns:
+        True if the outputs are current or were copied from the cache, False
+        if the run is needed.
+    """
+    if is_current(key, outputs, manifest):
+        record(key, outputs, manifest, cache=None, source=source)
+        return True
+    if cache is None:
+        return False
+
+    entry = _cache_entry(cache, key)
+    sources = [entry.joinpath(path.suffix.lstrip(".")) for path in outputs]
+    if not all(item.is_file() for item in sources):
+        return False
+    for item, path in zip(sources, outputs):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(item, path)
+    record(key, outputs, manifest, cache=None, source=source)
+    return True
+
+
+def record(
+    key: str,
+    outputs: list[Path],
+    manifest: dict[str, dict],
+    cache: Path | None,
+    source: str | None = None,
+) -> bool:
+    """Record the outputs of a successful run in the manifest and cache.
+
+    Args:
+        key: The cache key.
+        outputs: The output files of the run.
+        manifest: The manifest of the output folder, updated in place.
+        cache: The cache folder, or None for no cache.
+        source: The source key, recorded for the outputs, or None.
+
+    Returns:
+        True if the outputs were recorded, False if one is missing, e.g.,
+        a run that exits with 0 without writing its metrics, in which case
+        nothing is recorded.
+    """
+    if not all(path.is_file() for path in outputs):
+        return False
+    if cache is not None:
+        entry = _cache_entry(cache, key)
+        entry.mkdir(parents=True, exist_ok=True)
+        for path in outputs:
+            # copy, not link, since a later automesh run overwrites outputs
+            shutil.copyfile(path, entry.joinpath(path.suffix.lstrip(".")))
+    for path in outputs:
+        manifest[path.name] = {"key": key, "size": path.stat().st_size}
+        if source is not None:
+            manifest[path.name]["source"] = source
+    return True
@@ -24,12 +24,35 @@ python ~/autotwin/autosim/src/autosim/ssm/mesh_to_sim.py
 """
 
 from pathlib import Path
-import os
-import subprocess
 import sys
 import time
 from typing import NamedTuple, Final
 
+from autosim.ssm.decomposition import (
+    decompose,
+    element_count,
+    find_meshes,
+    pieces,
+    select_processors,
+)
+from autosim.ssm.executor import Job, JobResult
+from autosim.ssm.run_state import (
+    connect,
+    DONE,
+    record_result,
+    record_stage,
+)
+from autosim.ssm.supervisor import detach, status_report, supervise
+from autosim.ssm.templates import (
+    read_template,
+    render,
+    SSM_PLACEHOLDERS,
+    ssm_values,
+    SUBMIT_PLACEHOLDERS,
+    submit_values,
+    write_decks,
+)
+
 
 class Input(NamedTuple):
     """Input class for the mesh_to_sim.py script."""
@@ -37,9 +60,19 @@ class Input(NamedTuple):
     exo_folder: str
     ssm_folder: str  # Folder for ssm simulation input files
     n_processors: int  # Number of processors for mesh decomposition
+    auto_processors: bool  # Choose processors per mesh from its elements
+    elements_per_rank: tuple[int, int]  # Target (low, high) if auto
+    processor_multiple: int  # Auto processors in multiples, e.g., per node
     mesh_decompose: bool  # Whether to decompose the mesh
+    decomp_cores: int | None  # Concurrent decomps, None for all cores
+    decomp_memory_gb: float | None  # Memory budget, None for no limit
     run_sims: bool  # Whether to run simulations
     termination_time: float  # Termination time in seconds
+    max_sims: int  # Submit scripts running at once
+    sim_retries: int  # Retries of a submit script failed transiently
+    sim_transient: tuple[int, ...]  # Exit statuses worth a retry
+    detach: bool  # Whether to continue in the background after decks
+    run_state: str | None  # Run-state database, None for no records
 
 
 # -------------------
@@ -49,9 +82,21 @@ input_Chad = Input(
     exo_folder="~/scratch/ixi/exo/",  # Start point is this folder, followed by decomposition
     ssm_folder="~/scratch/ixi/ssm/",  # Next, input files get populated in this folder
     n_processors=160,  # Number of processors for mesh decomposition
+    auto_processors=False,  # True to override n_processors per mesh
+    elements_per_rank=(20_000, 60_000),
+    processor_multiple=16,  # cores per node
     mesh_decompose=False,
+    decomp_cores=8,
+    decomp_memory_gb=None,
     run_sims=True,
     termination_time=0.002,  # Termination time in seconds
+    max_sims=4,
+    sim_retries=2,
+    # none: a submit script failed part-way may have submitted already;
+    # e.g., (75,) for a script that exits 75 (EX_TEMPFAIL) before submitting
+    sim_transient=(),
+    detach=False,
+    run_state="~/scratch/ixi/run_state.sqlite",
 )
 # -----------------
 # user settings end
@@ -63,103 +108,104 @@ ii = input_Chad
 EXO_FOLDER: Final[Path] = Path(ii.exo_folder).expanduser()
 SSM_FOLDER: Final[Path] = Path(ii.ssm_folder).expanduser()
 N_PROCESSORS: Final[int] = ii.n_processors
+AUTO_PROCESSORS: Final[bool] = ii.auto_processors
+ELEMENTS_PER_RANK: Final[tuple[int, int]] = ii.elements_per_rank
+PROCESSOR_MULTIPLE: Final[int] = ii.processor_multiple
 DECOMP: Final[bool] = ii.mesh_decompose
+DECOMP_CORES: Final[int | None] = ii.decomp_cores
+DECOMP_MEMORY_GB: Final[float | None] = ii.decomp_memory_gb
 RUN_SIMS: Final[bool] = ii.run_sims
 TERMINATION_TIME: Final[float] = ii.termination_time
+MAX_SIMS: Final[int] = ii.max_sims
+SIM_RETRIES: Final[int] = ii.sim_retries
+SIM_TRANSIENT: Final[frozenset[int]] = frozenset(ii.sim_transient)
+DETACH: Final[bool] = ii.detach
+RUN_STATE: Final[Path | None] = (
+    None if ii.run_state is None else Path(ii.run_state).expanduser()
+)
 
 if not EXO_FOLDER.exists():
     print(f"Error: Non-existent folder: {EXO_FOLDER}")
     sys.exit(1)  # Exit the program with a non-zero status
 
+
+def processors_for(mesh: Path) -> int:
+    """Return the number of processors of a mesh, the same for decomp and
+    the PROCS of its submit script."""
+    if not AUTO_PROCESSORS:
+        return N_PROCESSORS
+    n_elements = element_count(mesh)
+    processors = select_processors(
+        n_elements, ELEMENTS_PER_RANK, PROCESSOR_MULTIPLE
+    )
+    print(
+        f"{mesh.name}: {n_elements} elements on {processors} processors,"
+        f" {n_elements / processors:.0f} elements per rank"
+    )
+    return processors
+
+
 if DECOMP:
     # Process all .exo files in the input folder
-    exo_files = list(EXO_FOLDER.glob("*.exo"))
+    exo_files = find_meshes(EXO_FOLDER)
     if not exo_files:
         raise ValueError(f"No .exo files found in {EXO_FOLDER}")
 
     print(f"Number of .exo files found in {EXO_FOLDER}: {len(exo_files)}")
 
     print("Decomposing mesh files...")
-    print(f"Number of processors: {N_PROCESSORS}")
-
-    for exo_file in exo_files:
-        print("...")
-        # Print the source file being processed
-        print(f"Processing source:\n  {exo_file}")
-
-        # Create a subfolder in the decomp folder for each .exo file
-        decomp_subfolder = EXO_FOLDER / exo_file.stem
-        print(f"Decomp subfolder:\n  {decomp_subfolder}")
-
-        # Create the subfolder if it doesn't exist
-        decomp_subfolder.mkdir(parents=True, exist_ok=True)
-
-        # Move the .exo file into subfolder
-        source_file = EXO_FOLDER / exo_file.name
-        destination_file = decomp_subfolder / exo_file.name
-        try:
-            if not destination_file.exists():
-                source_file.rename(destination_file)
-                print(f"Moved {source_file} to {destination_file}")
+    if AUTO_PROCESSORS:
+        print(f"Target elements per rank: {ELEMENTS_PER_RANK}")
+    else:
+        print(f"Number of processors: {N_PROCESSORS}")
+
+    # Decompose several meshes at once, each in its own subfolder as the
+    # working directory of its decomp process
+    decompositions = decompose(
+        exo_files,
+        processors=[processors_for(item) for item in exo_files],
+        cores=DECOMP_CORES,
+        memory_gb=DECOMP_MEMORY_GB,
+    )
+    failed = [
+        item
+        for item in decompositions
+        if item.result is not None and not item.result.ok
+    ]
+    for item in failed:
+        print(f"decomp failed for {item.mesh}, see {item.result.log_file}")
+    if RUN_STATE is not None:
+        run_state = connect(RUN_STATE)
+        for item in decompositions:
+            outputs = pieces(item.mesh, item.processors)
+            if item.skipped:
+                record_stage(
+                    run_state,
+                    item.mesh.stem,
+                    "mesh_to_sim",
+                    DONE,
+                    inputs=[item.mesh],
+                    outputs=outputs,
+                    message="pieces current",
+                )
             else:
-                print(f"File {destination_file} already exists, skipping move.")
-        except FileNotFoundError:
-            print(f"Error: The file {source_file} does not exist.")
-            raise
-        except Exception as e:
-            print(f"Error moving file: {e}")
-            raise
-
-        # Change into the decomp subfolder
-        try:
-            os.chdir(decomp_subfolder)
-
-        except FileNotFoundError:
-            print(f"Error: The directory {decomp_subfolder} does not exist.")
-            raise
-        except Exception as e:
-            print(f"Error changing directory to {decomp_subfolder}: {e}")
-            raise
-
-        # Print the current working directory
-        print(f"Current working directory:\n  {Path.cwd()}")
-
-        # Construct the decomp command
-        decomp_command = [
-            "decomp",
-            "--processors",
-            str(N_PROCESSORS),
-            str(destination_file),
-        ]
-
-        # Print the command being run
-        print(f"Running command:\n  {' '.join(decomp_command)}")
-        print(f"Current working directory: {os.getcwd()}")
-
-        # Run the command
-        result = subprocess.run(decomp_command, check=True)
-
-        if result.returncode == 0:
-            print(result.stdout)  # output of the command
-        else:
-            print("command failed:")
-            print(result.stderr)  # error message
-
-        # Change pack to original directory
-        try:
-            os.chdir(EXO_FOLDER)
-            print(f"Changed directory back to:\n  {os.getcwd()}")
-        except FileNotFoundError:
-            print(f"Error: The directory {EXO_FOLDER} does not exist.")
-            raise
-        except Exception as e:
-            print(f"Error changing directory back to {EXO_FOLDER}: {e}")
-            raise
+                record_result(
+                    run_state,
+                    item.mesh.stem,
+                    "mesh_to_sim",
+                    item.result,
+                    inputs=[item.mesh],
+                    outputs=outputs,
+                )
+    n_skipped = sum(item.skipped for item in decompositions)
+    print(f"Skipped {n_skipped} mesh(es) with current pieces.")
 
     end_time = time.time()
     delta_t = end_time - start_time
     print("Done.")
     print(f"Processed {len(exo_files)} file(s) in {delta_t:.2f} seconds.")
+    if failed:
+        sys.exit(1)
 else:
     print("Skipping mesh decomposition.")
 
@@ -175,126 +221,77 @@ if RUN_SIMS:
 
     exo_folders = list(EXO_FOLDER.glob("*/"))  # Get all subfolders in the EXO_FOLDER
 
+    # Compile the templates once, render every case in memory, and write
+    # all input files and submit scripts in one pass
+    template_folder = Path(__file__).resolve().parent
+    ssm_template = read_template(
+        template_folder / "ssm_input_template.i", SSM_PLACEHOLDERS
+    )
+    submit_template = read_template(
+        template_folder / "submit_script_template.sh", SUBMIT_PLACEHOLDERS
+    )
+
+    ssm_inputs = {}
+    submit_scripts = {}
     for exo_folder in exo_folders:
         # Create a subfolder in the sim folder for each .exo file
         ssm_subfolder = SSM_FOLDER / exo_folder.stem
         print(f"Sim subfolder:\n  {ssm_subfolder}")
 
-        # Create the subfolder if it doesn't exist
-        ssm_subfolder.mkdir(parents=True, exist_ok=True)
-
-        # Change into the sim subfolder
-        try:
-            os.chdir(ssm_subfolder)
-        except FileNotFoundError:
-            print(f"Error: The directory {ssm_subfolder} does not exist.")
-            raise
-        except Exception as e:
-            print(f"Error changing directory to {ssm_subfolder}: {e}")
-            raise
-
-        # Print the current working directory
-        print(f"Current working directory:\n  {Path.cwd()}")
-
-        # --------------------------------
-        # Create the unique ssm input file
-        # --------------------------------
-        ssm_command = [
-            "cp",
-            str((Path(__file__).resolve()).parent / "ssm_input_template.i"),
-            str(ssm_subfolder / "ssm_input.i"),
-        ]
-
-        # Run the command to copy the template file
-        result = subprocess.run(ssm_command, check=True)
-        if result.returncode == 0:
-            print(f"Copied template to:\n  {ssm_subfolder / 'ssm_input.i'}")
-        else:
-            print("Failed to copy template file.")
-            print(result.stderr)
-
-        replacements = {
-            "# [DATABASE_NAME]": "database name = ../../exo/"
-            + str(exo_folder.stem)
-            + "/"
-            + str(exo_folder.stem)
-            + ".exo",
-            "# [TERMINATION_TIME]": "termination time = "
-            + str(TERMINATION_TIME)
-            + "  # seconds",
-        }
-
-        # Read the contents of the input file
-        with open(ssm_subfolder / "ssm_input.i", "r") as file:
-            content = file.read()
-
-        # Replace the placeholders with actual values
-        cc = content.split("\n")
-        for i, line in enumerate(cc):
-            for key, value in replacements.items():
-                if key in line:
-                    line = line.replace(key, value)
-                    cc[i] = line
-                    print(f"Replaced '{key}' with '{value}' in line {i + 1}")
-
-        modified_content = "\n".join(cc)
-
-        # Write the modified content back to the file
-        with open(ssm_subfolder / "ssm_input.i", "w") as file:
-            file.write(modified_content)
-
-        print(f"Created ssm input file:\n  {ssm_subfolder / 'ssm_input.i'}")
-
-        # -----------------------------------------
-        # Create the unique submit_script bash file
-        # -----------------------------------------
-        submit_script_command = [
-            "cp",
-            str((Path(__file__).resolve()).parent / "submit_script_template.sh"),
-            str(ssm_subfolder / "submit_script.sh"),
-        ]
-
-        # Run the command to copy the template file
-        result = subprocess.run(submit_script_command, check=True)
-        if result.returncode == 0:
-            print(f"Copied template to:\n  {ssm_subfolder / 'submit_script.sh'}")
-        else:
-            print("Failed to copy template file.")
-            print(result.stderr)
-
-        # Create a submit_script bash file
-        replacements = {
-            "# [PROCS]": "PROCS=" + str(N_PROCESSORS),
-        }  # overwrite
-
-        # Read the contents of the submit_script file
-        with open(ssm_subfolder / "submit_script.sh", "r") as file:
-            content = file.read()
-
-        # Replace the placeholders with actual values
-        cc = content.split("\n")
-        for i, line in enumerate(cc):
-            for key, value in replacements.items():
-                if key in line:
-                    line = line.replace(key, value)
-                    cc[i] = line
-                    print(f"Replaced '{key}' with '{value}' in line {i + 1}")
-
-        modified_content = "\n".join(cc)
-
-        # Write the modified content back to the file
-        with open(ssm_subfolder / "submit_script.sh", "w") as file:
-            file.write(modified_content)
-
-        print(f"Created submit_script file:\n  {ssm_subfolder / 'submit_script.sh'}")
-
-        # Make the submit_script executable
-        os.chmod(ssm_subfolder / "submit_script.sh", 0o755)  # chmod +x submit_script.sh
-
-        # Spawn the process without waiting for it to complete
-        subprocess.Popen(["bash", str(ssm_subfolder / "submit_script.sh")])
-
-    print("All submit scripts have been spawned.")
+        ssm_inputs[ssm_subfolder / "ssm_input.i"] = render(
+            ssm_template, ssm_values(exo_folder.stem, TERMINATION_TIME)
+        )
+        processors = processors_for(exo_folder / f"{exo_folder.stem}.exo")
+        submit_scripts[ssm_subfolder / "submit_script.sh"] = render(
+            submit_template, submit_values(processors)
+        )
+
+    write_decks(ssm_inputs)
+    write_decks(submit_scripts, mode=0o755)  # chmod +x submit_script.sh
+    print(f"Created {len(ssm_inputs)} ssm input file(s) and submit scripts.")
+
+    if DETACH:
+        # the batch survives the launching shell, see the log for progress
+        detach(SSM_FOLDER / "mesh_to_sim.log")
+
+    # Run the submit scripts, each in its sim subfolder, a few at a time,
+    # retrying failures
+    jobs = [
+        Job(
+            name=submit_script.parent.name,
+            command=["bash", submit_script.name],
+            log_file=submit_script.parent / "submit_script.log",
+            cwd=submit_script.parent,
+        )
+        for submit_script in submit_scripts
+    ]
+
+    def report(result: JobResult) -> None:
+        status = "done" if result.ok else f"FAILED ({result.returncode})"
+        print(f"[{time.ctime()}] {result.name}: {status}")
+
+    supervised = supervise(
+        jobs,
+        MAX_SIMS,
+        retries=SIM_RETRIES,
+        transient=SIM_TRANSIENT,
+        on_done=report,
+    )
+    print(status_report(supervised))
+    if RUN_STATE is not None:
+        # connected after detach, not across the fork
+        run_state = connect(RUN_STATE)
+        for job, item in zip(jobs, supervised):
+            record_result(
+                run_state,
+                job.name,
+                "submit",
+                item.result,
+                inputs=[job.cwd / "ssm_input.i", job.cwd / "submit_script.sh"],
+            )
+    if not all(item.result.ok for item in supervised):
+        sys.exit(1)
+    print("All submit scripts have completed.")
 
 else:
     print("Skipping simulation runs.")
@@ -0,0 +1,275 @@
+"""This module writes the output requests of the Abaqus step from a named
+profile, in place of the one fixed block of step_case1.inp, and estimates
+the size of the .odb each profile writes.
+
+step_case1.inp requests, every 0.001 s, LE, ER, and S on every element and
+A, U, and V on every node, and a restart.  The post-processing scripts read
+only LE and ER on element set EB1.  A profile (PROFILES) sets the field
+output interval, the node and element variables, the element set, and the
+restart, and replaces the block between "** OUTPUT REQUESTS" and
+"*End Step" of the step file, written as step_case1_<profile>.inp next to
+it.  A sweep selects the step file of a profile with its profile column
+(see templates.py).
+
+The .odb estimate counts single-precision values per frame: the components
+of every element variable at the integration point of every element of
+the set (C3D8R, one point), and of every node variable at every node.
+
+To run, from the repository root, to write the step file of every profile
+and report the .odb size of each for a mesh:
+source ~/autotwin/autosim/.venv/bin/activate
+python src/autosim/ssm/output_profiles.py \
+    -s abaqus_inp_files/step_case1.inp \
+    -m abaqus_mesh/IXI012-HH-1211-T1_run1.inp \
+    -t base_template.inp
+
+To test:
+pytest --cov --cov-report=term-missing
+"""
+
+import argparse
+import math
+from pathlib import Path
+from typing import Final, NamedTuple
+
+from autosim.ssm.explicit_cost import read_model
+from autosim.ssm.inp_reader import read_mesh
+
+BEGIN: Final[str] = "** OUTPUT REQUESTS"
+END: Final[str] = "*End Step"
+INSTANCE: Final[str] = "PART-1-1"  # see assembly.inp
+BYTES_PER_VALUE: Final[int] = 4  # single precision
+# components of the output variables of a 3D element or node
+COMPONENTS: Final[dict[str, int]] = {
+    "A": 3,
+    "U": 3,
+    "V": 3,
+    "LE": 6,
+    "ER": 6,
+    "S": 6,
+}
+
+
+class OutputProfile(NamedTuple):
+    """The output requests of a step."""
+
+    name: str
+    field_interval: float  # seconds between field output frames
+    node_output: tuple[str, ...]
+    element_output: tuple[str, ...]
+    elset: str | None  # element set of the element output, None for all
+    restart_intervals: int | None  # restart states per step, None for none
+
+
+PROFILES: Final[dict[str, OutputProfile]] = {
+    item.name: item
+    for item in (
+        # as step_case1.inp
+        OutputProfile(
+            name="full",
+            field_interval=0.001,
+            node_output=("A", "U", "V"),
+            element_output=("LE", "ER", "S"),
+            elset=None,
+            restart_intervals=1,
+        ),
+        # what the post-processing scripts read, and a restart at the end of
+        # the step, the coarsest interval
+        OutputProfile(
+            name="postproc-minimal",
+            field_interval=0.001,
+            node_output=(),
+            element_output=("LE", "ER"),
+            elset="EB1",
+            restart_intervals=1,
+        ),
+        # as postproc-minimal, without restart files
+        OutputProfile(
+            name="postproc-norestart",
+            field_interval=0.001,
+            node_output=(),
+            element_output=("LE", "ER"),
+            elset="EB1",
+            restart_intervals=None,
+        ),
+    )
+}
+
+
+def output_requests(profile: OutputProfile) -> str:
+    """Write the output request block of a profile.
+
+    Args:
+        profile: The output profile.
+
+    Returns:
+        The block, from "** OUTPUT REQUESTS" up to, not including,
+        "*End Step".
+    """
+    lines = [BEGIN, f"** Output profile: {profile.name}", "** "]
+    if profile.restart_intervals is not None:
+        intervals = profile.restart_intervals
+        lines += [
+            f"*Restart, write, number interval={intervals}, time marks=NO",
+            "** ",
+        ]
+    lines += [
+        "** FIELD OUTPUT: F-Output-1",
+        "** ",
+        f"*Output, field, time interval={profile.field_interval:g}",
+    ]
+    if profile.node_output:
+        lines += ["*Node Output", ", ".join(profile.node_output)]
+        if profile.element_output:
+            lines += ["** ", "** FIELD OUTPUT: F-Output-2", "** "]
+    if profile.element_output:
+        elset = ""
+        if profile.elset is not None:
+            elset = f", elset={INSTANCE}.{profile.elset}"
+        lines += [
+            f"*Element Output{elset}, directions=YES",
+            ", ".join(profile.element_output),
+        ]
+    lines += [
+        "** ",
+        "** HISTORY OUTPUT: H-Output-1",
+        "** ",
+        "*Output, history, variable=PRESELECT",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def apply_profile(step: str, profile: OutputProfile) -> str:
+    """Replace the output requests of a step with those of a profile.
+
+    Args:
+        step: The text of the step file.
+        profile: The output profile.
+
+    Returns:
+        The step text with the output request block replaced.
+
+    Raises:
+        ValueError: If the step has no output request block.
+    """
+    begin = step.find(BEGIN)
+    end = step.find(END, begin)
+    if begin < 0 or end < 0:
+        msg = f'Step has no block from "{BEGIN}" to "{END}".'
+        raise ValueError(msg)
+    return step[:begin] + output_requests(profile) + step[end:]
+
+
+def step_file(step: Path, profile: str) -> Path:
+    """Return the step file of a profile, e.g., step_case1_full.inp."""
+    return step.with_name(f"{step.stem}_{profile}{step.suffix}")
+
+
+def odb_size(
+    profile: OutputProfile,
+    n_frames: int,
+    n_nodes: int,
+    n_elements: int,
+) -> int:
+    """Estimate the bytes of field output of a profile.
+
+    Args:
+        profile: The output profile.
+        n_frames: The field output frames.
+        n_nodes: The nodes of the mesh.
+        n_elements: The elements of the element set of the profile.
+
+    Returns:
+        The estimated bytes.
+    """
+    per_node = sum(COMPONENTS[item] for item in profile.node_output)
+    per_element = sum(COMPONENTS[item] for item in profile.element_output)
+    values = n_nodes * per_node + n_elements * per_element
+    return n_frames * values * BYTES_PER_VALUE
+
+
+def size_report(
+    mesh_file: Path, step_time: float, profiles: list[OutputProfile]
+) -> list[dict]:
+    """Estimate the .odb size of every profile for a mesh.
+
+    Args:
+        mesh_file: The .inp mesh.
+        step_time: The step time, in seconds.
+        profiles: The output profiles.
+
+    Returns:
+        A row per profile: its name, frames, and estimated size in MB.
+
+    Raises:
+        KeyError: If the mesh lacks the element set of a profile.
+    """
+    mesh = read_mesh(mesh_file)
+    rows = []
+    for profile in profiles:
+        n_frames = math.floor(step_time / profile.field_interval + 1e-9) + 1
+        n_elements = (
+            len(mesh.element_ids)
+            if profile.elset is None
+            else len(mesh.elsets[profile.elset])
+        )
+        size = odb_size(profile, n_frames, len(mesh.node_ids), n_elements)
+        rows.append(
+            {
+                "profile": profile.name,
+                "frames": n_frames,
+                "elements": n_elements,
+                "odb_mb": size / 1e6,
+            }
+        )
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Write the step file of every output profile, and "
+        "estimate the .odb size of each."
+    )
+    parser.add_argument(
+        "-s",
+        "--step",
+        required=False,
+        type=str,
+        default="abaqus_inp_files/step_case1.inp",
+        help="Path to the step file.",
+    )
+    parser.add_argument(
+        "-m",
+        "--mesh",
+        required=False,
+        type=str,
+        default=None,
+        help="Path to an .inp mesh, for the size report.",
+    )
+    parser.add_argument(
+        "-t",
+        "--template",
+        required=False,
+        type=str,
+        default="base_template.inp",
+        help="Path to the input template, for the step time.",
+    )
+    args = parser.parse_args()
+
+    step = Path(args.step).expanduser()
+    text = step.read_text()
+    for name, profile in PROFILES.items():
+        path = step_file(step, name)
+        path.write_text(apply_profile(text, profile))
+        print(f"Wrote {path}")
+
+    if args.mesh is not None:
+        step_time = read_model(Path(args.template).expanduser()).step_time
+        rows = size_report(
+            Path(args.mesh).expanduser(), step_time, list(PROFILES.values())
+        )
+        for row in rows:
+            print(
+                f"{row['profile']}: {row['frames']} frames,"
+                f" {row['elements']} elements, {row['odb_mb']:.1f} MB"
+            )
@@ -0,0 +1,338 @@
+"""This module builds every mesh resolution (tiny, small, medium, large)
+from one high-resolution segmentation per subject, and records the voxel
+size of every level so the mesh scale no longer depends on the file name.
+
+Downsampling is a label-preserving block majority (mode): every source
+voxel is assigned to the target voxel that contains its index,
+floor(i * n_target / n_source) along each axis, and every target voxel
+takes the most frequent ID among its source voxels, with ties going to the
+smaller ID.  Block sizes need not be integers, since the tiny, small, and
+medium resolutions are not integer divisors of large.  Every level is
+counted in the same sweep over the source, slab by slab, so the source is
+read once; a level of the source shape is the source itself.
+
+Each level is written as <stem>_<level>.npy with a JSON sidecar (see
+segmentation_io.py) holding "voxel_size", the per-axis voxel size in cm.
+
+To run:
+source ~/autotwin/autosim/.venv/bin/activate
+python ~/autotwin/autosim/src/autosim/ssm/pyramid.py \
+    -i ~/scratch/ixi/source/IXI012-HH-1211-T1.npy \
+    -o ~/scratch/ixi/input/ \
+    -r 7.5
+
+To test:
+pytest --cov --cov-report=term-missing
+"""
+
+import argparse
+from pathlib import Path
+from typing import Final
+
+import numpy as np
+
+from autosim.ssm.segmentation_io import (
+    SLAB_SIZE,
+    read_segmentation,
+    read_sidecar,
+    write_sidecar,
+)
+
+# Histogram entries per np.bincount, 512 MB of int64 counts, before a slab
+# is counted in parts
+COUNT_BUDGET: Final[int] = 1 << 26
+RESOLUTION: Final[dict[str, float]] = {
+    "tiny": 12.0 / 20.0,  # voxel/cm
+    "small": 42.0 / 20.0,  # voxel/cm
+    "medium": 80.0 / 20.0,  # voxel/cm
+    "large": 150.0 / 20.0,  # voxel/cm
+}
+
+
+def target_shape(
+    shape: tuple[int, ...],
+    source_voxel_size: np.ndarray,
+    target_voxel_size: np.ndarray,
+) -> tuple[int, ...]:
+    """Calculate the shape that spans the source extent at a target voxel
+    size, rounded to whole voxels and at least one voxel per axis.
+
+    Args:
+        shape: The shape of the source segmentation.
+        source_voxel_size: The (3,) source voxel size.
+        target_voxel_size: The (3,) target voxel size, in the same unit.
+
+    Returns:
+        The target shape.
+    """
+    extent = np.asarray(shape) * np.asarray(source_voxel_size)
+    n_target = np.rint(extent / np.asarray(target_voxel_size)).astype(int)
+    return tuple(int(item) for item in np.maximum(n_target, 1))
+
+
+def _compact(segmentation: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Number the IDs of a segmentation by the IDs present.
+
+    Args:
+        segmentation: The non-negative integer segmentation.
+
+    Returns:
+        The sorted IDs present, and the int64 index of the ID of every
+        voxel among them.
+    """
+    flat = segmentation.ravel()
+    top = int(flat.max())
+    if top < flat.size:
+        # a lookup table no larger than the segmentation, without a sort
+        ids = np.flatnonzero(np.bincount(flat, minlength=top + 1))
+        lookup = np.zeros(top + 1, dtype=np.int64)
+        lookup[ids] = np.arange(len(ids))
+        return ids.astype(segmentation.dtype), lookup[segmentation]
+    ids, inverse = np.unique(flat, return_inverse=True)
+    return ids, inverse.reshape(segmentation.shape).astype(np.int64)
+
+
+def _merge(
+    carry: tuple[np.ndarray, np.ndarray], ids: np.ndarray, counts: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """Add the histogram of a continued target plane to the first plane of
+    histograms over other IDs.
+
+    Args:
+        carry: The sorted IDs, and the (n_cells_plane, n_carry) histogram of
+            the continued plane.
+        ids: The sorted IDs of counts.
+        counts: The (n_planes, n_cells_plane, n_ids) histograms.
+
+    Returns:
+        The sorted IDs of both, and the histograms over them.
+    """
+    carry_ids, carried = carry
+    if not np.array_equal(carry_ids, ids):
+        merged = np.union1d(carry_ids, ids)
+        widened = np.zeros(counts.shape[:2] + (len(merged),), np.int64)
+        widened[:, :, np.searchsorted(merged, ids)] = counts
+        ids, counts = merged, widened
+    counts[0][:, np.searchsorted(ids, carry_ids)] += carried
+    return ids, counts
+
+
+def downsample_levels(
+    segmentation: np.ndarray,
+    shapes: list[tuple[int, ...]],
+    slab_size: int = SLAB_SIZE,
+) -> list[np.ndarray]:
+    """Downsample a segmentation to several shapes by block majority (mode),
+    in one sweep over the source.
+
+    Source planes are read in slabs of `slab_size` planes along the first
+    axis.  The IDs of a slab are numbered by the IDs present (np.unique), so
+    sparse or large IDs cost no more than dense ones, and the per-voxel
+    histograms of the target planes it covers are built with np.bincount,
+    in parts of at most COUNT_BUDGET entries.  A target plane that
+    continues into the next part carries its histogram over.  A shape equal
+    to the source is neither counted nor copied.
+
+    Args:
+        segmentation: The non-negative integer segmentation, possibly
+            memory mapped.
+        shapes: The target shapes, no larger than the source along any
+            axis.
+        slab_size: The number of first-axis source planes per slab.
+
+    Returns:
+        The downsampled segmentation of every shape, with the dtype of the
+        source; the segmentation itself for a shape equal to the source.
+
+    Raises:
+        ValueError: If a target shape is larger than the source along any
+            axis.
+    """
+    source = segmentation.shape
+    for shape in shapes:
+        if len(shape) != 3 or any(
+            tt < 1 or tt > ss for tt, ss in zip(shape, source)
+        ):
+            msg = f"Target shape {shape} must be between one voxel and the"
+            msg += f" source shape {source} along every axis."
+            raise ValueError(msg)
+
+    counted = [ii for ii, shape in enumerate(shapes) if shape != source]
+    levels: list[np.ndarray] = [segmentation] * len(shapes)
+    maps: dict[int, list[np.ndarray]] = {}
+    for ii in counted:
+        levels[ii] = np.empty(shapes[ii], dtype=segmentation.dtype)
+        # target index of every source index, along each axis
+        maps[ii] = [
+            (np.arange(ns, dtype=np.int64) * nt) // ns
+            for ns, nt in zip(source, shapes[ii])
+        ]
+    # IDs and histogram of the last target plane counted, if continued
+    carry: dict[int, tuple[np.ndarray, np.ndarray] | None] = dict.fromkeys(
+        counted
+    )
+
+    for s0 in range(0, source[0] if counted else 0, slab_size):
+        s1 = min(s0 + slab_size, source[0])
+        slab = np.asarray(segmentation[s0:s1])
+        ids, compact = _compact(slab)
+        n_ids = len(ids)
+        for ii in counted:
+            shape, (map0, map1, map2) = shapes[ii], maps[ii]
+            n_cells_plane = shape[1] * shape[2]
+            # a source plane falls in one target plane, so a part of step
+            # source planes has at most step target planes
+            step = max(COUNT_BUDGET // (n_cells_plane * n_ids), 1)
+            for c0 in range(s0, s1, step):
+                c1 = min(c0 + step, s1)
+                t0, t1 = int(map0[c0]), int(map0[c1 - 1]) + 1
+                cell = (
+                    (map0[c0:c1] - t0)[:, None, None] * n_cells_plane
+                    + map1[None, :, None] * shape[2]
+                    + map2[None, None, :]
+                )
+                counts = np.bincount(
+                    (cell * n_ids + compact[c0 - s0 : c1 - s0]).ravel(),
+                    minlength=(t1 - t0) * n_cells_plane * n_ids,
+                ).reshape(t1 - t0, n_cells_plane, n_ids)
+                present = ids
+                if carry[ii] is not None:
+                    present, counts = _merge(carry[ii], ids, counts)
+
+                # the last plane is complete unless the next part continues
+                # it
+                done = t1 - 1 if c1 < source[0] and map0[c1] == t1 - 1 else t1
+                carry[ii] = (present, counts[-1]) if done < t1 else None
+                levels[ii][t0:done] = present[
+                    counts[: done - t0].argmax(axis=2)
+                ].reshape(done - t0, shape[1], shape[2])
+
+    return levels
+
+
+def downsample_mode(
+    segmentation: np.ndarray,
+    shape: tuple[int, ...],
+    slab_size: int = SLAB_SIZE,
+) -> np.ndarray:
+    """Downsample a segmentation to a shape by block majority (mode), see
+    downsample_levels.
+
+    Args:
+        segmentation: The non-negative integer segmentation, possibly
+            memory mapped.
+        shape: The target shape, no larger than the source along any axis.
+        slab_size: The number of first-axis source planes per slab.
+
+    Returns:
+        The downsampled segmentation, with the dtype of the source.
+
+    Raises:
+        ValueError: If the target shape is larger than the source along any
+            axis.
+    """
+    return downsample_levels(segmentation, [shape], slab_size)[0]
+
+
+def voxel_size(path: Path) -> np.ndarray | None:
+    """Return the per-axis voxel size, in cm, recorded in the sidecar of a
+    segmentation file.
+
+    Args:
+        path: The segmentation file.
+
+    Returns:
+        The (3,) voxel size, or None if the sidecar does not record it.
+    """
+    size = read_sidecar(path).get("voxel_size")
+    return None if size is None else np.asarray(size, dtype=np.float64)
+
+
+def build_pyramid(
+    input_file: Path,
+    output_folder: Path,
+    source_resolution: float,
+    levels: dict[str, float] = RESOLUTION,
+) -> dict[str, Path]:
+    """Write every resolution level of a segmentation, read once, in one
+    sweep (see downsample_levels).
+
+    Args:
+        input_file: The high-resolution segmentation, in any supported
+            format.
+        output_folder: The folder for the <stem>_<level>.npy files.
+        source_resolution: The resolution of the source, in voxel/cm, used
+            unless the sidecar of the source records its voxel size.
+        levels: The target resolutions, in voxel/cm, by level name.
+
+    Returns:
+        The written file of every level, by level name.
+    """
+    segmentation = read_segmentation(input_file)
+    source_size = voxel_size(input_file)
+    if source_size is None:
+        source_size = np.full(3, 1.0 / source_resolution)
+
+    output_folder.mkdir(parents=True, exist_ok=True)
+    stem = input_file.stem
+    shapes = [
+        target_shape(
+            segmentation.shape, source_size, np.full(3, 1.0 / resolution)
+        )
+        for resolution in levels.values()
+    ]
+    downsampled = downsample_levels(segmentation, shapes)
+
+    written = {}
+    for name, shape, level in zip(levels, shapes, downsampled):
+        # the rounded shape sets the exact voxel size of the level
+        size = np.asarray(segmentation.shape) * source_size / np.asarray(shape)
+
+        output_file = output_folder.joinpath(f"{stem}_{name}.npy")
+        np.save(output_file, level)
+        write_sidecar(
+            output_file,
+            voxel_size=size.tolist(),
+            unit="cm",
+            source=str(input_file),
+        )
+        written[name] = output_file
+
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Build the tiny, small, medium, and large resolutions "
+        "of a segmentation."
+    )
+    parser.add_argument(
+        "-i",
+        "--input",
+        required=True,
+        type=str,
+        help="Path to the high-resolution segmentation file.",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        required=True,
+        type=str,
+        help="Folder for the resolution levels.",
+    )
+    parser.add_argument(
+        "-r",
+        "--resolution",
+        required=True,
+        type=float,
+        help="Resolution of the source segmentation, in voxel/cm.",
+    )
+    args = parser.parse_args()
+
+    files = build_pyramid(
+        input_file=Path(args.input).expanduser(),
+        output_folder=Path(args.output).expanduser(),
+        source_resolution=args.resolution,
+    )
+    for name, path in files.items():
+        print(f"{name}: {path} ({voxel_size(path)} cm/voxel)")
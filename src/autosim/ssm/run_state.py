@@ -0,0 +1,351 @@
+"""This module records the state of every subject of a campaign, across all
+pipeline stages, in an SQLite database, in place of crawling the result
+folders (check_run1_simulations.sh).
+
+Every stage (STAGES) records, per subject, its status (running, done, or
+failed), its start and end times, its inputs and outputs, and a message,
+such as an exit status or a job ID.  A rerun of a stage overwrites its
+record.  The subjects of a campaign are registered up front, or by their
+first record, so a subject that never reached a stage is incomplete too.
+
+Example:
+    connection = connect(Path("run_state.sqlite"))
+    with track(connection, "IXI012", "extract", inputs=[odb]) as outputs:
+        outputs.append(percentiles_file)
+    print(incomplete(connection, "extract"))
+
+To run, e.g., from the repository root:
+source ~/autotwin/autosim/.venv/bin/activate
+python src/autosim/ssm/run_state.py -d run_state.sqlite summary
+python src/autosim/ssm/run_state.py -d run_state.sqlite incomplete -s plot
+python src/autosim/ssm/run_state.py -d run_state.sqlite failed
+
+To test:
+pytest --cov --cov-report=term-missing
+"""
+
+import argparse
+import contextlib
+import json
+import sqlite3
+import time
+from collections.abc import Iterator, Sequence
+from pathlib import Path
+from typing import Final, NamedTuple
+
+from autosim.ssm.executor import JobResult
+
+DATABASE: Final[str] = "run_state.sqlite"
+STAGES: Final[tuple[str, ...]] = (
+    "segmentation_to_mesh",
+    "mesh_to_sim",
+    "submit",
+    "extract",
+    "plot",
+)
+RUNNING: Final[str] = "running"
+DONE: Final[str] = "done"
+FAILED: Final[str] = "failed"
+SCHEMA: Final[str] = """
+CREATE TABLE IF NOT EXISTS subjects (
+    subject TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS runs (
+    subject TEXT NOT NULL REFERENCES subjects (subject),
+    stage TEXT NOT NULL,
+    status TEXT NOT NULL,
+    started REAL,
+    ended REAL,
+    inputs TEXT NOT NULL DEFAULT '[]',
+    outputs TEXT NOT NULL DEFAULT '[]',
+    message TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (subject, stage)
+);
+CREATE INDEX IF NOT EXISTS runs_by_stage ON runs (stage, status);
+"""
+
+
+class Run(NamedTuple):
+    """The record of one stage of one subject."""
+
+    subject: str
+    stage: str
+    status: str
+    started: float | None  # seconds since the epoch
+    ended: float | None  # None while running
+    inputs: list[str]
+    outputs: list[str]
+    message: str
+
+
+def connect(path: Path) -> sqlite3.Connection:
+    """Open a run-state database, creating its tables if needed.
+
+    Args:
+        path: The .sqlite file.
+
+    Returns:
+        The connection, in autocommit mode, so every record is kept even
+        if the stage is interrupted.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(path, isolation_level=None, timeout=30.0)
+    connection.execute("PRAGMA journal_mode=WAL")  # concurrent readers
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def _check_stage(stage: str) -> None:
+    if stage not in STAGES:
+        msg = f"Unknown stage {stage!r}, expected one of {STAGES}."
+        raise ValueError(msg)
+
+
+def add_subjects(connection: sqlite3.Connection, subjects: list[str]) -> None:
+    """Register the subjects of a campaign."""
+    connection.executemany(
+        "INSERT OR IGNORE INTO subjects (subject) VALUES (?)",
+        [(item,) for item in subjects],
+    )
+
+
+def record_stage(
+    connection: sqlite3.Connection,
+    subject: str,
+    stage: str,
+    status: str,
+    started: float | None = None,
+    ended: float | None = None,
+    inputs: Sequence = (),
+    outputs: Sequence = (),
+    message: str = "",
+) -> None:
+    """Record the state of a stage of a subject, replacing an earlier one.
+
+    Args:
+        connection: The run-state database.
+        subject: The subject, e.g., the mesh name without its suffix.
+        stage: One of STAGES.
+        status: RUNNING, DONE, or FAILED.
+        started: The start time, in seconds since the epoch.
+        ended: The end time, None while running.
+        inputs: The input files.
+        outputs: The output files, or other results such as a job ID.
+        message: An exit status, error, or note.
+
+    Raises:
+        ValueError: If the stage or status is unknown.
+    """
+    _check_stage(stage)
+    if status not in (RUNNING, DONE, FAILED):
+        raise ValueError(f"Unknown status {status!r}.")
+    add_subjects(connection, [subject])
+    connection.execute(
+        "INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            subject,
+            stage,
+            status,
+            started,
+            ended,
+            json.dumps([str(item) for item in inputs]),
+            json.dumps([str(item) for item in outputs]),
+            message,
+        ),
+    )
+
+
+def record_result(
+    connection: sqlite3.Connection,
+    subject: str,
+    stage: str,
+    result: JobResult,
+    inputs: Sequence = (),
+    outputs: Sequence = (),
+) -> None:
+    """Record the stage of a subject from the result of its job.
+
+    Args:
+        connection: The run-state database.
+        subject: The subject.
+        stage: One of STAGES.
+        result: The result of the job, see executor.py.
+        inputs: The input files.
+        outputs: The output files.
+    """
+    ended = time.time()
+    record_stage(
+        connection,
+        subject,
+        stage,
+        DONE if result.ok else FAILED,
+        started=ended - result.wall_time,
+        ended=ended,
+        inputs=inputs,
+        outputs=outputs,
+        message=f"exit status {result.returncode}, see {result.log_file}",
+    )
+
+
+@contextlib.contextmanager
+def track(
+    connection: sqlite3.Connection,
+    subject: str,
+    stage: str,
+    inputs: Sequence = (),
+) -> Iterator[list]:
+    """Record a stage of a subject run in-process: running on entry, then
+    done, or failed with the error if it raises, which is re-raised.
+
+    Args:
+        connection: The run-state database.
+        subject: The subject.
+        stage: One of STAGES.
+        inputs: The input files.
+
+    Yields:
+        The list of outputs, for the stage to append to.
+    """
+    started = time.time()
+    outputs: list = []
+    record_stage(connection, subject, stage, RUNNING, started, None, inputs)
+    try:
+        yield outputs
+    except BaseException as error:
+        record_stage(
+            connection,
+            subject,
+            stage,
+            FAILED,
+            started,
+            time.time(),
+            inputs,
+            outputs,
+            message=repr(error),
+        )
+        raise
+    record_stage(
+        connection, subject, stage, DONE, started, time.time(), inputs, outputs
+    )
+
+
+def _run(row: tuple) -> Run:
+    subject, stage, status, started, ended, inputs, outputs, message = row
+    return Run(
+        subject,
+        stage,
+        status,
+        started,
+        ended,
+        json.loads(inputs),
+        json.loads(outputs),
+        message,
+    )
+
+
+def runs(connection: sqlite3.Connection, subject: str) -> list[Run]:
+    """Return the records of a subject, in pipeline order."""
+    rows = connection.execute(
+        "SELECT * FROM runs WHERE subject = ?", (subject,)
+    ).fetchall()
+    return sorted(map(_run, rows), key=lambda item: STAGES.index(item.stage))
+
+
+def incomplete(connection: sqlite3.Connection, stage: str) -> list[str]:
+    """Return the subjects whose stage is not done: never run, running, or
+    failed.
+
+    Raises:
+        ValueError: If the stage is unknown.
+    """
+    _check_stage(stage)
+    rows = connection.execute(
+        "SELECT subjects.subject FROM subjects LEFT JOIN runs"
+        " ON runs.subject = subjects.subject AND runs.stage = ?"
+        " WHERE runs.status IS NULL OR runs.status != ?"
+        " ORDER BY subjects.subject",
+        (stage, DONE),
+    ).fetchall()
+    return [subject for (subject,) in rows]
+
+
+def failed(connection: sqlite3.Connection) -> list[Run]:
+    """Return the failed records, by subject and pipeline order."""
+    rows = connection.execute(
+        "SELECT * FROM runs WHERE status = ? ORDER BY subject", (FAILED,)
+    ).fetchall()
+    return sorted(
+        map(_run, rows),
+        key=lambda item: (item.subject, STAGES.index(item.stage)),
+    )
+
+
+def summary(connection: sqlite3.Connection) -> dict[str, dict[str, int]]:
+    """Count the subjects of every stage by status, "missing" for the
+    subjects without a record."""
+    (n_subjects,) = connection.execute(
+        "SELECT COUNT(*) FROM subjects"
+    ).fetchone()
+    counts = {stage: {"missing": n_subjects} for stage in STAGES}
+    rows = connection.execute(
+        "SELECT stage, status, COUNT(*) FROM runs GROUP BY stage, status"
+    ).fetchall()
+    for stage, status, count in rows:
+        counts[stage][status] = count
+        counts[stage]["missing"] -= count
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Query the run state of a campaign."
+    )
+    parser.add_argument(
+        "-d",
+        "--database",
+        required=False,
+        type=str,
+        default=DATABASE,
+        help="Path to the run-state database.",
+    )
+    parser.add_argument(
+        "query",
+        choices=["summary", "incomplete", "failed", "add"],
+        help="summary: counts by stage and status; incomplete: subjects"
+        " not done with a stage; failed: failed stages; add: register the"
+        " subjects of a mesh list.",
+    )
+    parser.add_argument(
+        "-s",
+        "--stage",
+        required=False,
+        choices=STAGES,
+        default=STAGES[-1],
+        help="The stage of the incomplete query.",
+    )
+    parser.add_argument(
+        "-l",
+        "--list",
+        required=False,
+        type=str,
+        help="Path to the mesh list of the add query.",
+    )
+    args = parser.parse_args()
+
+    connection = connect(Path(args.database).expanduser())
+    if args.query == "summary":
+        for stage, counts in summary(connection).items():
+            text = ", ".join(f"{n} {status}" for status, n in counts.items())
+            print(f"{stage}: {text}")
+    elif args.query == "incomplete":
+        for subject in incomplete(connection, args.stage):
+            print(subject)
+    elif args.query == "failed":
+        for item in failed(connection):
+            print(f"{item.subject} {item.stage}: {item.message}")
+    else:
+        if args.list is None:
+            parser.error("add needs a mesh list (-l).")
+        meshes = Path(args.list).expanduser().read_text().split()
+        add_subjects(connection, [Path(item).stem for item in meshes])
+        print(f"Registered {len(meshes)} subject(s).")
@@ -0,0 +1,221 @@
+"""This module reads segmentations from .npy, .npz, .spn, and headerless
+.raw files, and narrows label volumes to the smallest integer type that
+holds their IDs.
+
+Formats:
+    .npy: memory mapped, so nothing is read until used.
+    .npz: the array named "segmentation", or the only array in the archive.
+    .spn: text, one ID per line, with the first axis varying fastest, as
+        written by automesh.  The shape comes from a sidecar or argument.
+    .raw: headerless binary, memory mapped.  The shape and dtype come from
+        a sidecar.
+
+A sidecar is a JSON file next to the segmentation, named by appending
+.json to the file name, e.g., letter_f.spn.json, with the keys
+    "shape": [n0, n1, n2] (required for .spn and .raw),
+    "dtype": "uint8" (required for .raw),
+    "order": "C" or "F" (default "F" for .spn, "C" for .raw).
+
+Segmentations often arrive as int64, which is eight times the memory that
+a uint8 volume with fewer than 256 IDs needs.  Narrowing converts slab by
+slab, so the wide array is never copied in full, and is a no-op (no copy)
+when the array already has the narrowest type.
+"""
+
+import json
+from pathlib import Path
+from typing import Final
+
+import numpy as np
+
+SLAB_SIZE: Final[int] = 64  # number of first-axis (z) planes per slab
+SUFFIXES: Final[tuple[str, ...]] = (".npy", ".npz", ".spn", ".raw")
+
+
+def sidecar_path(path: Path) -> Path:
+    """Return the path of the JSON sidecar of a segmentation file."""
+    return path.with_name(path.name + ".json")
+
+
+def read_sidecar(path: Path) -> dict:
+    """Read the JSON sidecar of a segmentation file.
+
+    Args:
+        path: The segmentation file.
+
+    Returns:
+        The sidecar contents, or an empty dict if there is no sidecar.
+    """
+    sidecar = sidecar_path(path)
+    if not sidecar.is_file():
+        return {}
+    with open(sidecar, "r") as file:
+        return json.load(file)
+
+
+def write_sidecar(path: Path, **metadata) -> Path:
+    """Write, or update, the JSON sidecar of a segmentation file.
+
+    Args:
+        path: The segmentation file.
+        metadata: Keys to set in the sidecar, e.g., shape=[3, 5, 1].
+
+    Returns:
+        The path of the sidecar.
+    """
+    contents = read_sidecar(path)
+    contents.update(metadata)
+    sidecar = sidecar_path(path)
+    with open(sidecar, "w") as file:
+        json.dump(contents, file, indent=2)
+    return sidecar
+
+
+def narrowest_dtype(low: int, high: int) -> np.dtype:
+    """Return the smallest integer type that holds values in [low, high],
+    unsigned if low is non-negative.
+
+    Args:
+        low: The smallest value.
+        high: The largest value.
+
+    Returns:
+        The narrowest integer dtype.
+    """
+    kinds = (
+        (np.uint8, np.uint16, np.uint32, np.uint64)
+        if low >= 0
+        else (np.int8, np.int16, np.int32, np.int64)
+    )
+    for kind in kinds:
+        info = np.iinfo(kind)
+        if info.min <= low and high <= info.max:
+            return np.dtype(kind)
+    return np.dtype(kinds[-1])
+
+
+def narrow(segmentation: np.ndarray, slab_size: int = SLAB_SIZE) -> np.ndarray:
+    """Convert an integer segmentation to the narrowest integer type that
+    holds its IDs.
+
+    Args:
+        segmentation: The segmentation, possibly memory mapped.
+        slab_size: The number of first-axis planes converted at a time.
+
+    Returns:
+        The segmentation itself if it already has the narrowest type or is
+        not an integer array, otherwise a narrowed in-memory copy.
+    """
+    if segmentation.size == 0 or segmentation.dtype.kind not in "iu":
+        return segmentation
+
+    n_planes = segmentation.shape[0]
+    low, high = None, None
+    for start in range(0, n_planes, slab_size):
+        slab = segmentation[start : start + slab_size]
+        slab_low, slab_high = int(slab.min()), int(slab.max())
+        low = slab_low if low is None else min(low, slab_low)
+        high = slab_high if high is None else max(high, slab_high)
+
+    dtype = narrowest_dtype(low, high)
+    if dtype == segmentation.dtype:
+        return segmentation
+
+    narrowed = np.empty(segmentation.shape, dtype=dtype)
+    for start in range(0, n_planes, slab_size):
+        narrowed[start : start + slab_size] = segmentation[
+            start : start + slab_size
+        ]
+    return narrowed
+
+
+def _shape(path: Path, shape: tuple[int, ...] | None, sidecar: dict):
+    """Return the shape from the argument or sidecar, or raise."""
+    if shape is None:
+        shape = sidecar.get("shape")
+    if shape is None:
+        msg = f"File {path} needs a shape, given as an argument or in the"
+        msg += f" sidecar {sidecar_path(path)}."
+        raise ValueError(msg)
+    return tuple(int(item) for item in shape)
+
+
+def read_segmentation(
+    path: Path,
+    shape: tuple[int, ...] | None = None,
+    narrow_dtype: bool = True,
+) -> np.ndarray:
+    """Read a segmentation in any supported format.
+
+    Args:
+        path: The .npy, .npz, .spn, or .raw segmentation file.
+        shape: The shape of a .spn or .raw segmentation, overriding the
+            sidecar.
+        narrow_dtype: Whether to narrow the IDs to the smallest integer
+            type, see narrow().
+
+    Returns:
+        The segmentation.  A .npy or .raw file that is not narrowed, or is
+        already narrowest, is returned memory mapped and read-only.
+
+    Raises:
+        FileNotFoundError: If the file does not exist.
+        ValueError: If the format is unsupported, or the shape or dtype is
+            missing or inconsistent with the file.
+    """
+    if not path.is_file():
+        raise FileNotFoundError(f"File {path} not found.")
+
+    suffix = path.suffix
+    sidecar = read_sidecar(path)
+
+    if suffix == ".npy":
+        segmentation = np.load(path, mmap_mode="r")
+
+    elif suffix == ".npz":
+        with np.load(path) as archive:
+            names = archive.files
+            if "segmentation" in names:
+                segmentation = archive["segmentation"]
+            elif len(names) == 1:
+                segmentation = archive[names[0]]
+            else:
+                msg = f"File {path} must contain one array or an array"
+                msg += f" named 'segmentation', found {names}."
+                raise ValueError(msg)
+
+    elif suffix == ".spn":
+        shape = _shape(path, shape, sidecar)
+        order = sidecar.get("order", "F")
+        values = np.fromfile(path, dtype=np.int64, sep=" ")
+        if values.size != int(np.prod(shape)):
+            msg = f"File {path} has {values.size} values, which does not"
+            msg += f" match shape {shape}."
+            raise ValueError(msg)
+        segmentation = values.reshape(shape, order=order)
+
+    elif suffix == ".raw":
+        shape = _shape(path, shape, sidecar)
+        if "dtype" not in sidecar:
+            msg = f"File {path} needs a dtype in the sidecar"
+            msg += f" {sidecar_path(path)}."
+            raise ValueError(msg)
+        dtype = np.dtype(sidecar["dtype"])
+        order = sidecar.get("order", "C")
+        expected = int(np.prod(shape)) * dtype.itemsize
+        if path.stat().st_size != expected:
+            msg = f"File {path} has {path.stat().st_size} bytes, expected"
+            msg += f" {expected} for shape {shape} and dtype {dtype}."
+            raise ValueError(msg)
+        segmentation = np.memmap(
+            path, dtype=dtype, mode="r", shape=shape, order=order
+        )
+
+    else:
+        msg = f"File {path} must be one of {', '.join(SUFFIXES)}."
+        raise ValueError(msg)
+
+    if narrow_dtype:
+        segmentation = narrow(segmentation)
+
+    return segmentation
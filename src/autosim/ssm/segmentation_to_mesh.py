@@ -7,8 +7,10 @@ python src/autosim/ssm/segmentation_to_mesh.py
 """
 
 from enum import Enum
+import os
 from pathlib import Path
-import subprocess
+import sqlite3
+import sys
 import time
 from typing import NamedTuple, Final
 
@@ -18,9 +20,32 @@ from autosim.ssm.center_of_geometry import (
     cli,
     CliCommand,
     center_of_geometry,
-    Segmentation,
     segmentation_and_remove_ids,
 )
+from autosim.ssm.label_statistics import (
+    center_of_geometry_from_statistics,
+    combine,
+    label_statistics,
+    LabelStatistics,
+)
+from autosim.ssm.crop import crop_segmentation, cropped_center_of_geometry
+from autosim.ssm.ensemble_statistics import file_digest
+from autosim.ssm.executor import failure_summary, Job, JobResult, run_jobs
+from autosim.ssm.mesh_cache import (
+    automesh_version,
+    builtin_version,
+    is_current,
+    load_manifest,
+    mesh_key,
+    record,
+    restore,
+    source_key,
+    write_manifest,
+)
+from autosim.ssm.pyramid import build_pyramid, RESOLUTION, voxel_size
+from autosim.ssm.run_state import connect, DONE, record_result, record_stage
+from autosim.ssm.segmentation_io import read_segmentation
+from autosim.ssm.voxel_mesh import voxel_mesh, write_inp
 
 
 class LengthScale(Enum):
@@ -43,6 +68,18 @@ class Input(NamedTuple):
     metrics: bool  # Calculate metrics
     smoothing: bool  # Smooth the mesh
     smoothing_iterations: int  # Number of smoothing iterations
+    crop: bool  # Crop to the bounding box of kept IDs before meshing
+    crop_padding: int  # Margin, in voxels, around the bounding box
+    pyramid: bool  # Build all resolutions from one source per subject
+    source_resolution: float  # voxel/cm of the pyramid source segmentations
+    max_cores: int | None  # Concurrent automesh processes, None for all cores
+    max_memory_gb: float | None  # Memory budget, None for no limit
+    # automesh peak memory per kept voxel, GB, used only with max_memory_gb;
+    # measure it as the peak RSS of one automesh job over its kept voxels
+    gb_per_voxel: float
+    mesh_cache: str | None  # Folder of cached meshes, None for no cache
+    builtin_mesher: bool  # Mesh unsmoothed .inp without metrics in-process
+    run_state: str | None  # Run-state database, None for no records
 
 
 # -------------------
@@ -58,6 +95,16 @@ input_Chad = Input(
     metrics=True,
     smoothing=False,
     smoothing_iterations=2,
+    crop=False,  # True meshes a cropped copy, in output_folder/cropped
+    crop_padding=1,
+    pyramid=False,
+    source_resolution=150.0 / 20.0,
+    max_cores=None,
+    max_memory_gb=None,
+    gb_per_voxel=1.0e-6,
+    mesh_cache="~/scratch/ixi/mesh_cache/",
+    builtin_mesher=False,
+    run_state="~/scratch/ixi/run_state.sqlite",
 )
 # Emma to update these local variables to suit her environment
 input_Emma = Input(
@@ -70,6 +117,16 @@ input_Emma = Input(
     metrics=False,
     smoothing=True,
     smoothing_iterations=2,
+    crop=False,  # True meshes a cropped copy, in output_folder/cropped
+    crop_padding=1,
+    pyramid=False,
+    source_resolution=150.0 / 20.0,
+    max_cores=None,
+    max_memory_gb=None,
+    gb_per_voxel=1.0e-6,
+    mesh_cache="~/scratch/ixi/mesh_cache/",
+    builtin_mesher=False,  # smoothing needs automesh
+    run_state="~/scratch/ixi/run_state.sqlite",
 )
 # -----------------
 # user settings end
@@ -88,6 +145,35 @@ LENGTH_SCALE: Final[str] = ii.length_scale.value
 METRICS: Final[bool] = ii.metrics
 SMOOTHING: Final[bool] = ii.smoothing
 SMOOTHING_ITERATIONS: Final[int] = ii.smoothing_iterations
+CROP: Final[bool] = ii.crop
+CROP_PADDING: Final[int] = ii.crop_padding
+CROP_OUTPUT: Final[Path] = NPY_OUTPUT.joinpath("cropped")
+PYRAMID: Final[bool] = ii.pyramid
+PYRAMID_OUTPUT: Final[Path] = NPY_OUTPUT.joinpath("pyramid")
+SOURCE_RESOLUTION: Final[float] = ii.source_resolution
+MAX_CORES: Final[int] = ii.max_cores or os.cpu_count() or 1
+MAX_MEMORY_GB: Final[float | None] = ii.max_memory_gb
+GB_PER_VOXEL: Final[float] = ii.gb_per_voxel
+LOG_OUTPUT: Final[Path] = NPY_OUTPUT.joinpath("logs")
+MESH_CACHE: Final[Path | None] = (
+    None if ii.mesh_cache is None else Path(ii.mesh_cache).expanduser()
+)
+# The built-in mesher covers unsmoothed .inp meshes without metrics
+BUILTIN_MESHER: Final[bool] = (
+    ii.builtin_mesher
+    and not SMOOTHING
+    and not METRICS
+    and MESH_OUTPUT_TYPE == ".inp"
+)
+if ii.builtin_mesher and not BUILTIN_MESHER:
+    print(
+        "Warning: builtin_mesher ignored, it covers unsmoothed .inp meshes "
+        "without metrics; meshing with automesh"
+    )
+RUN_STATE: Final[sqlite3.Connection | None] = (
+    None if ii.run_state is None else connect(Path(ii.run_state).expanduser())
+)
+STAGE: Final[str] = "segmentation_to_mesh"
 
 # Additional setup
 MM_TO_M: Final[float] = 1e-3  # Convert mm to m
@@ -96,13 +182,7 @@ REMOVES = [
     for pair in zip(["-r"] * len(IGNORE_IDS), map(str, IGNORE_IDS))
     for item in pair
 ]
-# TODO: update the resolutions with Emma
-RESOLUTION: Final[dict] = {
-    "tiny": 12.0 / 20.0,  # voxel/cm
-    "small": 42.0 / 20.0,  # voxel/cm
-    "medium": 80.0 / 20.0,  # voxel/cm
-    "large": 150.0 / 20.0,  # voxel/cm
-}
+# TODO: update the resolutions with Emma, see pyramid.RESOLUTION
 SCALING: Final[dict] = {
     "mm": 10.0,  # mm/cm
     "cm": 1.0,  # cm/cm
@@ -167,42 +247,141 @@ npy_files = list(NPY_INPUT.glob("*.npy"))
 if not npy_files:
     raise FileNotFoundError(f"No .npy files found in {NPY_INPUT}.")
 
+if PYRAMID:
+    # The input folder holds one high-resolution source per subject; build
+    # every resolution, with its voxel size recorded, and mesh those
+    print(f"Building resolutions {list(RESOLUTION)} in {PYRAMID_OUTPUT}")
+    sources = npy_files
+    npy_files = []
+    for source in sources:
+        levels = build_pyramid(source, PYRAMID_OUTPUT, SOURCE_RESOLUTION)
+        npy_files += list(levels.values())
+
+# Meshes are skipped when their outputs are recorded with the same key:
+# segmentation content, automesh command, and automesh version.  The
+# source key, of the segmentation content before cropping and the settings
+# that give the command, skips them before the segmentation is read.
+manifest: dict[str, dict] = load_manifest(NPY_OUTPUT)
+version: str = (
+    builtin_version() if BUILTIN_MESHER else automesh_version(AUTOMESH)
+)
+SETTINGS: Final[dict] = {
+    "remove": IGNORE_IDS,
+    "length_scale": LENGTH_SCALE,
+    "resolution": RESOLUTION,
+    "output_type": MESH_OUTPUT_TYPE,
+    "metrics": METRICS,
+    "smoothing": SMOOTHING,
+    "smoothing_iterations": SMOOTHING_ITERATIONS,
+    "crop": CROP,
+    "crop_padding": CROP_PADDING,
+}
+# job name: key, source key, outputs
+keys: dict[str, tuple[str, str, list[Path]]] = {}
+n_skipped = 0
+
+
+def record_unchanged(npy_file: Path, outputs: list[Path]) -> None:
+    """Record an unchanged segmentation as meshed in the run state."""
+    if RUN_STATE is not None:
+        record_stage(
+            RUN_STATE,
+            npy_file.stem,
+            STAGE,
+            DONE,
+            inputs=[npy_file],
+            outputs=outputs,
+            message="unchanged",
+        )
+
+
+jobs: list[Job] = []
 for npy_file in npy_files:
+    output_file = NPY_OUTPUT.joinpath(npy_file.stem + MESH_OUTPUT_TYPE)
+    output_file_csv = NPY_OUTPUT.joinpath(npy_file.stem + ".csv")
+    outputs = [output_file, output_file_csv] if METRICS else [output_file]
+
+    size = voxel_size(npy_file)
+    digest = file_digest(npy_file)
+    source = source_key(
+        digest,
+        dict(
+            SETTINGS,
+            name=npy_file.name,
+            voxel_size=None if size is None else size.tolist(),
+        ),
+        version,
+    )
+    if is_current(source, outputs, manifest, field="source"):
+        print(f"Unchanged: {npy_file}, skipping (source key {source})")
+        n_skipped += 1
+        record_unchanged(npy_file, outputs)
+        continue
+
     aa: CliCommand = cli(input_file=npy_file, remove=IGNORE_IDS)
-    bb: Segmentation = segmentation_and_remove_ids(aa)
-    cc: np.ndarray = center_of_geometry(bb)
+    # One pass over the segmentation gives the center of geometry, tissue
+    # volumes, and extents of every ID
+    stats: LabelStatistics = label_statistics(read_segmentation(aa.input_file))
+    cc: np.ndarray = center_of_geometry_from_statistics(stats, IGNORE_IDS)
+    kept: LabelStatistics = combine(stats, IGNORE_IDS)
 
     print(f"Processing: {npy_file}")
     print(f"  Center of Geometry: {cc} voxel")
-
-    output_file = NPY_OUTPUT.joinpath(npy_file.stem + MESH_OUTPUT_TYPE)
+    print(f"  Extents of kept IDs: {kept.lower[0]} to {kept.upper[0]} voxel")
+
+    # Mesh the segmentation cropped to the kept IDs, with the center of
+    # geometry shifted by the crop offset, for identical mesh coordinates
+    mesh_input = npy_file
+    cc_mesh = cc
+    if CROP:
+        cropped = crop_segmentation(
+            input_file=npy_file,
+            output_file=CROP_OUTPUT.joinpath(npy_file.name),
+            remove=IGNORE_IDS,
+            padding=CROP_PADDING,
+            stats=stats,
+            digest=digest,
+        )
+        mesh_input = cropped.output_file
+        cc_mesh = cropped_center_of_geometry(cc, cropped.offset)
+        print(f"  Cropped to shape {cropped.shape} at offset {cropped.offset}")
 
     command = [
         str(AUTOMESH),
         "mesh",
         "hex",
         "-i",
-        str(npy_file),
+        str(mesh_input),
         "-o",
         str(output_file),
     ]
     command += REMOVES
 
-    # Determine the scale based on the file name
-    scale = next((SCALES[key] for key in SCALES if key in str(npy_file)), 1.0)
+    # Determine the scale from the recorded voxel size, or for segmentations
+    # without one, based on the file name
+    if size is not None:
+        scales = [SCALING[LENGTH_SCALE] * item for item in size]
+    else:
+        scale = next(
+            (SCALES[key] for key in SCALES if key in str(npy_file)), 1.0
+        )
+        scales = [scale, scale, scale]
 
     if METRICS:
-        output_file_csv = NPY_OUTPUT.joinpath(npy_file.stem + ".csv")
         command += ["--metrics", str(output_file_csv)]
 
-    print(f"  Scale used for automesh: {scale} {LENGTH_SCALE}/voxel")
+    print(f"  Scale used for automesh: {scales} {LENGTH_SCALE}/voxel")
+    for label, count in zip(stats.ids, stats.counts):
+        volume = count * np.prod(scales)
+        print(f"  ID {label}: {count} voxels, {volume:.6g} {LENGTH_SCALE}^3")
     sk = ["--xscale", "--yscale", "--zscale"]  # scale strings
-    sv = [str(scale) for _ in sk]  # scale values
+    sv = [str(item) for item in scales]  # scale values
     ss = [item for pair in zip(sk, sv) for item in pair]  # scale list
     command += ss
 
     tk = ["--xtranslate", "--ytranslate", "--ztranslate"]  # translate strings
-    tv = [str(-1.0 * scale * item) for item in cc]  # translate values
+    translates = [-1.0 * sx * cx for sx, cx in zip(scales, cc_mesh)]
+    tv = [str(item) for item in translates]  # translate values
     tt = [item for pair in zip(tk, tv) for item in pair]  # translate list
     command += tt
 
@@ -217,20 +396,101 @@ for npy_file in npy_files:
     print("Command:")
     print(" ".join(command))
 
-    result = subprocess.run(command, capture_output=True, text=True)
+    key = mesh_key(command, file_digest(mesh_input), version)
+    if restore(key, outputs, manifest, MESH_CACHE, source):
+        print(f"  Unchanged, skipping automesh (key {key})")
+        n_skipped += 1
+        record_unchanged(npy_file, outputs)
+        continue
+
+    if BUILTIN_MESHER:
+        # Same mesh as the automesh command above, written in-process
+        mesh = voxel_mesh(
+            read_segmentation(mesh_input), IGNORE_IDS, scales, translates
+        )
+        write_inp(mesh, output_file)
+        record(key, outputs, manifest, MESH_CACHE, source)
+        write_manifest(NPY_OUTPUT, manifest)
+        print(f"  Meshed {len(mesh.element_ids)} elements with voxel_mesh.py")
+        if RUN_STATE is not None:
+            record_stage(
+                RUN_STATE,
+                npy_file.stem,
+                STAGE,
+                DONE,
+                inputs=[npy_file],
+                outputs=outputs,
+                message="voxel_mesh.py",
+            )
+        continue
+
+    keys[npy_file.name] = (key, source, outputs)
+
+    jobs.append(
+        Job(
+            name=npy_file.name,
+            command=command,
+            log_file=LOG_OUTPUT.joinpath(npy_file.stem + ".log"),
+            memory_gb=float(kept.counts[0]) * GB_PER_VOXEL,
+        )
+    )
+
 
-    if result.returncode == 0:
-        print(result.stdout)  # output of the command
+sources_by_name = {item.name: item for item in npy_files}
+incomplete: set[str] = set()  # jobs that exit with 0 without every output
+
+
+def on_done(result: JobResult) -> None:
+    """Record a finished automesh job in the manifest, cache, and run state
+    as soon as it finishes, so an interrupted run keeps its meshes, and
+    print its exit status and wall time."""
+    key, source, outputs = keys[result.name]
+    if result.ok and not record(key, outputs, manifest, MESH_CACHE, source):
+        incomplete.add(result.name)
+        result = result._replace(returncode=1)
+    if result.ok:
+        write_manifest(NPY_OUTPUT, manifest)
+    if RUN_STATE is not None:
+        record_result(
+            RUN_STATE,
+            Path(result.name).stem,
+            STAGE,
+            result,
+            inputs=[sources_by_name[result.name]],
+            outputs=outputs,
+        )
+    if result.name in incomplete:
+        missing = [str(path) for path in outputs if not path.is_file()]
+        status = f"FAILED (exit status 0, but no {', '.join(missing)})"
+    elif result.ok:
+        status = "done"
     else:
-        print("automesh command failed:")
-        print(result.stderr)  # error message
+        status = f"FAILED ({result.returncode})"
+    print(f"  {result.name}: {status} in {result.wall_time:.3f} seconds")
 
 
+# Run up to MAX_CORES automesh processes at once, each logging to its own
+# file in LOG_OUTPUT
+print(f"Running {len(jobs)} automesh job(s) on up to {MAX_CORES} core(s)")
+results = run_jobs(
+    jobs, cores=MAX_CORES, memory_gb=MAX_MEMORY_GB, on_done=on_done
+)
+# a job without every output failed, even if automesh exits with 0
+results = [
+    item._replace(returncode=1) if item.name in incomplete else item
+    for item in results
+]
+write_manifest(NPY_OUTPUT, manifest)
+
 end_time = time.time()
 delta_t = end_time - start_time
 n_files = len(npy_files)
 print("Done.")
 print(f"Processed {n_files} file(s) in {delta_t:.6f} seconds")
+print(f"Skipped {n_skipped} unchanged file(s)")
+print(failure_summary(results))
+if not all(result.ok for result in results):
+    sys.exit(1)
 
 
 # Visualization
@@ -0,0 +1,267 @@
+"""This module submits the Abaqus jobs of a mesh list to SGE, Slurm, or
+local processes (see backends.py), keeping a target number of jobs in
+flight, in place of the fixed batch-and-sleep loop of run1_abaqus.sh.
+
+Every mesh is costed with explicit_cost.py.  Its -pe omp slots come from
+its number of elements (SLOTS), and its h_rt from the wall time predicted
+for those slots, capped at the queue limit, with a warning for every job
+capped there.  Jobs are submitted longest expected first, so the long
+jobs do not trail at the end of the run.  Between submissions, the queue is
+polled (e.g., qstat), and a job is submitted as soon as one in flight finishes.
+
+To run, from the repository root (see run1_abaqus.sh):
+source ~/autotwin/autosim/.venv/bin/activate
+python src/autosim/ssm/submit_scheduler.py \
+    -l abaqus_mesh/mesh_list_run1.txt \
+    -t base_template.inp \
+    -j 5 \
+    -b sge \
+    --mesh-cache
+
+To test:
+pytest --cov --cov-report=term-missing
+"""
+
+import argparse
+import math
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import Final
+
+import numpy as np
+
+from autosim.ssm.backends import (
+    Backend,
+    LocalBackend,
+    SgeBackend,
+    SlurmBackend,
+    Submission,
+)
+from autosim.ssm.explicit_cost import (
+    ELEMENT_COST,
+    SAFETY_FACTOR,
+    TIME_LIMIT_H,
+    Model,
+    predict,
+    read_model,
+)
+from autosim.ssm.run_state import DONE, add_subjects, connect, record_stage
+
+POLL_INTERVAL: Final[float] = 60.0  # seconds between queue polls
+# -pe omp slots, by the largest number of elements they are used for
+SLOTS: Final[list[tuple[int, int]]] = [
+    (250_000, 4),
+    (1_000_000, 8),
+    (2**63 - 1, 16),
+]
+BACKENDS: Final[dict[str, type]] = {
+    "local": LocalBackend,
+    "sge": SgeBackend,
+    "slurm": SlurmBackend,
+}
+
+
+def slots_for(n_elements: int) -> int:
+    """Return the -pe omp slots of a mesh with n_elements elements."""
+    return next(slots for limit, slots in SLOTS if n_elements <= limit)
+
+
+def plan(
+    meshes: list[str],
+    mesh_folder: Path,
+    model: Model,
+    element_cost: float = ELEMENT_COST,
+    time_limit: float = TIME_LIMIT_H,
+    cache: bool = False,
+) -> list[Submission]:
+    """Cost every mesh and order the jobs longest expected first.
+
+    Args:
+        meshes: The mesh file names, as in the mesh list.
+        mesh_folder: The folder of the meshes.
+        model: The model of the input template.
+        element_cost: The seconds per element per increment on one core.
+        time_limit: The h_rt limit of the queue, in hours; h_rt is capped
+            there, with a warning for every job whose h_rt is capped.
+        cache: Use and write the .npz sidecars of the meshes in
+            mesh_folder if True (see inp_reader.py).
+
+    Returns:
+        The submissions, longest expected first.
+    """
+    submissions = []
+    for mesh in meshes:
+        row = predict(
+            mesh_folder.joinpath(mesh), model, 1, element_cost, cache=cache
+        )
+        slots = slots_for(row["elements"])
+        expected_h = row["wall_time_h"] / slots
+        hours = math.ceil(expected_h * SAFETY_FACTOR)
+        if hours > time_limit:
+            print(
+                f"Warning: {mesh} is expected to take {expected_h:.2f} h on"
+                f" {slots} slots, {hours} h with the safety factor; h_rt is"
+                f" capped at the {time_limit:g} h queue limit"
+            )
+            hours = math.ceil(time_limit)
+        submissions.append(
+            Submission(
+                mesh=mesh,
+                slots=slots,
+                h_rt=f"{max(hours, 1):02d}:00:00",
+                expected_h=expected_h,
+            )
+        )
+    return sorted(submissions, key=lambda item: -item.expected_h)
+
+
+def run_schedule(
+    submissions: list[Submission],
+    queue: Backend,
+    max_in_flight: int,
+    poll_interval: float = POLL_INTERVAL,
+    sleep: Callable[[float], None] = time.sleep,
+    on_submit: Callable[[Submission, str], None] | None = None,
+) -> dict[str, str]:
+    """Submit jobs in order, keeping up to max_in_flight queued or running.
+
+    Args:
+        submissions: The jobs, in submission order.
+        queue: The batch queue, see backends.py.
+        max_in_flight: The target number of jobs in the queue.
+        poll_interval: The seconds between queue polls.
+        sleep: Waits between polls.
+        on_submit: Called with every submission and its job ID.
+
+    Returns:
+        The job ID of every mesh.
+
+    Raises:
+        ValueError: If max_in_flight is not positive.
+    """
+    if max_in_flight < 1:
+        msg = f"Jobs in flight must be positive, got {max_in_flight}."
+        raise ValueError(msg)
+
+    pending = list(submissions)
+    job_ids: dict[str, str] = {}
+    in_flight: set[str] = set()
+    while pending:
+        while pending and len(in_flight) < max_in_flight:
+            submission = pending.pop(0)
+            job_id = queue.submit(submission)
+            job_ids[submission.mesh] = job_id
+            in_flight.add(job_id)
+            if on_submit is not None:
+                on_submit(submission, job_id)
+            print(
+                f"[{time.ctime()}] Submitted {submission.mesh} as {job_id}"
+                f" (omp {submission.slots}, h_rt {submission.h_rt},"
+                f" expected {submission.expected_h:.2f} h)"
+            )
+        if pending:
+            sleep(poll_interval)
+            in_flight = queue.active(in_flight)
+    return job_ids
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Submit the Abaqus jobs of a mesh list, longest first, "
+        "keeping a target number of jobs in flight."
+    )
+    parser.add_argument(
+        "-l",
+        "--list",
+        required=True,
+        type=str,
+        help="Path to the mesh list, e.g., abaqus_mesh/mesh_list_run1.txt.",
+    )
+    parser.add_argument(
+        "-t",
+        "--template",
+        required=False,
+        type=str,
+        default="base_template.inp",
+        help="Path to the input template.",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        required=False,
+        type=int,
+        default=5,
+        help="Target number of jobs queued or running.",
+    )
+    parser.add_argument(
+        "-p",
+        "--poll",
+        required=False,
+        type=float,
+        default=POLL_INTERVAL,
+        help="Seconds between queue polls.",
+    )
+    parser.add_argument(
+        "-b",
+        "--backend",
+        required=False,
+        choices=sorted(BACKENDS),
+        default="sge",
+        help="Where to run the jobs.",
+    )
+    parser.add_argument(
+        "-c",
+        "--element-cost",
+        required=False,
+        type=float,
+        default=ELEMENT_COST,
+        help="Seconds per element per increment on one core.",
+    )
+    parser.add_argument(
+        "-d",
+        "--database",
+        required=False,
+        type=str,
+        default=None,
+        help="Path to the run-state database, e.g., run_state.sqlite.",
+    )
+    parser.add_argument(
+        "--mesh-cache",
+        action="store_true",
+        help="Write .npz sidecars of the meshes next to them, to cost "
+        "later runs faster.",
+    )
+    args = parser.parse_args()
+
+    mesh_list = Path(args.list).expanduser()
+    meshes = np.loadtxt(mesh_list, dtype=str, ndmin=1).tolist()
+    submissions = plan(
+        meshes,
+        mesh_folder=mesh_list.parent,
+        model=read_model(Path(args.template).expanduser().resolve()),
+        element_cost=args.element_cost,
+        cache=args.mesh_cache,
+    )
+    on_submit = None
+    if args.database is not None:
+        run_state = connect(Path(args.database).expanduser())
+        add_subjects(run_state, [Path(item).stem for item in meshes])
+
+        def on_submit(submission: Submission, job_id: str) -> None:
+            record_stage(
+                run_state,
+                Path(submission.mesh).stem,
+                "submit",
+                DONE,
+                started=time.time(),
+                inputs=[mesh_list.parent.joinpath(submission.mesh)],
+                outputs=[job_id],
+                message=f"{args.backend} job {job_id}",
+            )
+
+    queue = BACKENDS[args.backend]()
+    job_ids = run_schedule(
+        submissions, queue, args.jobs, args.poll, on_submit=on_submit
+    )
+    print(f"[{time.ctime()}] All {len(job_ids)} jobs submitted.")
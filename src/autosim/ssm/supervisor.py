@@ -0,0 +1,157 @@
+"""This module supervises a batch of jobs, such as the submit scripts of
+mesh_to_sim.py, in place of starting every one at once and forgetting it.
+
+At most a fixed number of jobs run at once (see executor.py), each with
+its own log of stdout and stderr, and every exit status is kept.  A job
+that fails with one of the given transient statuses, and only such a job,
+is retried, after a backoff that doubles with every attempt, into a new
+log, <log>.retry<N>.  The batch ends with a status report.
+
+A long batch can detach from the launching shell (detach), continuing in
+a new session with its output in a log file, so it survives a logout.
+
+Example:
+    jobs = [
+        Job(name="a", command=["bash", "submit_script.sh"], ...),
+    ]
+    supervised = supervise(jobs, max_concurrent=4, transient={75})
+    print(status_report(supervised))
+
+To test:
+pytest --cov --cov-report=term-missing
+"""
+
+import os
+import sys
+import time
+from collections.abc import Callable, Collection
+from pathlib import Path
+from typing import Final, NamedTuple
+
+from autosim.ssm.executor import Job, JobResult, failure_summary, run_jobs
+
+BACKOFF: Final[float] = 30.0  # seconds before the first retry
+RETRIES: Final[int] = 2  # retries of a job after its first attempt
+
+
+class Supervised(NamedTuple):
+    """The final outcome of a supervised job."""
+
+    result: JobResult  # of the last attempt
+    attempts: int
+
+
+def _retry_job(job: Job, attempt: int) -> Job:
+    """Return the job of a retry, with its own log file."""
+    if attempt == 0:
+        return job
+    log_file = job.log_file.with_name(f"{job.log_file.name}.retry{attempt}")
+    return job._replace(log_file=log_file)
+
+
+def supervise(
+    jobs: list[Job],
+    max_concurrent: int,
+    retries: int = RETRIES,
+    backoff: float = BACKOFF,
+    transient: Collection[int] = frozenset(),
+    on_done: Callable[[JobResult], None] | None = None,
+    sleep: Callable[[float], None] = time.sleep,
+) -> list[Supervised]:
+    """Run jobs with bounded concurrency, retrying transient failures.
+
+    Args:
+        jobs: The jobs, each of one core; their names must be unique.
+        max_concurrent: The most jobs running at once.
+        retries: The retries of a failed job after its first attempt.
+        backoff: The seconds before the first retry, doubled after each.
+        transient: The exit statuses worth a retry, none by default; any
+            other failure is final.
+        on_done: Called with the result of every attempt as it finishes.
+        sleep: Waits before a retry.
+
+    Returns:
+        The outcome of every job, in the order of jobs.
+
+    Raises:
+        ValueError: If a job name is repeated or retries is negative.
+    """
+    names = [job.name for job in jobs]
+    if len(set(names)) != len(names):
+        raise ValueError("Supervised jobs must have unique names.")
+    if retries < 0:
+        raise ValueError(f"Retries must not be negative, got {retries}.")
+
+    outcomes: dict[str, Supervised] = {}
+    pending = list(jobs)
+    for attempt in range(retries + 1):
+        if attempt > 0:
+            wait = backoff * 2 ** (attempt - 1)
+            print(
+                f"[{time.ctime()}] Retrying {len(pending)} job(s) in"
+                f" {wait:.0f} seconds (attempt {attempt + 1})"
+            )
+            sleep(wait)
+        batch = [_retry_job(job, attempt) for job in pending]
+        results = run_jobs(batch, cores=max_concurrent, on_done=on_done)
+
+        retry = []
+        for job, result in zip(pending, results):
+            outcomes[job.name] = Supervised(result, attempt + 1)
+            if not result.ok and result.returncode in transient:
+                retry.append(job)
+        pending = retry
+        if not pending:
+            break
+
+    return [outcomes[name] for name in names]
+
+
+def status_report(supervised: list[Supervised]) -> str:
+    """Summarize a supervised batch, see executor.failure_summary.
+
+    Args:
+        supervised: The outcome of every job.
+
+    Returns:
+        The failure summary of the last attempts, and the retried jobs.
+    """
+    lines = [failure_summary([item.result for item in supervised])]
+    retried = [item for item in supervised if item.attempts > 1]
+    if retried:
+        lines.append(f"{len(retried)} job(s) retried:")
+        for item in retried:
+            status = "ok" if item.result.ok else "failed"
+            lines.append(
+                f"  {item.result.name}: {status} after"
+                f" {item.attempts} attempt(s)"
+            )
+    return "\n".join(lines)
+
+
+def detach(log_file: Path) -> None:
+    """Continue the calling program in the background, in a new session
+    that survives the launching shell; the launching process exits.
+
+    The detached process writes stdout and stderr to log_file, and its
+    process ID to <log_file>.pid.  POSIX only.
+
+    Args:
+        log_file: The log of the detached process, appended to.
+    """
+    log_file.parent.mkdir(parents=True, exist_ok=True)
+    sys.stdout.flush()
+    sys.stderr.flush()
+    if os.fork() > 0:
+        print(f"Detached, see {log_file}", flush=True)
+        os._exit(0)
+    os.setsid()  # no controlling terminal, so no SIGHUP at logout
+    if os.fork() > 0:
+        os._exit(0)  # the session leader exits, its child cannot reattach
+
+    pid_file = log_file.with_name(f"{log_file.name}.pid")
+    pid_file.write_text(f"{os.getpid()}\n")
+    with open(os.devnull) as null, open(log_file, "a") as log:
+        os.dup2(null.fileno(), sys.stdin.fileno())
+        os.dup2(log.fileno(), sys.stdout.fileno())
+        os.dup2(log.fileno(), sys.stderr.fileno())
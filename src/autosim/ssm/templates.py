@@ -0,0 +1,293 @@
+"""This module renders simulation decks from templates in memory, in place
+of a cp, a line-by-line search and replace, and a rewrite per case, or a
+sed per Abaqus job (submit_job_sge.sh).
+
+A template is compiled once, splitting its text at the placeholders into
+literal segments, and every case is rendered by joining the segments with
+its values.  All decks of a sweep are rendered first, then written in one
+pass, so thousands of cases take seconds.
+
+The placeholders are literal text:
+* SSM input, ssm_input_template.i: # [DATABASE_NAME], # [TERMINATION_TIME]
+* SSM submit script, submit_script_template.sh: # [PROCS]
+* Abaqus input, base_template.inp: @MESHFILE@, and the include of a
+  material, whose file a material variant replaces, and of the step,
+  whose file an output profile replaces (ABAQUS_PLACEHOLDERS)
+
+To run, from the repository root, for every mesh of a mesh list or every
+row of a sweep table (.csv, with a job and a mesh column, and optional
+material columns, e.g., graymatter=material_graymatter.inp, and an
+optional profile column, e.g., postproc-minimal, see output_profiles.py):
+source ~/autotwin/autosim/.venv/bin/activate
+python src/autosim/ssm/templates.py \
+    -t base_template.inp \
+    -s abaqus_mesh/mesh_list_run1.txt \
+    -o simulation_results
+
+submit_job_sge.sh then uses the rendered <job>/<job>.inp in place of sed,
+as long as the deck is newer than the template; a deck not rendered by a
+sweep (without RENDERED on its first line) is always rendered again.
+
+To test:
+pytest --cov --cov-report=term-missing
+"""
+
+import argparse
+import csv
+import re
+import time
+from pathlib import Path
+from typing import Final, NamedTuple
+
+from autosim.ssm.output_profiles import PROFILES, step_file
+
+MESH_FOLDER: Final[str] = "../../abaqus_mesh"  # relative to <job>/
+# Abaqus sweep parameters, by the placeholder text they replace
+ABAQUS_PLACEHOLDERS: Final[dict[str, str]] = {
+    "mesh": "@MESHFILE@",
+    "csf": "material_csf.inp",
+    "graymatter": "material_graymatter_neohookean.inp",
+    "skull": "material_skull.inp",
+    "step": "step_case1.inp",
+}
+SSM_PLACEHOLDERS: Final[list[str]] = [
+    "# [DATABASE_NAME]",
+    "# [TERMINATION_TIME]",
+]
+SUBMIT_PLACEHOLDERS: Final[list[str]] = ["# [PROCS]"]
+# first line of a sweep deck, which submit_job_sge.sh keeps
+RENDERED: Final[str] = "** Rendered by templates.py"
+
+
+class Template(NamedTuple):
+    """A compiled template: literal segments between placeholders."""
+
+    segments: tuple[str, ...]  # one more than the placeholders
+    keys: tuple[str, ...]  # the placeholder after each segment
+
+
+def compile_template(text: str, placeholders: list[str]) -> Template:
+    """Split a template at every occurrence of its placeholders.
+
+    Args:
+        text: The template text.
+        placeholders: The literal placeholder texts.
+
+    Returns:
+        The compiled template.
+
+    Raises:
+        ValueError: If a placeholder does not occur in the text.
+    """
+    missing = [item for item in placeholders if item not in text]
+    if missing:
+        raise ValueError(f"Placeholder(s) not in the template: {missing}")
+
+    # longest first, so a placeholder that contains another one wins
+    ordered = sorted(placeholders, key=len, reverse=True)
+    pattern = re.compile("|".join(re.escape(item) for item in ordered))
+    parts = pattern.split(text)
+    return Template(
+        segments=tuple(parts),
+        keys=tuple(pattern.findall(text)),
+    )
+
+
+def read_template(path: Path, placeholders: list[str]) -> Template:
+    """Read and compile a template file, see compile_template."""
+    return compile_template(path.read_text(), placeholders)
+
+
+def render(template: Template, values: dict[str, str]) -> str:
+    """Render a compiled template.
+
+    Args:
+        template: The compiled template.
+        values: The text of every placeholder.
+
+    Returns:
+        The rendered text.
+
+    Raises:
+        ValueError: If a placeholder has no value.
+    """
+    missing = set(template.keys) - set(values)
+    if missing:
+        raise ValueError(f"No value for placeholder(s): {sorted(missing)}")
+
+    parts = [template.segments[0]]
+    for key, segment in zip(template.keys, template.segments[1:]):
+        parts.append(values[key])
+        parts.append(segment)
+    return "".join(parts)
+
+
+def write_decks(decks: dict[Path, str], mode: int | None = None) -> None:
+    """Write rendered decks, creating every folder once.
+
+    Args:
+        decks: The text of every deck, by its path.
+        mode: The permissions of the decks, e.g., 0o755 for scripts, None
+            to keep the default.
+    """
+    for folder in {path.parent for path in decks}:
+        folder.mkdir(parents=True, exist_ok=True)
+    for path, text in decks.items():
+        path.write_text(text)
+        if mode is not None:
+            path.chmod(mode)
+
+
+def ssm_values(mesh_stem: str, termination_time: float) -> dict[str, str]:
+    """Return the SSM input placeholder values of a case.
+
+    Args:
+        mesh_stem: The mesh name, <exo folder>/<stem>/<stem>.exo.
+        termination_time: The termination time, in seconds.
+    """
+    database = f"../../exo/{mesh_stem}/{mesh_stem}.exo"
+    return {
+        "# [DATABASE_NAME]": f"database name = {database}",
+        "# [TERMINATION_TIME]": (
+            f"termination time = {termination_time}  # seconds"
+        ),
+    }
+
+
+def submit_values(processors: int) -> dict[str, str]:
+    """Return the SSM submit script placeholder values of a case."""
+    return {"# [PROCS]": f"PROCS={processors}"}
+
+
+def abaqus_values(parameters: dict[str, str]) -> dict[str, str]:
+    """Return the Abaqus input placeholder values of a sweep case.
+
+    Args:
+        parameters: The mesh file, in the mesh folder, optionally a
+            material file per material of ABAQUS_PLACEHOLDERS, and an
+            output profile; a material or profile that is missing or empty
+            keeps the include of the template.
+
+    Raises:
+        ValueError: If the mesh is missing, or a parameter or profile is
+            unknown.
+    """
+    unknown = set(parameters) - set(ABAQUS_PLACEHOLDERS) - {"job", "profile"}
+    if unknown:
+        raise ValueError(f"Unknown sweep parameter(s): {sorted(unknown)}")
+    if not parameters.get("mesh"):
+        raise ValueError(f"Sweep case has no mesh: {parameters}")
+
+    values = {
+        placeholder: parameters.get(name) or placeholder
+        for name, placeholder in ABAQUS_PLACEHOLDERS.items()
+    }
+    values["@MESHFILE@"] = f"{MESH_FOLDER}/{parameters['mesh']}"
+    profile = parameters.get("profile")
+    if profile:
+        if profile not in PROFILES:
+            msg = f"Unknown output profile {profile!r}, expected one of"
+            msg += f" {list(PROFILES)}."
+            raise ValueError(msg)
+        step = ABAQUS_PLACEHOLDERS["step"]
+        values[step] = step_file(Path(step), profile).name
+    return values
+
+
+def read_sweep(path: Path) -> list[dict[str, str]]:
+    """Read the cases of a sweep, a .csv table or a mesh list.
+
+    Args:
+        path: A .csv with a header row, or a list of one mesh per line,
+            whose job is the mesh name without .inp.
+
+    Returns:
+        The parameters of every case, with its job.
+    """
+    if path.suffix == ".csv":
+        with open(path, newline="") as file:
+            cases = list(csv.DictReader(file))
+    else:
+        meshes = path.read_text().split()
+        cases = [{"mesh": item} for item in meshes]
+    for case in cases:
+        if not case.get("job"):
+            case["job"] = case.get("mesh", "").removesuffix(".inp")
+    return cases
+
+
+def render_abaqus_sweep(
+    template: Template, cases: list[dict[str, str]], output_folder: Path
+) -> dict[Path, str]:
+    """Render the Abaqus input of every case, as submit_job_sge.sh expects.
+
+    Args:
+        template: The compiled base_template.inp.
+        cases: The sweep cases, see read_sweep.
+        output_folder: The results folder, e.g., simulation_results.
+
+    Returns:
+        The text of every <output_folder>/<job>/<job>.inp, after the
+        RENDERED line.
+    """
+    decks = {}
+    for case in cases:
+        job = case["job"]
+        path = output_folder.joinpath(job, f"{job}.inp")
+        deck = render(template, abaqus_values(case))
+        decks[path] = f"{RENDERED}\n{deck}"
+    return decks
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Render the Abaqus input of every case of a sweep."
+    )
+    parser.add_argument(
+        "-t",
+        "--template",
+        required=False,
+        type=str,
+        default="base_template.inp",
+        help="Path to the input template.",
+    )
+    parser.add_argument(
+        "-s",
+        "--sweep",
+        required=True,
+        type=str,
+        help="Path to the sweep table (.csv) or a mesh list.",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        required=False,
+        type=str,
+        default="simulation_results",
+        help="Path to the results folder.",
+    )
+    args = parser.parse_args()
+
+    start_time = time.time()
+    template_file = Path(args.template).expanduser()
+    cases = read_sweep(Path(args.sweep).expanduser())
+    # only the placeholders the sweep sets, so the template needs no others
+    names = {"mesh"} | {
+        name for case in cases for name, value in case.items() if value
+    }
+    if "profile" in names:
+        names.add("step")
+    template = read_template(
+        template_file,
+        [
+            placeholder
+            for name, placeholder in ABAQUS_PLACEHOLDERS.items()
+            if name in names
+        ],
+    )
+    decks = render_abaqus_sweep(
+        template, cases, Path(args.output).expanduser()
+    )
+    write_decks(decks)
+    delta_t = time.time() - start_time
+    print(f"Rendered {len(decks)} deck(s) in {delta_t:.2f} seconds.")
@@ -0,0 +1,261 @@
+"""This module converts a segmentation to an 8-node hexahedral mesh with
+NumPy, and writes it in Abaqus .inp format, without automesh.
+
+It covers the plain (unsmoothed) automesh command
+
+    automesh mesh hex -i <input> -o <output>.inp -r <id> ... \
+        --xscale <sx> --yscale <sy> --zscale <sz> \
+        --xtranslate <tx> --ytranslate <ty> --ztranslate <tz>
+
+and writes the same nodes, elements, and element blocks EB<id>.  Voxel
+(i, j, k) of the segmentation spans x in [i, i + 1], y in [j, j + 1], and
+z in [k, k + 1], before scaling and translation.  Elements are numbered in
+Fortran (x-fastest) order of the kept voxels, and nodes in Fortran order of
+the node lattice, skipping nodes of removed voxels only.
+
+Nodes are shared by lattice index arithmetic: the node (i, j, k) of the
+(nx + 1, ny + 1, nz + 1) lattice has the linear index
+i + (nx + 1) * (j + (ny + 1) * k), so no search or Python loop is needed.
+
+To run:
+source ~/autotwin/autosim/.venv/bin/activate
+python ~/autotwin/autosim/src/autosim/ssm/voxel_mesh.py \
+    -i ~/autotwin/autosim/tests/input/letter_f.npy \
+    -o ~/scratch/letter_f.inp \
+    -r 0
+
+To test:
+pytest --cov --cov-report=term-missing
+"""
+
+import argparse
+import itertools
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Final, NamedTuple, TextIO
+
+import numpy as np
+
+from autosim.ssm.segmentation_io import read_segmentation
+
+CHUNK_SIZE: Final[int] = 1 << 17  # rows formatted per write
+# Lattice offsets of the 8 nodes of a hex element, in Abaqus order
+CORNERS: Final[np.ndarray] = np.array(
+    [
+        [0, 0, 0],
+        [1, 0, 0],
+        [1, 1, 0],
+        [0, 1, 0],
+        [0, 0, 1],
+        [1, 0, 1],
+        [1, 1, 1],
+        [0, 1, 1],
+    ]
+)
+RULE: Final[str] = "*" * 34  # banner rule before the section titles
+
+
+class HexMesh(NamedTuple):
+    """An 8-node hexahedral mesh with one element block per ID."""
+
+    coordinates: np.ndarray  # (n_nodes, 3) float64, node i + 1 in row i
+    element_ids: np.ndarray  # (n_elements,) int64, one-based
+    connectivity: np.ndarray  # (n_elements, 8) int64, one-based node IDs
+    blocks: np.ndarray  # (n_elements,) segmentation ID of every element
+
+
+def voxel_mesh(
+    segmentation: np.ndarray,
+    remove: list[int],
+    scale: tuple[float, float, float] = (1.0, 1.0, 1.0),
+    translate: tuple[float, float, float] = (0.0, 0.0, 0.0),
+) -> HexMesh:
+    """Mesh the kept voxels of a segmentation with one hex element each.
+
+    Args:
+        segmentation: The 3D segmentation, possibly memory mapped.
+        remove: Segmentation IDs to exclude, possibly an empty list.
+        scale: The x, y, and z size of a voxel.
+        translate: The x, y, and z translation, applied after scaling.
+
+    Returns:
+        The mesh, with elements sorted by block, then element ID.
+
+    Raises:
+        ValueError: If the segmentation is not 3D or no voxel is kept.
+    """
+    if segmentation.ndim != 3:
+        msg = f"Segmentation must be 3D, got shape {segmentation.shape}."
+        raise ValueError(msg)
+
+    nx, ny, nz = segmentation.shape
+    values = np.asarray(segmentation).ravel(order="F")
+    voxels = np.flatnonzero(~np.isin(values, remove))
+    if voxels.size == 0:
+        raise ValueError("Segmentation does not include valid IDs.")
+
+    # lattice index of the first node of every kept voxel
+    ii = voxels % nx
+    jj = (voxels // nx) % ny
+    kk = voxels // (nx * ny)
+    strides = np.array([1, nx + 1, (nx + 1) * (ny + 1)], dtype=np.int64)
+    first = ii + strides[1] * jj + strides[2] * kk
+    lattice = first[:, None] + CORNERS @ strides  # (n_elements, 8)
+
+    # number the used lattice nodes consecutively, in lattice order
+    used = np.zeros((nx + 1) * (ny + 1) * (nz + 1), dtype=bool)
+    used[lattice.ravel()] = True
+    numbering = np.cumsum(used, dtype=np.int64)
+    connectivity = numbering[lattice]
+
+    nodes = np.flatnonzero(used)
+    index = np.stack(
+        [
+            nodes % (nx + 1),
+            (nodes // (nx + 1)) % (ny + 1),
+            nodes // strides[2],
+        ],
+        axis=1,
+    )
+    coordinates = index * np.asarray(scale, dtype=np.float64) + np.asarray(
+        translate, dtype=np.float64
+    )
+
+    blocks = values[voxels]
+    order = np.argsort(blocks, kind="stable")
+    return HexMesh(
+        coordinates=coordinates,
+        element_ids=order.astype(np.int64) + 1,
+        connectivity=connectivity[order],
+        blocks=blocks[order],
+    )
+
+
+def _format_floats(values: np.ndarray) -> list[str]:
+    """Format floats as automesh does, e.g., 1.500000e-1 and -2.000000e0,
+    right aligned in 16 characters."""
+    text = ("%.6e\0" * values.size) % tuple(values.ravel().tolist())
+    # drop the exponent sign "+" and leading exponent zeros, as in Rust
+    text = text.replace("e+0", "e").replace("e+", "e").replace("e-0", "e-")
+    return list(map(str.rjust, text.split("\0")[:-1], itertools.repeat(16)))
+
+
+def _write_nodes(file: TextIO, coordinates: np.ndarray) -> None:
+    """Write the node lines in chunks."""
+    for start in range(0, len(coordinates), CHUNK_SIZE):
+        chunk = coordinates[start : start + CHUNK_SIZE]
+        fields = _format_floats(chunk)
+        rows: list = [None] * (4 * len(chunk))
+        rows[0::4] = range(start + 1, start + 1 + len(chunk))
+        rows[1::4] = fields[0::3]
+        rows[2::4] = fields[1::3]
+        rows[3::4] = fields[2::3]
+        file.write(("%6d,%s,%s,%s\n" * len(chunk)) % tuple(rows))
+
+
+def _write_elements(
+    file: TextIO, element_ids: np.ndarray, connectivity: np.ndarray, width
+) -> None:
+    """Write the element lines of one block in chunks."""
+    line = f"%{width}d," + ",".join(["%6d"] * 8) + "\n"
+    for start in range(0, len(element_ids), CHUNK_SIZE):
+        rows = np.column_stack(
+            [
+                element_ids[start : start + CHUNK_SIZE],
+                connectivity[start : start + CHUNK_SIZE],
+            ]
+        )
+        file.write((line * len(rows)) % tuple(rows.ravel().tolist()))
+
+
+def write_inp(mesh: HexMesh, output_file: Path) -> None:
+    """Write a mesh in the Abaqus .inp format of automesh.
+
+    Args:
+        mesh: The hex mesh.
+        output_file: The .inp file to write.
+    """
+    # automesh widens the element ID column with the number of elements
+    width = 4 + len(str(len(mesh.element_ids)))
+    now = datetime.now(UTC).strftime("%Y-%m-%d %H:%M:%S.%f")
+    labels, starts = np.unique(mesh.blocks, return_index=True)
+    ends = np.append(starts[1:], len(mesh.blocks))
+
+    with open(output_file, "w", buffering=1 << 20) as file:
+        file.write("*HEADING\nautotwin.autosim\nvoxel_mesh.py\n")
+        file.write(f"autogenerated on {now} UTC**\n**\n")
+        file.write(f"{RULE} N O D E S {RULE}\n")
+        file.write("*NODE, NSET=ALLNODES\n")
+        _write_nodes(file, mesh.coordinates)
+        file.write(f"**\n{RULE} E L E M E N T S {RULE[:28]}\n")
+        for label, start, end in zip(labels, starts, ends):
+            file.write(f"*ELEMENT, TYPE=C3D8R, ELSET=EB{label}\n")
+            _write_elements(
+                file,
+                mesh.element_ids[start:end],
+                mesh.connectivity[start:end],
+                width,
+            )
+        file.write("**\n")
+        for label in labels:
+            file.write(
+                f"*SOLID SECTION, ELSET=EB{label}, MATERIAL=Default-Steel\n"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Mesh a segmentation with hex elements in .inp format."
+    )
+    parser.add_argument(
+        "-i",
+        "--input",
+        required=True,
+        type=str,
+        help="Path to the segmentation file.",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        required=True,
+        type=str,
+        help="Path to the mesh file in .inp format.",
+    )
+    parser.add_argument(
+        "-r",
+        "--remove",
+        required=False,
+        type=int,
+        nargs="*",
+        default=[],
+        help="List of segmentation IDs to ignore.",
+    )
+    parser.add_argument(
+        "-s",
+        "--scale",
+        required=False,
+        type=float,
+        nargs=3,
+        default=[1.0, 1.0, 1.0],
+        help="The x, y, and z size of a voxel.",
+    )
+    parser.add_argument(
+        "-t",
+        "--translate",
+        required=False,
+        type=float,
+        nargs=3,
+        default=[0.0, 0.0, 0.0],
+        help="The x, y, and z translation, after scaling.",
+    )
+    args = parser.parse_args()
+
+    mesh = voxel_mesh(
+        read_segmentation(Path(args.input).expanduser()),
+        remove=args.remove,
+        scale=tuple(args.scale),
+        translate=tuple(args.translate),
+    )
+    output = Path(args.output).expanduser()
+    write_inp(mesh, output)
+    print(f"Wrote {len(mesh.element_ids)} elements to {output}")
@@ -7,6 +7,11 @@
 
 # === Get Mesh File from Argument ===
 MESHFILE="$1"
+# an array job gets a mesh list, of which task TASK_ID runs line TASK_ID
+TASK_ID="${SGE_TASK_ID:-${SLURM_ARRAY_TASK_ID:-undefined}}"
+if [ "$TASK_ID" != "undefined" ] && [ "${MESHFILE%.txt}" != "$MESHFILE" ]; then
+    MESHFILE=$(sed -n "${TASK_ID}p" "$MESHFILE")
+fi
 if [ -z "$MESHFILE" ]; then
     echo "Error: No mesh file provided."
     exit 1
@@ -18,7 +23,7 @@ TEMPLATE="base_template.inp"
 OUTPUT_DIR="simulation_results/${JOBNAME}"
 INPUT_FILE="${OUTPUT_DIR}/${JOBNAME}.inp"
 MESH_PATH="../../abaqus_mesh/${MESHFILE}"
-CPUS=${NSLOTS:-16}
+CPUS=${NSLOTS:-${SLURM_CPUS_PER_TASK:-16}}
 
 # === Load Environment ===
 source /ad/eng/bin/engenv.sh
@@ -29,7 +34,15 @@ mkdir -p "$OUTPUT_DIR"
 mkdir -p logs
 
 # === Create Abaqus Input File from Template ===
-sed "s|@MESHFILE@|$MESH_PATH|" "$TEMPLATE" > "$INPUT_FILE"
+# unless rendered beforehand by a sweep of src/autosim/ssm/templates.py
+# (marked on its first line) after the last change to the template
+RENDERED="** Rendered by templates.py"
+if [ "$INPUT_FILE" -nt "$TEMPLATE" ] && \
+    [ "$(head -n 1 "$INPUT_FILE")" = "$RENDERED" ]; then
+    echo "Using the deck rendered by templates.py: $INPUT_FILE"
+else
+    sed "s|@MESHFILE@|$MESH_PATH|" "$TEMPLATE" > "$INPUT_FILE"
+fi
 
 cd "$OUTPUT_DIR"
 
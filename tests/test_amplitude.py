@@ -0,0 +1,84 @@
+"""This module tests the compact amplitude cards.
+
+To run:
+pytest
+pytest --cov --cov-report=term-missing
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from autosim.ssm.amplitude import (
+    pulse,
+    read_amplitudes,
+    reduce_amplitude,
+    simplify,
+    write_amplitudes,
+)
+
+REPO: Path = Path(__file__).parents[1]
+
+
+def test_simplify_line_and_corner():
+    """Tests collinear points are dropped and a corner is kept."""
+    times = np.linspace(0.0, 2.0, 201)
+    values = np.where(times < 1.0, times, 2.0 - times)
+    points = np.column_stack([times, values])
+    assert simplify(points, 1e-9).tolist() == [0, 100, 200]
+    assert simplify(points[:100], 1e-9).tolist() == [0, 99]
+    assert simplify(points[:1], 1e-9).tolist() == [0]
+
+
+def test_loads_within_tolerance(tmp_path):
+    """Tests the measured AMP-1 of loads.inp reduces to few breakpoints
+    within the tolerance, and the card reads back the same."""
+    amplitudes = read_amplitudes(REPO.joinpath("abaqus_inp_files/loads.inp"))
+    assert list(amplitudes) == ["AMP-1", "AMP-2"]
+    assert amplitudes["AMP-1"].shape == (28287, 2)
+    assert amplitudes["AMP-2"].tolist() == [[0.0, 0.0], [0.08, 0.0]]
+
+    tolerance = 8.0  # 0.1% of the peak
+    reductions = [
+        reduce_amplitude(name, points, tolerance)
+        for name, points in amplitudes.items()
+    ]
+    amp1 = reductions[0]
+    assert amp1.max_error <= tolerance
+    assert amp1.rms_error < amp1.max_error
+    assert len(amp1.points) < 100
+    assert amp1.points[0].tolist() == [0.0, 0.0]
+    assert amp1.points[-1].tolist() == [0.08, 0.0]
+
+    path = tmp_path.joinpath("loads.inp")
+    write_amplitudes(reductions, path)
+    again = read_amplitudes(path)
+    assert np.allclose(again["AMP-1"], amp1.points, rtol=1e-8)
+    assert np.array_equal(again["AMP-2"], amplitudes["AMP-2"])
+
+
+@pytest.mark.parametrize("shape", ["sine", "haversine", "triangle"])
+def test_pulse(shape):
+    """Tests a pulse starts, peaks, and ends where asked, and reduces."""
+    points = pulse(
+        shape, rise=0.002, peak=100.0, duration=0.008, start=0.001, end=0.01
+    )
+    times, values = points.T
+    assert times[0] == 0.0 and times[-1] == 0.01
+    assert values.max() == pytest.approx(100.0)
+    assert times[np.argmax(values)] == pytest.approx(0.003)
+    assert values[times <= 0.001].max() == 0.0
+    assert values[times >= 0.009].max() == pytest.approx(0.0, abs=1e-9)
+
+    reduction = reduce_amplitude("AMP-1", points, 0.1)
+    assert reduction.max_error <= 0.1
+    assert len(reduction.points) < len(points) // 50
+
+
+def test_pulse_invalid():
+    """Tests an unknown shape or inconsistent times raise an error."""
+    with pytest.raises(ValueError, match="Unknown shape"):
+        pulse("square", 0.001, 1.0, 0.002)
+    with pytest.raises(ValueError, match="Inconsistent"):
+        pulse("sine", 0.003, 1.0, 0.002)
@@ -0,0 +1,171 @@
+"""This module tests the execution backends with stand-ins for the job
+script and the scheduler commands.
+
+To run:
+pytest
+pytest --cov --cov-report=term-missing
+"""
+
+import time
+from pathlib import Path
+
+import pytest
+
+from autosim.ssm.backends import (
+    FakeScheduler,
+    LocalBackend,
+    SgeBackend,
+    SlurmBackend,
+    Submission,
+    h_rt_seconds,
+)
+
+# Records its mesh, or line TASK_ID of a mesh list, and its slots
+JOB_SCRIPT = """\
+MESHFILE="$1"
+if [ -n "$SGE_TASK_ID" ]; then
+    MESHFILE=$(sed -n "${SGE_TASK_ID}p" "$MESHFILE")
+fi
+echo "$MESHFILE $NSLOTS" >> ran.txt
+"""
+
+
+def _submission(mesh: str, slots: int = 4, hours: float = 1.0) -> Submission:
+    return Submission(mesh, slots, "01:00:00", hours)
+
+
+def _command(folder: Path, name: str, body: str) -> None:
+    """Write an executable stand-in for a scheduler command."""
+    path = folder.joinpath(name)
+    path.write_text(f'#!/bin/sh\necho "$@" >> {folder}/calls.txt\n{body}\n')
+    path.chmod(0o755)
+
+
+def test_fake_scheduler_slots_and_delay():
+    """Tests jobs wait for the queue delay and for free slots, in order."""
+    queue = FakeScheduler(
+        slots=8, queue_delay=10.0, durations={"a": 100.0, "b": 50.0}
+    )
+    a = queue.submit(_submission("a", slots=8))
+    b = queue.submit(_submission("b", slots=4))
+    c = queue.submit(_submission("c", slots=4, hours=0.01))
+    assert queue.active({a, b, c}) == {a, b, c}
+
+    queue.sleep(10.0)
+    assert queue.started == {a: 10.0}
+    queue.sleep(100.0)  # a ends at 110, b and c start
+    assert queue.started == {a: 10.0, b: 110.0, c: 110.0}
+    assert queue.active({a, b, c}) == {b, c}
+    queue.sleep(60.0)
+    assert queue.active({a, b, c}) == set()
+    assert queue.clock == 170.0
+
+    with pytest.raises(ValueError, match="asks for 16 slots"):
+        queue.submit(_submission("d", slots=16))
+
+
+def test_fake_scheduler_array_and_cancel():
+    """Tests an array job is active until its last task ends, and a
+    cancelled job frees its slots."""
+    queue = FakeScheduler(slots=4, durations={"a": 10.0, "b": 20.0})
+    array = queue.submit_array([_submission("a"), _submission("b")])
+    assert queue.started == {f"{array}.1": 0.0}
+    queue.sleep(15.0)
+    assert queue.active({array}) == {array}
+    queue.sleep(20.0)
+    assert queue.active({array}) == set()
+
+    long = queue.submit(_submission("c", hours=10.0))
+    waiting = queue.submit(_submission("d"))
+    queue.cancel(long)
+    queue.sleep(0.0)
+    assert queue.started[waiting] == queue.clock
+    with pytest.raises(ValueError, match="at least one"):
+        queue.submit_array([])
+
+
+def test_local_backend(tmp_path, monkeypatch):
+    """Tests local jobs and array tasks run the job script with their
+    slots and mesh."""
+    monkeypatch.chdir(tmp_path)
+    Path("job.sh").write_text(JOB_SCRIPT)
+    backend = LocalBackend(script="job.sh", log_folder=Path("logs"))
+
+    job = backend.submit(_submission("a.inp", slots=2))
+    array = backend.submit_array([_submission("b.inp"), _submission("c.inp")])
+    for _ in range(200):
+        if not backend.active({job, array}):
+            break
+        time.sleep(0.01)
+
+    assert backend.active({job, array}) == set()
+    ran = sorted(Path("ran.txt").read_text().splitlines())
+    assert ran == ["a.inp 2", "b.inp 4", "c.inp 4"]
+
+    done = backend.submit(_submission("d.inp"))
+    backend.processes[done][0].wait()
+    backend.cancel(done)  # finished jobs are left alone
+
+
+def test_sge_backend(tmp_path, monkeypatch):
+    """Tests qsub options, job IDs of jobs and arrays, qstat, and qdel."""
+    _command(tmp_path, "qsub", 'echo "Your job-array 42.1-2:1 (\\"x\\")"')
+    _command(tmp_path, "qstat", "echo 42 0.5 x user r\necho job-ID prior")
+    _command(tmp_path, "qdel", "")
+    monkeypatch.setenv("PATH", f"{tmp_path}:/usr/bin:/bin")
+    backend = SgeBackend(script="job.sh", log_folder=tmp_path / "logs")
+
+    assert backend.submit(_submission("a.inp", slots=8)) == "42"
+    array = [
+        Submission("a", 4, "99:00:00", 99.0),
+        Submission("b", 4, "100:00:00", 100.0),
+    ]
+    assert backend.submit_array(array) == "42"
+    assert backend.active({"42", "7"}) == {"42"}
+    backend.cancel("42")
+
+    calls = tmp_path.joinpath("calls.txt").read_text().splitlines()
+    assert calls[0] == "-pe omp 8 -l h_rt=01:00:00 job.sh a.inp"
+    # the longest h_rt, by its seconds rather than as text
+    assert calls[1].startswith("-t 1-2 -pe omp 4 -l h_rt=100:00:00 job.sh ")
+    mesh_list = Path(calls[1].split()[-1])
+    assert mesh_list.read_text() == "a\nb\n"
+    assert calls[-1] == "42"
+
+
+def test_failed_poll(tmp_path, monkeypatch, capsys):
+    """Tests a failed qstat or squeue keeps every job active, to poll again
+    later, rather than raising."""
+    _command(tmp_path, "qstat", "echo busy >&2\nexit 1")
+    _command(tmp_path, "squeue", "exit 1")
+    monkeypatch.setenv("PATH", f"{tmp_path}:/usr/bin:/bin")
+    assert SgeBackend().active({"42", "7"}) == {"42", "7"}
+    assert SlurmBackend().active({"77"}) == {"77"}
+    output = capsys.readouterr().out
+    assert "qstat failed with exit status 1, polling again later: busy" in (
+        output
+    )
+    assert "squeue failed" in output
+
+
+def test_h_rt_seconds():
+    """Tests h_rt strings are read as seconds."""
+    assert h_rt_seconds("01:00:00") == 3600
+    assert h_rt_seconds("100:30:15") == 361815
+
+
+def test_slurm_backend(tmp_path, monkeypatch):
+    """Tests sbatch options, parsable job IDs, and squeue array tasks."""
+    _command(tmp_path, "sbatch", "echo '77;cluster'")
+    _command(tmp_path, "squeue", "echo 77_[2-3]\necho 78")
+    _command(tmp_path, "scancel", "exit 1")
+    monkeypatch.setenv("PATH", f"{tmp_path}:/usr/bin:/bin")
+    backend = SlurmBackend(script="job.sh", log_folder=tmp_path / "logs")
+
+    assert backend.submit(_submission("a.inp", slots=8)) == "77"
+    assert backend.active({"77", "79"}) == {"77"}
+    calls = tmp_path.joinpath("calls.txt").read_text().splitlines()
+    assert calls[0].startswith("--parsable --cpus-per-task=8 --time=01:00:00")
+    assert calls[0].endswith("job.sh a.inp")
+    with pytest.raises(RuntimeError, match="scancel failed"):
+        backend.cancel("77")
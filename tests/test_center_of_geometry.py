@@ -14,6 +14,7 @@ import pytest
 
 from autosim.ssm.center_of_geometry import (
     center_of_geometry,
+    center_of_geometry_streaming,
     cli,
     CliCommand,
     segmentation_and_remove_ids,
@@ -52,9 +53,9 @@ def test_no_such_file():
 
 def test_invalid_file_type():
     """Tests an invalid file type raises an error."""
-    segmentation_file = Path(__file__).parent.joinpath("input", "letter_f.spn")
+    segmentation_file = Path(__file__).parent.joinpath("input", "letter_f.inp")
 
-    msg = f"File {segmentation_file} must be a .npy file."
+    msg = f"File {segmentation_file} must be one of .npy, .npz, .spn, .raw."
     with pytest.raises(ValueError):
         print(msg)
         cli(segmentation_file, remove=[])
@@ -173,3 +174,80 @@ def test_center_assembly(segmentation_file_fixture):
     # check if the calculated cog matches the expected cog
     msg = f"expected {EXPECTED_COG}, got {cog}"
     assert np.allclose(cog, EXPECTED_COG), msg
+
+
+@pytest.mark.parametrize("slab_size", [1, 2, 64])
+@pytest.mark.parametrize(
+    "remove, expected",
+    [
+        ([11], [2.071429, 1.928571, 0.5]),
+        ([0], [1.0, 3.0, 0.5]),
+        ([], [1.5, 2.5, 0.5]),
+    ],
+)
+def test_streaming_letter_f(
+    segmentation_file_fixture, slab_size, remove, expected
+):
+    """Tests the streaming center of geometry against the letter_f
+    fiducials for slabs thinner than, equal to, and larger than the
+    volume."""
+    cog = center_of_geometry_streaming(
+        CliCommand(segmentation_file_fixture, remove=remove),
+        slab_size=slab_size,
+    )
+
+    msg = f"expected {expected}, got {cog}"
+    assert np.allclose(cog, expected), msg
+
+
+def test_streaming_matches_in_memory(tmp_path):
+    """Tests the streaming and in-memory centers of geometry agree on a
+    random multi-label segmentation."""
+    rng = np.random.default_rng(seed=42)
+    segmentation = rng.integers(0, 4, size=(23, 17, 11), dtype=np.uint8)
+    segmentation_file = tmp_path.joinpath("random.npy")
+    np.save(segmentation_file, segmentation)
+
+    for remove in ([], [0], [0, 2]):
+        gold = center_of_geometry(
+            Segmentation(segmentation=segmentation, remove=remove)
+        )
+        cog = center_of_geometry_streaming(
+            CliCommand(segmentation_file, remove=remove), slab_size=5
+        )
+        msg = f"remove {remove}: expected {gold}, got {cog}"
+        assert np.allclose(cog, gold, rtol=0.0, atol=1e-12), msg
+
+
+def test_streaming_remove_all_ids(segmentation_file_fixture):
+    """Tests that a ValueError is raised when all IDs are removed."""
+    msg = "Segmentation does not include valid IDs."
+    with pytest.raises(ValueError, match=msg):
+        center_of_geometry_streaming(
+            CliCommand(segmentation_file_fixture, remove=[0, 11])
+        )
+
+
+def test_streaming_invalid_slab_size(segmentation_file_fixture):
+    """Tests that a non-positive slab size raises an error."""
+    with pytest.raises(ValueError, match="Slab size must be positive"):
+        center_of_geometry_streaming(
+            CliCommand(segmentation_file_fixture, remove=[0]), slab_size=0
+        )
+
+
+def test_spn_matches_npy(segmentation_file_fixture):
+    """Tests the letter_f.spn segmentation, with its shape sidecar, gives
+    the same center of geometry as letter_f.npy."""
+    spn_file = segmentation_file_fixture.with_suffix(".spn")
+    for remove in ([], [0], [11]):
+        gold = center_of_geometry(
+            segmentation_and_remove_ids(
+                cli(segmentation_file_fixture, remove=remove)
+            )
+        )
+        cog = center_of_geometry(
+            segmentation_and_remove_ids(cli(spn_file, remove=remove))
+        )
+        msg = f"remove {remove}: expected {gold}, got {cog}"
+        assert np.allclose(cog, gold), msg
@@ -0,0 +1,135 @@
+"""This module tests cropping a segmentation to the bounding box of its kept
+IDs, and that the shifted center of geometry gives identical coordinates.
+
+To run:
+pytest
+pytest --cov --cov-report=term-missing
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from autosim.ssm.center_of_geometry import (
+    center_of_geometry,
+    Segmentation,
+)
+from autosim.ssm.crop import (
+    bounding_box,
+    crop,
+    crop_segmentation,
+    cropped_center_of_geometry,
+)
+from autosim.ssm.label_statistics import label_statistics
+from autosim.ssm.segmentation_io import read_sidecar
+
+
+@pytest.fixture
+def padded_segmentation():
+    """Fixture to a random two-material block inside a void volume."""
+    rng = np.random.default_rng(seed=11)
+    segmentation = np.zeros((20, 16, 12), dtype=np.uint8)
+    segmentation[5:11, 3:9, 4:10] = rng.integers(1, 3, size=(6, 6, 6))
+    return segmentation
+
+
+def test_bounding_box_letter_f():
+    """Tests the letter_f material box spans the whole volume, and the void
+    box does not."""
+    segmentation = np.load(
+        Path(__file__).parent.joinpath("input", "letter_f.npy")
+    )
+    stats = label_statistics(segmentation)
+
+    box = bounding_box(stats, [0], segmentation.shape)
+    assert box.lower.tolist() == [0, 0, 0]
+    assert box.upper.tolist() == [3, 5, 1]
+
+    box = bounding_box(stats, [11], segmentation.shape)
+    assert box.lower.tolist() == [1, 0, 0]
+    assert box.upper.tolist() == [3, 4, 1]
+
+
+def test_bounding_box_padding(padded_segmentation):
+    """Tests padding grows the box and is clipped to the volume."""
+    stats = label_statistics(padded_segmentation)
+    shape = padded_segmentation.shape
+
+    box = bounding_box(stats, [0], shape)
+    assert box.lower.tolist() == [5, 3, 4]
+    assert box.upper.tolist() == [11, 9, 10]
+
+    box = bounding_box(stats, [0], shape, padding=4)
+    assert box.lower.tolist() == [1, 0, 0]
+    assert box.upper.tolist() == [15, 13, 12]
+
+    with pytest.raises(ValueError, match="Padding must be non-negative"):
+        bounding_box(stats, [0], shape, padding=-1)
+
+
+@pytest.mark.parametrize("padding", [0, 2])
+def test_crop_keeps_mesh_coordinates(padded_segmentation, padding):
+    """Tests the cropped segmentation holds every kept voxel, and that the
+    shifted center of geometry maps every kept voxel to the same mesh
+    coordinate as the uncropped segmentation."""
+    remove = [0]
+    scale = 0.1333
+    stats = label_statistics(padded_segmentation)
+    box = bounding_box(stats, remove, padded_segmentation.shape, padding)
+    cropped = crop(padded_segmentation, box)
+
+    assert np.count_nonzero(cropped) == np.count_nonzero(padded_segmentation)
+
+    cog = center_of_geometry(Segmentation(padded_segmentation, remove))
+    cog_cropped = cropped_center_of_geometry(cog, box.lower)
+    assert np.allclose(
+        cog_cropped, center_of_geometry(Segmentation(cropped, remove))
+    )
+
+    source = np.argwhere(padded_segmentation != 0) * scale - cog * scale
+    shifted = np.argwhere(cropped != 0) * scale - cog_cropped * scale
+    assert np.allclose(source, shifted)
+
+
+def test_crop_segmentation_file(tmp_path, padded_segmentation):
+    """Tests the cropped file and its sidecar offset."""
+    input_file = tmp_path.joinpath("subject.npy")
+    np.save(input_file, padded_segmentation)
+    output_file = tmp_path.joinpath("cropped", "subject.npy")
+
+    result = crop_segmentation(input_file, output_file, [0], padding=1)
+
+    assert result.output_file == output_file
+    assert result.offset.tolist() == [4, 2, 3]
+    assert result.shape == (8, 8, 8)
+    assert np.array_equal(
+        np.load(output_file), padded_segmentation[4:12, 2:10, 3:11]
+    )
+
+    sidecar = read_sidecar(output_file)
+    assert sidecar["offset"] == [4, 2, 3]
+    assert sidecar["source_shape"] == [20, 16, 12]
+
+
+def test_crop_segmentation_reuse(tmp_path, padded_segmentation):
+    """Tests a crop is written again only when its source, remove IDs, or
+    padding change."""
+    input_file = tmp_path.joinpath("subject.npy")
+    np.save(input_file, padded_segmentation)
+    output_file = tmp_path.joinpath("cropped", "subject.npy")
+    first = crop_segmentation(input_file, output_file, [0], padding=1)
+    mtime = output_file.stat().st_mtime_ns
+
+    again = crop_segmentation(input_file, output_file, [0], padding=1)
+    assert output_file.stat().st_mtime_ns == mtime
+    assert again.offset.tolist() == first.offset.tolist()
+    assert again.shape == first.shape
+
+    crop_segmentation(input_file, output_file, [0], padding=0)
+    assert np.load(output_file).shape == (6, 6, 6)
+
+    padded_segmentation[0, 0, 0] = 1
+    np.save(input_file, padded_segmentation)
+    changed = crop_segmentation(input_file, output_file, [0], padding=0)
+    assert changed.offset.tolist() == [0, 0, 0]
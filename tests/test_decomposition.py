@@ -0,0 +1,142 @@
+"""This module tests the parallel, cwd-safe mesh decomposition stage with a
+stand-in for SEACAS decomp.
+
+To run:
+pytest
+pytest --cov --cov-report=term-missing
+"""
+
+import os
+import struct
+import sys
+from pathlib import Path
+
+import pytest
+
+from autosim.ssm.decomposition import (
+    decompose,
+    element_count,
+    find_meshes,
+    is_decomposed,
+    pieces,
+    select_processors,
+)
+
+# Writes <mesh>.<N>.<rank> in the working directory, as decomp does
+FAKE_DECOMP = """\
+import sys
+from pathlib import Path
+n, mesh = int(sys.argv[2]), Path(sys.argv[3])
+assert mesh.is_file(), f"{mesh} not in {Path.cwd()}"
+for rank in range(n):
+    Path(f"{mesh.name}.{n}.{rank:0{len(str(n - 1))}d}").write_text("")
+print("decomposed", mesh)
+"""
+
+
+def _write_header(path: Path, version: int, dimensions: dict) -> None:
+    """Write the start of a netCDF classic header, its dimension list."""
+    code = ">q" if version == 5 else ">i"
+    header = b"CDF" + bytes([version]) + struct.pack(code, 0)
+    header += struct.pack(">i", 0x0A) + struct.pack(code, len(dimensions))
+    for name, value in dimensions.items():
+        padding = b"\0" * (-len(name) % 4)
+        header += struct.pack(code, len(name)) + name.encode() + padding
+        header += struct.pack(code, value)
+    path.write_bytes(header + b"\0" * 64)
+
+
+@pytest.mark.parametrize("version", [1, 2, 5])
+def test_element_count(tmp_path, version):
+    """Tests the element count is read from each classic header format."""
+    mesh = tmp_path.joinpath("a.exo")
+    dimensions = {"len_string": 33, "num_dim": 3, "num_elem": 123_456}
+    _write_header(mesh, version, dimensions)
+    assert element_count(mesh) == 123_456
+
+    _write_header(mesh, version, {"num_dim": 3})
+    with pytest.raises(ValueError, match="no num_elem"):
+        element_count(mesh)
+
+
+def test_select_processors():
+    """Tests ranks keep the elements per rank in the target range."""
+    assert select_processors(1, (10, 100)) == 1
+    assert select_processors(1_000, (10, 100)) == 10
+    assert select_processors(1_001, (10, 100)) == 11
+    assert select_processors(1_001, (10, 100), multiple=16) == 16
+    # 32 ranks would leave fewer than 60 elements per rank
+    assert select_processors(1_700, (60, 100), multiple=16) == 16
+    with pytest.raises(ValueError, match="Invalid"):
+        select_processors(1_000, (100, 10))
+
+
+@pytest.fixture
+def decomp(tmp_path) -> str:
+    """Fixture to an executable stand-in for decomp."""
+    script = tmp_path.joinpath("fake_decomp.py")
+    script.write_text(FAKE_DECOMP)
+    wrapper = tmp_path.joinpath("decomp")
+    wrapper.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{script}" "$@"\n')
+    wrapper.chmod(0o755)
+    return str(wrapper)
+
+
+def test_decompose_and_skip(tmp_path, decomp):
+    """Tests meshes are moved, decomposed in their subfolders without
+    changing the working directory, and skipped when current."""
+    exo_folder = tmp_path.joinpath("exo")
+    exo_folder.mkdir()
+    for name in ("a", "b", "c"):
+        exo_folder.joinpath(f"{name}.exo").write_text(name)
+    cwd = Path.cwd()
+
+    done = decompose(find_meshes(exo_folder), 4, cores=2, decomp=decomp)
+
+    assert Path.cwd() == cwd
+    assert [item.mesh for item in done] == [
+        exo_folder.joinpath(name, f"{name}.exo") for name in ("a", "b", "c")
+    ]
+    assert all(item.result.ok and not item.skipped for item in done)
+    assert [path.name for path in pieces(done[0].mesh, 4)] == [
+        f"a.exo.4.{rank}" for rank in range(4)
+    ]
+    assert (
+        "decomposed a.exo"
+        in done[0].mesh.parent.joinpath("decomp.log").read_text()
+    )
+
+    # a rerun finds the moved meshes and skips current ones
+    mesh = exo_folder.joinpath("b", "b.exo")
+    older = mesh.stat().st_mtime_ns - 10**9
+    os.utime(pieces(mesh, 4)[0], ns=(older, older))
+    assert not is_decomposed(mesh, 4)
+
+    again = decompose(find_meshes(exo_folder), 4, decomp=decomp)
+    assert [item.skipped for item in again] == [True, False, True]
+    assert is_decomposed(mesh, 4)
+
+
+def test_processors_per_mesh(tmp_path, decomp):
+    """Tests each mesh is decomposed into its own number of pieces."""
+    exo_folder = tmp_path.joinpath("exo")
+    exo_folder.mkdir()
+    for name in ("a", "b"):
+        exo_folder.joinpath(f"{name}.exo").write_text(name)
+
+    done = decompose(find_meshes(exo_folder), [2, 3], decomp=decomp)
+    assert [item.processors for item in done] == [2, 3]
+    assert is_decomposed(done[0].mesh, 2)
+    assert is_decomposed(done[1].mesh, 3)
+
+
+def test_failure_is_reported(tmp_path):
+    """Tests a failed decomp is reported, not raised."""
+    exo_folder = tmp_path.joinpath("exo")
+    exo_folder.mkdir()
+    exo_folder.joinpath("a.exo").write_text("a")
+
+    (done,) = decompose(find_meshes(exo_folder), 2, decomp="false")
+    assert not done.skipped
+    assert not done.result.ok
+    assert not is_decomposed(done.mesh, 2)
@@ -0,0 +1,145 @@
+"""This module tests the parallel, cached ensemble statistics.
+
+To run:
+pytest
+pytest --cov --cov-report=term-missing
+"""
+
+import csv
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from autosim.ssm.ensemble_statistics import (
+    batch_statistics,
+    expand_inputs,
+    file_digest,
+    write_table,
+)
+
+
+@pytest.fixture
+def ensemble(tmp_path):
+    """Fixture to a folder with letter_f and two random segmentations."""
+    folder = tmp_path.joinpath("input")
+    folder.mkdir()
+    shutil.copy(
+        Path(__file__).parent.joinpath("input", "letter_f.npy"),
+        folder.joinpath("letter_f.npy"),
+    )
+    rng = np.random.default_rng(seed=3)
+    for name in ("a", "b"):
+        np.save(
+            folder.joinpath(f"{name}.npy"),
+            rng.integers(0, 3, size=(6, 5, 4), dtype=np.uint8),
+        )
+    return folder
+
+
+def test_expand_inputs(ensemble):
+    """Tests directory and glob expansion."""
+    names = [path.name for path in expand_inputs(str(ensemble))]
+    assert names == ["a.npy", "b.npy", "letter_f.npy"]
+
+    names = [path.name for path in expand_inputs(str(ensemble / "l*.npy"))]
+    assert names == ["letter_f.npy"]
+
+    with pytest.raises(FileNotFoundError):
+        expand_inputs(str(ensemble / "nothing_*.npy"))
+
+
+def test_batch_letter_f(ensemble):
+    """Tests the batch row of letter_f against the known fiducial."""
+    files = expand_inputs(str(ensemble))
+    result = batch_statistics(files, remove=[0], max_workers=2)
+
+    row = result.rows[files.index(ensemble.resolve() / "letter_f.npy")]
+    cog = [row["cog_x"], row["cog_y"], row["cog_z"]]
+    assert np.allclose(cog, [1.0, 3.0, 0.5])
+    assert row["voxels"] == 8
+    assert row["ids"] == "0 11"
+    assert row["counts"] == "7 8"
+    assert len(result.computed) == 3
+    assert result.reused == []
+
+
+def test_batch_cache(ensemble, tmp_path):
+    """Tests reruns only process new or changed segmentations."""
+    cache_file = tmp_path.joinpath("cache.json")
+    files = expand_inputs(str(ensemble))
+    first = batch_statistics(files, [0], cache_file, max_workers=2)
+    assert len(first.computed) == 3
+
+    # unchanged files are reused without rereading
+    second = batch_statistics(files, [0], cache_file, max_workers=2)
+    assert second.computed == []
+    assert second.rows == first.rows
+
+    # a new file and a changed file are computed
+    np.save(ensemble / "c.npy", np.ones((2, 2, 2), dtype=np.uint8))
+    np.save(ensemble / "a.npy", np.full((3, 3, 3), 2, dtype=np.uint8))
+    files = expand_inputs(str(ensemble))
+    third = batch_statistics(files, [0], cache_file, max_workers=2)
+    assert sorted(path.name for path in third.computed) == ["a.npy", "c.npy"]
+    row = third.rows[0]
+    assert row["voxels"] == 27
+    assert row["digest"] == file_digest(ensemble / "a.npy")
+
+    # a new modification time with the same content is rehashed and reused
+    stat = (ensemble / "b.npy").stat()
+    os.utime(ensemble / "b.npy", ns=(stat.st_atime_ns, stat.st_mtime_ns + 10))
+    fourth = batch_statistics(files, [0], cache_file, max_workers=2)
+    assert fourth.computed == []
+
+    # other remove IDs invalidate the cache
+    fifth = batch_statistics(files, [], cache_file, max_workers=2)
+    assert len(fifth.computed) == 4
+
+    # rows of both remove IDs are kept, so going back reuses them
+    sixth = batch_statistics(files, [0], cache_file, max_workers=2)
+    assert sixth.computed == []
+    assert sixth.rows == fourth.rows
+
+
+def test_batch_failure(ensemble, tmp_path):
+    """Tests a failing file is reported and the others are still cached."""
+    cache_file = tmp_path.joinpath("cache.json")
+    ensemble.joinpath("broken.npy").write_bytes(b"not a segmentation")
+    files = expand_inputs(str(ensemble))
+    result = batch_statistics(files, [0], cache_file, max_workers=2)
+    assert list(result.failed) == [ensemble.resolve() / "broken.npy"]
+    assert len(result.rows) == 3
+    assert len(result.computed) == 3
+
+    rerun = batch_statistics(files, [0], cache_file, max_workers=2)
+    assert rerun.computed == []
+    assert sorted(path.name for path in rerun.reused) == [
+        "a.npy",
+        "b.npy",
+        "letter_f.npy",
+    ]
+    assert list(rerun.failed) == list(result.failed)
+
+
+def test_write_table(ensemble, tmp_path):
+    """Tests the .csv and .json tables and rejects other formats."""
+    files = expand_inputs(str(ensemble))
+    result = batch_statistics(files, remove=[0], max_workers=1)
+
+    csv_file = tmp_path.joinpath("table.csv")
+    write_table(result.rows, csv_file)
+    with open(csv_file, newline="") as file:
+        rows = list(csv.DictReader(file))
+    assert [row["file"] for row in rows] == [str(path) for path in files]
+
+    json_file = tmp_path.joinpath("table.json")
+    write_table(result.rows, json_file)
+    with open(json_file) as file:
+        assert json.load(file) == result.rows
+
+    with pytest.raises(ValueError, match="must be a .csv or .json file"):
+        write_table(result.rows, tmp_path.joinpath("table.txt"))
@@ -0,0 +1,104 @@
+"""This module tests running commands concurrently under a core and memory
+budget.
+
+To run:
+pytest
+pytest --cov --cov-report=term-missing
+"""
+
+import sys
+
+import pytest
+
+from autosim.ssm.executor import (
+    failure_summary,
+    Job,
+    NOT_STARTED,
+    run_jobs,
+)
+
+
+def _python(code: str) -> list[str]:
+    """Command that runs a Python snippet."""
+    return [sys.executable, "-c", code]
+
+
+def test_logs_and_exit_status(tmp_path):
+    """Tests output goes to per-job logs, and failures are reported."""
+    jobs = [
+        Job("ok", _python("print('hello')"), tmp_path / "logs" / "ok.log"),
+        Job(
+            "fail",
+            _python("import sys; sys.stderr.write('bad'); sys.exit(3)"),
+            tmp_path / "logs" / "fail.log",
+        ),
+        Job("missing", [str(tmp_path / "nope")], tmp_path / "missing.log"),
+    ]
+    done = []
+    results = run_jobs(jobs, cores=2, on_done=done.append)
+
+    assert [item.name for item in results] == ["ok", "fail", "missing"]
+    assert sorted(item.name for item in done) == ["fail", "missing", "ok"]
+    assert [item.returncode for item in results] == [0, 3, NOT_STARTED]
+    assert results[0].ok and not results[1].ok
+    assert all(item.wall_time >= 0.0 for item in results)
+    assert (tmp_path / "logs" / "ok.log").read_text() == "hello\n"
+    assert (tmp_path / "logs" / "fail.log").read_text() == "bad"
+
+    summary = failure_summary(results)
+    assert summary.startswith("1 job(s) succeeded, 2 job(s) failed.")
+    assert "FAILED fail: exit status 3" in summary
+    assert str(tmp_path / "missing.log") in summary
+
+
+def _overlaps(tmp_path, n_jobs, job_cores=1, **budget) -> int:
+    """Run sleeping jobs that record their start and end times, and return
+    the largest number that ran at once."""
+    code = (
+        "import sys, time; start = time.time(); time.sleep(0.3); "
+        "open(sys.argv[1], 'w').write(f'{start} {time.time()}')"
+    )
+    jobs = [
+        Job(
+            name=f"job{ii}",
+            command=_python(code) + [str(tmp_path / f"{ii}.txt")],
+            log_file=tmp_path / f"{ii}.log",
+            cores=job_cores if ii == 0 else 1,
+            memory_gb=4.0,
+        )
+        for ii in range(n_jobs)
+    ]
+    results = run_jobs(jobs, **budget)
+    assert all(item.ok for item in results)
+
+    spans = [
+        tuple(map(float, (tmp_path / f"{ii}.txt").read_text().split()))
+        for ii in range(n_jobs)
+    ]
+    return max(
+        sum(1 for start, end in spans if start <= tt < end) for tt, _ in spans
+    )
+
+
+def test_core_budget(tmp_path):
+    """Tests no more jobs run at once than the core budget allows."""
+    assert _overlaps(tmp_path, 4, cores=2) <= 2
+
+
+def test_memory_budget(tmp_path):
+    """Tests the memory budget limits concurrency below the core budget."""
+    assert _overlaps(tmp_path, 3, cores=8, memory_gb=4.0) == 1
+
+
+def test_oversized_job_runs_alone(tmp_path):
+    """Tests a job needing more than the budget still runs."""
+    assert _overlaps(tmp_path, 2, cores=2, job_cores=16) == 1
+
+
+def test_invalid_budget(tmp_path):
+    """Tests invalid core counts raise an error."""
+    job = Job("a", _python("pass"), tmp_path / "a.log")
+    with pytest.raises(ValueError, match="Core budget must be positive"):
+        run_jobs([job], cores=0)
+    with pytest.raises(ValueError, match="must need at least one core"):
+        run_jobs([job._replace(cores=0)], cores=1)
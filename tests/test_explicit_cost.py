@@ -0,0 +1,112 @@
+"""This module tests the Abaqus/Explicit cost prediction.
+
+To run:
+pytest
+pytest --cov --cov-report=term-missing
+"""
+
+import math
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from autosim.ssm.explicit_cost import predict, read_model
+from autosim.ssm.voxel_mesh import voxel_mesh, write_inp
+
+REPO: Path = Path(__file__).parents[1]
+
+
+def test_base_template():
+    """Tests the materials, sections, and step of base_template.inp."""
+    model = read_model(REPO.joinpath("base_template.inp"))
+
+    assert model.sections == {
+        "EB1": "GRAYMATTER",
+        "EB2": "CSF",
+        "EB3": "SKULL",
+    }
+    assert model.rigid == {"EB3"}
+    assert model.step_time == 0.08
+    assert model.bulk_viscosity == 0.06
+
+    csf = model.materials["CSF"]  # USUP: c = c0
+    assert math.isclose(csf.wave_speed, 1489.0)
+
+    skull = model.materials["SKULL"]  # E = 8e9, nu = 0.22, rho = 2070
+    modulus, poisson = 8e9, 0.22
+    constrained = modulus * (1 - poisson) / ((1 + poisson) * (1 - 2 * poisson))
+    assert math.isclose(skull.wave_speed, math.sqrt(constrained / 2070.0))
+
+    gray = model.materials["GRAYMATTER"]  # neo hooke, long-term moduli
+    assert math.isclose(gray.shear, 2 * 3200.0 / (1 - 0.8118))
+    assert math.isclose(gray.bulk, 2 / 9.132e-10)
+
+
+def test_ogden_template(tmp_path):
+    """Tests an Ogden material with Prony series, and a missing step."""
+    material = REPO.joinpath("abaqus_inp_files", "material_graymatter.inp")
+    template = tmp_path.joinpath("template.inp")
+    template.write_text(f"*INCLUDE, INPUT={material}\n")
+    with pytest.raises(ValueError, match="has no explicit step"):
+        read_model(template)
+
+    template.write_text(
+        f"*INCLUDE, INPUT={material}\n*Dynamic, Explicit\n0.0, 0.01\n"
+    )
+    gray = read_model(template).materials["GRAYMATTER"]
+    assert math.isclose(gray.shear, 303.0 / (1 - 0.566 - 0.324))
+    assert math.isclose(gray.bulk, 2 / 4e-08)
+
+
+def test_blank_fields(tmp_path):
+    """Tests data fields keep their positions when some are left blank, as
+    in the usual ", <time period>" line of an explicit step."""
+    material = REPO.joinpath("abaqus_inp_files", "material_csf.inp")
+    template = tmp_path.joinpath("template.inp")
+    template.write_text(
+        f"*INCLUDE, INPUT={material}\n"
+        "*Dynamic, Explicit\n, 0.08\n"
+        "*Bulk Viscosity\n, 1.2\n"
+    )
+    model = read_model(template)
+    assert model.step_time == 0.08
+    assert model.bulk_viscosity == 0.06  # the default, left blank
+
+    template.write_text(
+        f"*INCLUDE, INPUT={material}\n"
+        "*Dynamic, Explicit\n, 0.08,\n"
+        "*Bulk Viscosity\n0.1, 1.2\n"
+    )
+    model = read_model(template)
+    assert model.step_time == 0.08
+    assert model.bulk_viscosity == 0.1
+
+
+def test_predict(tmp_path):
+    """Tests the increment is set by the fastest deformable material on the
+    shortest edge, ignoring the rigid skull."""
+    model = read_model(REPO.joinpath("base_template.inp"))
+    segmentation = np.ones((6, 5, 4), dtype=np.uint8)
+    segmentation[0] = 2  # CSF
+    segmentation[-1] = 3  # rigid skull
+    mesh_file = tmp_path.joinpath("subject.inp")
+    write_inp(voxel_mesh(segmentation, [], (0.002, 0.001, 0.003)), mesh_file)
+
+    row = predict(mesh_file, model, cores=4, element_cost=1e-6)
+
+    damping = math.sqrt(1 + 0.06**2) - 0.06
+    expected = 0.001 / 1489.0 * damping
+    assert row["controlling_elset"] == "EB2"
+    assert row["elements"] == 5 * 5 * 4
+    assert math.isclose(row["min_length"], 0.001)
+    assert math.isclose(row["stable_increment"], expected)
+    assert row["increments"] == math.ceil(0.08 / expected)
+    assert math.isclose(
+        row["wall_time_h"], row["increments"] * 100 * 1e-6 / 4 / 3600
+    )
+    assert row["h_rt"] == "01:00:00"
+    assert not row["exceeds_limit"]
+
+    slow = predict(mesh_file, model, cores=1, element_cost=10.0)
+    assert slow["exceeds_limit"]
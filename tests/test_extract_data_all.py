@@ -0,0 +1,118 @@
+"""This module tests the concurrent extraction driver, with a stand-in for
+the Abaqus extraction script.
+
+To run:
+pytest
+pytest --cov --cov-report=term-missing
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# the post-processing scripts run in Abaqus, outside the package
+POSTPROC: Path = Path(__file__).parents[1].joinpath("postproc")
+sys.path.insert(0, str(POSTPROC))
+
+from extract_data_all import (  # noqa: E402
+    concurrency,
+    extract_all,
+    is_current,
+)
+from result_store import results_folder  # noqa: E402
+
+from autosim.ssm.run_state import connect, runs  # noqa: E402
+
+# reads its arguments as extract_data_strain_vs_strain_rate.py, and writes
+# the results of the subject in the --results folder, 81 frames, or 3 for
+# "short", and fails for "bad"
+FAKE_EXTRACT = f"""
+import sys
+sys.path.insert(0, {str(POSTPROC)!r})
+import numpy as np
+from result_store import results_folder, write_results
+results = "simulation_results"
+if "--results" in sys.argv[:-1]:
+    index = sys.argv.index("--results")
+    results = sys.argv[index + 1]
+    del sys.argv[index:index + 2]
+basename = sys.argv[1]
+assert sys.argv[2:] in ([], ["false"]), sys.argv  # save_full_txt_file
+if basename == "bad":
+    sys.exit(3)
+n = 3 if basename == "short" else 81
+folder = results_folder(results + "/" + basename, basename)
+write_results(folder, {{"percentiles_95": np.zeros((n, 2))}},
+              np.arange(n) * 0.001, "MAX_PRINCIPAL", "PART-1-1.EB1")
+print("extracted", basename)
+"""
+
+
+def _odbs(results, basenames):
+    for basename in basenames:
+        folder = results.joinpath(basename)
+        folder.mkdir(parents=True)
+        folder.joinpath(f"{basename}.odb").write_text("odb")
+
+
+def test_concurrency():
+    """Tests the cores and the license tokens both cap the extractions."""
+    assert concurrency(16) == 16
+    assert concurrency(16, tokens=8) == 8
+    assert concurrency(16, tokens=10, tokens_per_job=5) == 2
+    assert concurrency(4, tokens=64) == 4
+    assert concurrency(16, tokens=0) == 1
+
+
+def test_extract_all(tmp_path):
+    """Tests subjects are extracted, checked, recorded, and skipped once
+    current."""
+    # not the default folder of the extraction script
+    results = tmp_path.joinpath("results_run1")
+    _odbs(results, ["a", "b", "short", "bad"])
+    script = tmp_path.joinpath("fake_extract.py")
+    script.write_text(FAKE_EXTRACT)
+    command = [sys.executable, str(script)]
+    run_state = connect(tmp_path.joinpath("run_state.sqlite"))
+
+    done, skipped = extract_all(
+        ["a", "b", "short", "bad"],
+        results=str(results),
+        cores=2,
+        command=command,
+        arguments=["false"],
+        run_state=run_state,
+    )
+    assert skipped == []
+    assert [item.ok for item in done] == [True, True, False, False]
+    assert "extracted a" in results.joinpath("a", "a_extract.log").read_text()
+    (extract,) = runs(run_state, "short")
+    assert extract.status == "failed"
+    assert "3 of 81 frames" in extract.message
+    assert runs(run_state, "a")[0].status == "done"
+
+    assert is_current(str(results), "a")
+    assert not is_current(str(results), "bad")
+    # a newer .odb makes the results stale
+    odb = results.joinpath("a", "a.odb")
+    header = Path(results_folder(str(results.joinpath("a")), "a"))
+    mtime = header.joinpath("header.json").stat().st_mtime
+    os.utime(odb, (mtime + 10, mtime + 10))
+    done, skipped = extract_all(
+        ["a", "b"],
+        results=str(results),
+        command=command,
+    )
+    assert skipped == ["b"]
+    assert [item.name for item in done] == ["a"]
+    assert np.all([item.ok for item in done])
+
+    done, skipped = extract_all(
+        ["b"],
+        results=str(results),
+        force=True,
+        command=command,
+    )
+    assert skipped == [] and done[0].ok
@@ -0,0 +1,117 @@
+"""This module tests the chunked .inp mesh reader and its .npz sidecar.
+
+To run:
+pytest
+pytest --cov --cov-report=term-missing
+"""
+
+import os
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from autosim.ssm.inp_reader import (
+    cache_path,
+    load_npz_mmap,
+    parse_inp,
+    read_mesh,
+)
+from autosim.ssm.voxel_mesh import voxel_mesh, write_inp
+
+INPUT: Path = Path(__file__).parent.joinpath("input")
+
+
+@pytest.mark.parametrize("chunk_size", [64, 1000, 1 << 20])
+def test_letter_f(chunk_size):
+    """Tests the automesh letter_f mesh, read in chunks of any size."""
+    mesh = parse_inp(INPUT.joinpath("letter_f.inp"), chunk_size=chunk_size)
+
+    assert mesh.node_ids.tolist() == list(range(1, 49))
+    assert mesh.coordinates.shape == (48, 3)
+    assert mesh.coordinates[47].tolist() == [3.0, 5.0, 1.0]
+    eb0 = [2, 3, 5, 6, 9, 11, 12]
+    eb11 = [1, 4, 7, 8, 10, 13, 14, 15]
+    assert mesh.element_ids.tolist() == eb0 + eb11
+    assert mesh.connectivity[0].tolist() == [2, 3, 7, 6, 26, 27, 31, 30]
+    assert mesh.elsets["EB0"].tolist() == eb0
+    assert mesh.elsets["EB11"].tolist() == eb11
+
+
+def test_round_trip(tmp_path):
+    """Tests a written voxel mesh reads back unchanged."""
+    rng = np.random.default_rng(seed=7)
+    segmentation = rng.integers(0, 4, size=(9, 7, 5), dtype=np.uint8)
+    mesh = voxel_mesh(segmentation, [0], scale=(0.2, 0.2, 0.2))
+    path = tmp_path.joinpath("mesh.inp")
+    write_inp(mesh, path)
+
+    read = parse_inp(path, chunk_size=333)
+    assert np.allclose(read.coordinates, mesh.coordinates)
+    assert np.array_equal(read.element_ids, mesh.element_ids)
+    assert np.array_equal(read.connectivity, mesh.connectivity)
+    for label in (1, 2, 3):
+        assert np.array_equal(
+            read.elsets[f"EB{label}"], mesh.element_ids[mesh.blocks == label]
+        )
+
+
+def test_elset_keywords(tmp_path):
+    """Tests *ELSET lists, GENERATE ranges with and without an increment,
+    continuation lines, and comments."""
+    path = tmp_path.joinpath("sets.inp")
+    path.write_text(
+        "*Part, name=PART-1\n"
+        "*NODE\n"
+        + "".join(f"{ii + 1}, {ii}.0, 0.0, 0.0\n" for ii in range(9))
+        + "*ELEMENT, TYPE=C3D8\n"
+        "1, 1, 2, 3, 4,\n"
+        "   5, 6, 7, 8\n"
+        "** a comment\n"
+        "2, 2, 3, 4, 5, 6, 7, 8, 9\n"
+        "*Elset, elset=LISTED\n"
+        "1, 2,\n"
+        "*ELSET, ELSET=RANGE, GENERATE\n"
+        "1, 5, 2\n"
+        "8, 9\n"
+        "*End Part\n"
+    )
+    mesh = parse_inp(path)
+    assert mesh.element_ids.tolist() == [1, 2]
+    assert mesh.connectivity[1].tolist() == [2, 3, 4, 5, 6, 7, 8, 9]
+    assert mesh.elsets["LISTED"].tolist() == [1, 2]
+    assert mesh.elsets["RANGE"].tolist() == [1, 3, 5, 8, 9]
+
+
+def test_invalid_element_type(tmp_path):
+    """Tests elements other than 8-node hexes raise an error."""
+    path = tmp_path.joinpath("tet.inp")
+    path.write_text("*ELEMENT, TYPE=C3D4\n1, 1, 2, 3, 4\n")
+    with pytest.raises(ValueError, match="is not an 8-node hex"):
+        parse_inp(path)
+
+
+def test_sidecar(tmp_path):
+    """Tests the sidecar is written, memory mapped, and refreshed when the
+    .inp file changes."""
+    path = tmp_path.joinpath("letter_f.inp")
+    path.write_bytes(INPUT.joinpath("letter_f.inp").read_bytes())
+
+    parsed = read_mesh(path)
+    assert cache_path(path).is_file()
+    assert not isinstance(parsed.connectivity, np.memmap)
+
+    cached = read_mesh(path)
+    assert isinstance(cached.connectivity, np.memmap)
+    assert np.array_equal(cached.connectivity, parsed.connectivity)
+    assert np.array_equal(cached.elsets["EB11"], parsed.elsets["EB11"])
+
+    # a changed mesh is parsed again
+    text = path.read_text().replace("ELSET=EB11", "ELSET=EB12")
+    path.write_text(text)
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert "EB12" in read_mesh(path).elsets
+    assert "elset:EB12" in load_npz_mmap(cache_path(path))
+
+    assert not isinstance(read_mesh(path, cache=False).node_ids, np.memmap)
@@ -0,0 +1,165 @@
+"""This module tests the label_statistics module with known data from the
+letter_f.npy unit test of automesh and with brute-force references on
+random segmentations.
+
+To run:
+pytest
+pytest --cov --cov-report=term-missing
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from autosim.ssm.center_of_geometry import (
+    center_of_geometry,
+    Segmentation,
+)
+from autosim.ssm.label_statistics import (
+    center_of_geometry_from_statistics,
+    centroids,
+    combine,
+    inertia_tensors,
+    label_statistics,
+)
+
+
+@pytest.fixture(scope="module")
+def letter_f():
+    """Fixture to the segmentation data from letter_f.npy"""
+    segmentation_file = Path(__file__).parent.joinpath("input", "letter_f.npy")
+    return np.load(segmentation_file)
+
+
+@pytest.fixture(scope="module")
+def random_segmentation():
+    """Fixture to a random multi-label segmentation with an unused ID."""
+    rng = np.random.default_rng(seed=7)
+    segmentation = rng.choice(
+        np.array([0, 1, 2, 5], dtype=np.uint8), size=(19, 13, 9)
+    )
+    return segmentation
+
+
+def test_letter_f_counts_and_centroids(letter_f):
+    """Tests per-label counts, centroids, and bounding boxes of letter_f."""
+    stats = label_statistics(letter_f)
+
+    assert stats.ids.tolist() == [0, 11]
+    assert stats.counts.tolist() == [7, 8]
+
+    expected = np.array([[2.071429, 1.928571, 0.5], [1.0, 3.0, 0.5]])
+    msg = f"expected {expected}, got {centroids(stats)}"
+    assert np.allclose(centroids(stats), expected), msg
+
+    assert stats.lower.tolist() == [[1, 0, 0], [0, 0, 0]]
+    assert stats.upper.tolist() == [[3, 4, 1], [3, 5, 1]]
+
+
+@pytest.mark.parametrize(
+    "remove, expected",
+    [
+        ([11], [2.071429, 1.928571, 0.5]),
+        ([0], [1.0, 3.0, 0.5]),
+        ([], [1.5, 2.5, 0.5]),
+    ],
+)
+def test_letter_f_cog_from_statistics(letter_f, remove, expected):
+    """Tests the combined center of geometry against the letter_f
+    fiducials."""
+    stats = label_statistics(letter_f)
+    cog = center_of_geometry_from_statistics(stats, remove)
+
+    msg = f"expected {expected}, got {cog}"
+    assert np.allclose(cog, expected), msg
+
+
+def test_remove_all_ids(letter_f):
+    """Tests that a ValueError is raised when all IDs are removed."""
+    stats = label_statistics(letter_f)
+    with pytest.raises(ValueError, match="does not include valid IDs"):
+        center_of_geometry_from_statistics(stats, [0, 11])
+
+
+@pytest.mark.parametrize("slab_size", [1, 4, 64])
+def test_random_matches_brute_force(random_segmentation, slab_size):
+    """Tests every statistic against a direct computation per label."""
+    stats = label_statistics(random_segmentation, slab_size=slab_size)
+    assert stats.ids.tolist() == [0, 1, 2, 5]
+
+    for ii, label in enumerate(stats.ids):
+        indices = np.argwhere(random_segmentation == label)
+        assert stats.counts[ii] == len(indices)
+        assert np.array_equal(stats.sums[ii], indices.sum(axis=0))
+        assert np.array_equal(stats.products[ii], indices.T @ indices)
+        assert np.array_equal(stats.lower[ii], indices.min(axis=0))
+        assert np.array_equal(stats.upper[ii], indices.max(axis=0) + 1)
+
+
+@pytest.mark.parametrize("remove", [[], [0], [0, 2], [1, 2, 5]])
+def test_random_cog_matches_center_of_geometry(random_segmentation, remove):
+    """Tests the combined center of geometry equals center_of_geometry()
+    for several remove sets, from a single set of statistics."""
+    stats = label_statistics(random_segmentation, slab_size=5)
+    gold = center_of_geometry(
+        Segmentation(segmentation=random_segmentation, remove=remove)
+    )
+    cog = center_of_geometry_from_statistics(stats, remove)
+
+    msg = f"remove {remove}: expected {gold}, got {cog}"
+    assert np.allclose(cog, gold, rtol=0.0, atol=1e-12), msg
+
+
+def test_combine_bounding_box(random_segmentation):
+    """Tests the combined bounding box covers all kept voxels."""
+    stats = label_statistics(random_segmentation)
+    kept = combine(stats, [0])
+    indices = np.argwhere(random_segmentation != 0)
+
+    assert kept.ids.tolist() == [-1]
+    assert kept.counts[0] == len(indices)
+    assert np.array_equal(kept.lower[0], indices.min(axis=0))
+    assert np.array_equal(kept.upper[0], indices.max(axis=0) + 1)
+
+
+def test_inertia_tensor_of_cube():
+    """Tests the inertia tensor of a solid 2 x 2 x 2 cube of voxels, which
+    is that of a uniform cube of side 2 and mass 8: (8 * 8 / 6) I."""
+    segmentation = np.zeros((4, 4, 4), dtype=np.uint8)
+    segmentation[1:3, 1:3, 1:3] = 3
+    stats = label_statistics(segmentation)
+    inertia = inertia_tensors(stats)
+
+    assert stats.ids.tolist() == [0, 3]
+    expected = 8.0 * 2.0**2 / 6.0 * np.eye(3)
+    msg = f"expected {expected}, got {inertia[1]}"
+    assert np.allclose(inertia[1], expected), msg
+
+
+def test_inertia_tensor_off_diagonal(random_segmentation):
+    """Tests the inertia tensor against a direct computation about the
+    centroid, including the unit cube self-inertia."""
+    stats = label_statistics(random_segmentation)
+    inertia = inertia_tensors(stats)
+
+    for ii, label in enumerate(stats.ids):
+        points = np.argwhere(random_segmentation == label) + 0.5
+        rr = points - points.mean(axis=0)
+        gold = (np.sum(rr * rr) + len(points) / 6.0) * np.eye(3) - rr.T @ rr
+        assert np.allclose(inertia[ii], gold)
+
+
+def test_invalid_segmentation():
+    """Tests invalid segmentations raise an error."""
+    with pytest.raises(ValueError, match="must be 3D"):
+        label_statistics(np.zeros((2, 2), dtype=np.uint8))
+
+    with pytest.raises(ValueError, match="must be integer"):
+        label_statistics(np.zeros((2, 2, 2), dtype=np.float64))
+
+    with pytest.raises(ValueError, match="non-negative"):
+        label_statistics(-np.ones((2, 2, 2), dtype=np.int8))
+
+    with pytest.raises(ValueError, match="Slab size must be positive"):
+        label_statistics(np.zeros((2, 2, 2), dtype=np.uint8), slab_size=0)
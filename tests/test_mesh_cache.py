@@ -0,0 +1,151 @@
+"""This module tests the content-addressed automesh output cache.
+
+To run:
+pytest
+pytest --cov --cov-report=term-missing
+"""
+
+import sys
+
+from autosim.ssm.mesh_cache import (
+    automesh_version,
+    builtin_version,
+    is_current,
+    load_manifest,
+    mesh_key,
+    normalized_command,
+    record,
+    restore,
+    source_key,
+    write_manifest,
+)
+
+
+def _command(folder, scale="0.1"):
+    """An automesh command with files in a folder."""
+    return [
+        str(folder / "automesh"),
+        "mesh",
+        "hex",
+        "-i",
+        str(folder / "subject.npy"),
+        "-o",
+        str(folder / "subject.exo"),
+        "-r",
+        "0",
+        "--metrics",
+        str(folder / "subject.csv"),
+        "--xscale",
+        scale,
+    ]
+
+
+def test_key_ignores_locations(tmp_path):
+    """Tests the key depends on options, content, and version, but not on
+    the folders of the files."""
+    command = _command(tmp_path / "a")
+    assert normalized_command(command)[:7] == [
+        "<automesh>",
+        "mesh",
+        "hex",
+        "-i",
+        "<input>.npy",
+        "-o",
+        "<output>.exo",
+    ]
+    key = mesh_key(command, "abc", "automesh 0.3.0")
+    assert key == mesh_key(_command(tmp_path / "b"), "abc", "automesh 0.3.0")
+    assert key != mesh_key(_command(tmp_path, "0.2"), "abc", "automesh 0.3.0")
+    assert key != mesh_key(command, "abd", "automesh 0.3.0")
+    assert key != mesh_key(command, "abc", "automesh 0.3.1")
+
+
+def test_automesh_version(tmp_path):
+    """Tests the version comes from --version, or the binary hash."""
+    assert automesh_version(sys.executable).startswith("Python")
+
+    binary = tmp_path / "automesh"
+    binary.write_bytes(b"not executable")
+    assert len(automesh_version(binary)) == 40
+    assert automesh_version(tmp_path / "missing") == ""
+
+
+def test_builtin_version():
+    """Tests the built-in mesher version is the hash of voxel_mesh.py."""
+    version = builtin_version()
+    assert version.startswith("autosim.voxel_mesh ")
+    assert len(version.split()[1]) == 40
+
+
+def test_source_key(tmp_path):
+    """Tests outputs are current by their source key, once recorded with
+    it."""
+    settings = {"remove": [0], "crop": True}
+    source = source_key("abc", settings, "automesh 0.3.0")
+    assert source != source_key("abd", settings, "automesh 0.3.0")
+    assert source != source_key("abc", {"remove": [0]}, "automesh 0.3.0")
+    assert source != source_key("abc", settings, "automesh 0.3.1")
+
+    outputs = [tmp_path / "subject.inp"]
+    outputs[0].write_text("mesh")
+    manifest = {}
+    record("k1", outputs, manifest, cache=None)
+    assert not is_current(source, outputs, manifest, field="source")
+    assert restore("k1", outputs, manifest, cache=None, source=source)
+    assert is_current(source, outputs, manifest, field="source")
+    assert manifest["subject.inp"] == {
+        "key": "k1",
+        "size": 4,
+        "source": source,
+    }
+
+
+def test_skip_and_restore(tmp_path):
+    """Tests outputs are current after a recorded run, and restored from the
+    cache into a new output folder."""
+    cache = tmp_path / "cache"
+    first = tmp_path / "first"
+    first.mkdir()
+    outputs = [first / "subject.exo", first / "subject.csv"]
+    manifest = load_manifest(first)
+    assert manifest == {}
+    assert not restore("k1", outputs, manifest, cache)
+
+    outputs[0].write_text("mesh")
+    outputs[1].write_text("metrics")
+    record("k1", outputs, manifest, cache)
+    write_manifest(first, manifest)
+
+    manifest = load_manifest(first)
+    assert restore("k1", outputs, manifest, cache=None)
+    assert not restore("k2", outputs, manifest, cache)
+
+    outputs[0].write_text("truncated")  # changed output is not current
+    assert not restore("k1", outputs, manifest, cache=None)
+
+    second = tmp_path / "second"
+    moved = [second / "subject.exo", second / "subject.csv"]
+    manifest = load_manifest(second)
+    assert restore("k1", moved, manifest, cache)
+    assert moved[0].read_text() == "mesh"
+    assert moved[1].read_text() == "metrics"
+    assert manifest["subject.exo"]["key"] == "k1"
+
+
+def test_record_missing_output(tmp_path):
+    """Tests a run that misses an output is not recorded, and the manifest
+    is written without a partial file."""
+    outputs = [tmp_path / "subject.exo", tmp_path / "subject.csv"]
+    outputs[0].write_text("mesh")
+    manifest = {}
+    assert not record("k1", outputs, manifest, tmp_path / "cache")
+    assert manifest == {}
+    assert not (tmp_path / "cache").exists()
+
+    outputs[1].write_text("metrics")
+    assert record("k1", outputs, manifest, tmp_path / "cache")
+    write_manifest(tmp_path, manifest)
+    assert load_manifest(tmp_path) == manifest
+    assert [item.name for item in tmp_path.glob("*.json*")] == [
+        "mesh_manifest.json"
+    ]
@@ -0,0 +1,125 @@
+"""This module tests the bulk ODB field extraction, on a synthetic ODB.
+
+To run:
+pytest
+pytest --cov --cov-report=term-missing
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# the post-processing scripts run in Abaqus, outside the package
+sys.path.insert(0, str(Path(__file__).parents[1].joinpath("postproc")))
+
+from odb_fields import (  # noqa: E402
+    SyntheticOdb,
+    extract,
+    extract_regions,
+    histograms,
+    percentiles,
+    quantiles,
+    read_frame_values,
+    statistics,
+    synthetic_odb,
+)
+
+
+def test_extract_bulk_blocks():
+    """Tests the bulk extraction recovers every field, across blocks."""
+    odb, regions = synthetic_odb(n_frames=5, n_points=1003, block_size=100)
+    times, extracted = extract(odb)
+    assert times.tolist() == pytest.approx(np.linspace(0.0, 0.08, 5))
+    for name, values in regions["EB1"].items():
+        assert extracted[name].shape == (5, 1003)
+        assert np.array_equal(extracted[name], values)
+
+
+def test_extract_matches_values():
+    """Tests the bulk and the per-value extraction agree."""
+    odb, _ = synthetic_odb(n_frames=3, n_points=250, block_size=64)
+    _, bulk = extract(odb)
+    _, values = extract(odb, read=read_frame_values)
+    for name in bulk:
+        assert np.array_equal(bulk[name], values[name])
+
+
+def test_extract_missing_values():
+    """Tests a frame with fewer values than the first raises."""
+    fields = {"LE": np.ones((2, 10)), "ER": np.ones((2, 10))}
+    odb = SyntheticOdb({"EB1": fields}, [0.0, 1.0])
+    odb.steps["Step-1"].frames[1].fieldOutputs["LE"]._data["EB1"] = np.ones(9)
+    with pytest.raises(ValueError, match="9 values, expected 10"):
+        extract(odb)
+
+
+def test_extract_regions():
+    """Tests the fields of every element set are read in one pass."""
+    odb, regions = synthetic_odb(
+        n_frames=3, n_points=40, block_size=16, elsets=("EB1", "EB2")
+    )
+    _, fields = extract_regions(odb, ("EB1", "EB2"))
+    assert sorted(fields) == [
+        ("EB1", "ER"),
+        ("EB1", "LE"),
+        ("EB2", "ER"),
+        ("EB2", "LE"),
+    ]
+    for (elset, name), values in fields.items():
+        assert np.array_equal(values, regions[elset][name])
+
+
+def test_extract_empty_region():
+    """Tests a field without values on an element set raises."""
+    fields = {"LE": np.ones((2, 0)), "ER": np.ones((2, 0))}
+    odb = SyntheticOdb({"EB2": fields}, [0.0, 1.0])
+    with pytest.raises(ValueError, match="no values on EB2"):
+        extract(odb, elset="EB2")
+
+
+def test_percentiles():
+    """Tests the percentile of every frame."""
+    values = np.vstack([np.arange(101.0), 2.0 * np.arange(101.0)])
+    assert percentiles(values, 95).tolist() == [95.0, 190.0]
+
+
+def test_quantiles_match_percentile():
+    """Tests the partition quantiles match np.percentile."""
+    values = np.random.default_rng(0).lognormal(size=(7, 1001))
+    levels = [0.0, 0.5, 0.9, 0.95, 0.99, 0.999, 1.0]
+    expected = np.percentile(values, [100 * item for item in levels], axis=1)
+    assert np.allclose(quantiles(values, levels), expected.T)
+    assert np.allclose(
+        quantiles(values[:, :2], [0.5]), values[:, :2].mean(1)[:, None]
+    )
+
+
+@pytest.mark.parametrize("level", [-0.1, 1.5])
+def test_quantiles_invalid_level(level):
+    """Tests levels outside 0 to 1 raise an error."""
+    with pytest.raises(ValueError, match="must be from 0 to 1"):
+        quantiles(np.ones((2, 5)), [0.5, level])
+
+
+def test_histograms_match_histogram():
+    """Tests the batched histograms match np.histogram, frame by frame."""
+    values = np.random.default_rng(1).normal(size=(5, 500))
+    edges = np.linspace(-2.0, 2.0, 11)
+    values[0, 0] = 2.0  # the right edge, in the last bin
+    counts = histograms(values, edges)
+    for row, expected in zip(values, counts):
+        assert np.array_equal(np.histogram(row, edges)[0], expected)
+
+
+def test_statistics():
+    """Tests the statistics of every frame."""
+    values = np.vstack([np.arange(101.0), np.arange(101.0) + 100.0])
+    result = statistics(values, levels=(0.5, 0.95), bins=4)
+    assert result["quantiles"].tolist() == [[50.0, 95.0], [150.0, 195.0]]
+    assert result["mean"].tolist() == [50.0, 150.0]
+    assert result["max"].tolist() == [100.0, 200.0]
+    assert result["bin_edges"].tolist() == [0.0, 50.0, 100.0, 150.0, 200.0]
+    # 100 is on an inner edge, in the bin to its right, as np.histogram
+    assert result["histogram"].tolist() == [[50, 50, 1, 0], [0, 0, 50, 51]]
@@ -0,0 +1,70 @@
+"""This module tests the output request profiles of the Abaqus step.
+
+To run:
+pytest
+pytest --cov --cov-report=term-missing
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from autosim.ssm.output_profiles import (
+    apply_profile,
+    odb_size,
+    PROFILES,
+    size_report,
+    step_file,
+)
+from autosim.ssm.voxel_mesh import voxel_mesh, write_inp
+
+REPO: Path = Path(__file__).parents[1]
+STEP: Path = REPO.joinpath("abaqus_inp_files", "step_case1.inp")
+
+
+def test_full_matches_step():
+    """Tests the full profile reproduces the requests of step_case1.inp."""
+    step = STEP.read_text()
+    full = apply_profile(step, PROFILES["full"])
+    assert full.replace("** Output profile: full\n", "") == step
+
+
+def test_minimal_profile():
+    """Tests postproc-minimal writes only LE and ER on EB1, and the
+    committed step files are up to date."""
+    step = STEP.read_text()
+    minimal = apply_profile(step, PROFILES["postproc-minimal"])
+    requests = minimal[minimal.index("** OUTPUT REQUESTS") :]
+    assert "*Element Output, elset=PART-1-1.EB1, directions=YES\nLE, ER\n" in (
+        requests
+    )
+    assert "*Node Output" not in requests
+    assert "*Restart, write, number interval=1" in requests
+    assert requests.endswith("*End Step")
+    no_restart = apply_profile(step, PROFILES["postproc-norestart"])
+    assert "*Restart" not in no_restart
+
+    for name, profile in PROFILES.items():
+        assert step_file(STEP, name).read_text() == apply_profile(
+            step, profile
+        )
+
+    with pytest.raises(ValueError, match="no block"):
+        apply_profile("*Step\n*End Step", PROFILES["full"])
+
+
+def test_odb_size(tmp_path):
+    """Tests the size estimate counts the values of every frame."""
+    assert odb_size(PROFILES["full"], 81, 10, 4) == 81 * (90 + 72) * 4
+    assert odb_size(PROFILES["postproc-minimal"], 81, 10, 2) == 81 * 24 * 4
+
+    segmentation = np.ones((4, 4, 4), dtype=np.uint8)
+    segmentation[:2] = 2
+    mesh_file = tmp_path.joinpath("mesh.inp")
+    write_inp(voxel_mesh(segmentation, [], (0.001,) * 3), mesh_file)
+    full, minimal, _ = size_report(mesh_file, 0.08, list(PROFILES.values()))
+    assert full["frames"] == minimal["frames"] == 81
+    assert (full["elements"], minimal["elements"]) == (64, 32)
+    assert full["odb_mb"] == pytest.approx(81 * (125 * 9 + 64 * 18) * 4e-6)
+    assert minimal["odb_mb"] < full["odb_mb"] / 4
@@ -0,0 +1,78 @@
+"""This module tests the strain against strain rate frame renderer.
+
+To run:
+pytest
+pytest --cov --cov-report=term-missing
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+# the post-processing scripts run outside the package
+sys.path.insert(0, str(Path(__file__).parents[1].joinpath("postproc")))
+
+from plot_cloud import (  # noqa: E402
+    axis_limits,
+    render_animation,
+    render_pool,
+)
+from result_store import write_results  # noqa: E402
+
+
+def _results(folder, n_frames=5, n_points=300):
+    rng = np.random.default_rng(0)
+    strain = rng.lognormal(size=(n_frames, n_points))
+    strain_rate = rng.lognormal(size=(n_frames, n_points))
+    percentiles = np.column_stack(
+        [
+            np.percentile(strain, 95, axis=1),
+            np.percentile(strain_rate, 95, axis=1),
+        ]
+    )
+    write_results(
+        str(folder),
+        {
+            "strain": strain,
+            "strain_rate": strain_rate,
+            "percentiles_95": percentiles,
+        },
+        np.linspace(0.0, 0.004, n_frames),
+        "MAX_PRINCIPAL",
+        "PART-1-1.EB1",
+    )
+    return str(folder)
+
+
+def test_axis_limits():
+    """Tests the limits span every frame, padded by 5%."""
+    strain = np.array([[0.0, 1.0], [2.0, 0.5]])
+    strain_rate = np.array([[10.0, 20.0], [30.0, 10.0]])
+    x_limits, y_limits = axis_limits(strain, strain_rate)
+    assert np.allclose(x_limits, (9.0, 31.0))
+    assert np.allclose(y_limits, (-0.1, 2.1))
+
+
+def test_render_pool(tmp_path):
+    """Tests every frame is rendered, across workers, in frame order."""
+    results_path = _results(tmp_path.joinpath("a_results"))
+    output = tmp_path.joinpath("cloud_viz")
+    paths = render_pool(results_path, str(output), processes=2)
+    assert [Path(item).name for item in paths] == [
+        f"frame_{i:03d}.png" for i in range(5)
+    ]
+    with Image.open(paths[0]) as first, Image.open(paths[-1]) as last:
+        assert first.size == (900, 750)
+        # the points and percentile lines move from frame to frame
+        assert np.any(np.asarray(first) != np.asarray(last))
+
+
+def test_render_animation(tmp_path):
+    """Tests every frame is a frame of the animated GIF."""
+    results_path = _results(tmp_path.joinpath("a_results"), n_frames=4)
+    gif = tmp_path.joinpath("cloud.gif")
+    render_animation(results_path, str(gif), fps=5)
+    with Image.open(gif) as image:
+        assert image.n_frames == 4
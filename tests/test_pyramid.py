@@ -0,0 +1,148 @@
+"""This module tests the label-preserving block-majority pyramid.
+
+To run:
+pytest
+pytest --cov --cov-report=term-missing
+"""
+
+import numpy as np
+import pytest
+
+from autosim.ssm import pyramid
+from autosim.ssm.pyramid import (
+    RESOLUTION,
+    build_pyramid,
+    downsample_levels,
+    downsample_mode,
+    target_shape,
+    voxel_size,
+)
+from autosim.ssm.segmentation_io import write_sidecar
+
+
+def _mode_reference(segmentation, shape):
+    """Brute-force block majority with the same index assignment."""
+    maps = [
+        (np.arange(ns) * nt) // ns for ns, nt in zip(segmentation.shape, shape)
+    ]
+    result = np.empty(shape, dtype=segmentation.dtype)
+    for ii in range(shape[0]):
+        for jj in range(shape[1]):
+            for kk in range(shape[2]):
+                block = segmentation[
+                    np.ix_(maps[0] == ii, maps[1] == jj, maps[2] == kk)
+                ]
+                result[ii, jj, kk] = np.bincount(block.ravel()).argmax()
+    return result
+
+
+def test_integer_factor():
+    """Tests 2 x 2 x 2 blocks take their majority ID, ties to the smaller
+    ID."""
+    segmentation = np.zeros((4, 2, 2), dtype=np.uint8)
+    segmentation[0:2, :, :] = 3
+    segmentation[0, 0, 0] = 1  # minority in the first block
+    segmentation[2:4, :, 0] = 2  # tie with 0 in the second block
+
+    downsampled = downsample_mode(segmentation, (2, 1, 1))
+    assert downsampled.dtype == np.uint8
+    assert downsampled.ravel().tolist() == [3, 0]
+
+
+@pytest.mark.parametrize("slab_size", [1, 3, 64])
+@pytest.mark.parametrize("shape", [(7, 5, 4), (3, 3, 3), (1, 1, 1)])
+def test_non_integer_factor(slab_size, shape):
+    """Tests non-integer block sizes against a brute-force reference."""
+    rng = np.random.default_rng(seed=5)
+    segmentation = rng.integers(0, 4, size=(15, 11, 9), dtype=np.uint8)
+
+    downsampled = downsample_mode(segmentation, shape, slab_size=slab_size)
+    assert np.array_equal(downsampled, _mode_reference(segmentation, shape))
+
+
+@pytest.mark.parametrize("slab_size", [1, 4, 64])
+def test_levels_one_sweep(slab_size):
+    """Tests every level of one sweep against a brute-force reference, and
+    a level of the source shape is the source itself."""
+    rng = np.random.default_rng(seed=7)
+    segmentation = rng.integers(0, 4, size=(15, 11, 9), dtype=np.uint8)
+    segmentation[:6] = np.minimum(segmentation[:6], 1)  # fewer IDs early on
+    shapes = [(7, 5, 4), (15, 11, 9), (4, 3, 3), (1, 1, 1)]
+
+    levels = downsample_levels(segmentation, shapes, slab_size=slab_size)
+    assert levels[1] is segmentation
+    for shape, level in zip(shapes, levels):
+        assert np.array_equal(level, _mode_reference(segmentation, shape))
+
+
+@pytest.mark.parametrize("budget", [1, 50, 1 << 26])
+def test_levels_sparse_ids(budget, monkeypatch):
+    """Tests large, sparse IDs are counted by the IDs present, in parts
+    of at most the count budget, against a brute-force reference."""
+    monkeypatch.setattr(pyramid, "COUNT_BUDGET", budget)
+    rng = np.random.default_rng(seed=11)
+    ids = np.array([0, 7, 2_000, 2**40], dtype=np.int64)
+    segmentation = ids[rng.integers(0, 4, size=(15, 11, 9))]
+    segmentation[8:] = np.where(segmentation[8:] == 7, 5, segmentation[8:])
+    shapes = [(7, 5, 4), (4, 3, 3)]
+
+    levels = downsample_levels(segmentation, shapes, slab_size=4)
+    for shape, level in zip(shapes, levels):
+        _, compact = np.unique(segmentation, return_inverse=True)
+        reference = _mode_reference(compact.reshape(segmentation.shape), shape)
+        assert np.array_equal(level, np.unique(segmentation)[reference])
+
+
+def test_invalid_target_shape():
+    """Tests upsampling and empty targets raise an error."""
+    segmentation = np.zeros((4, 4, 4), dtype=np.uint8)
+    with pytest.raises(ValueError, match="must be between one voxel"):
+        downsample_mode(segmentation, (5, 4, 4))
+    with pytest.raises(ValueError, match="must be between one voxel"):
+        downsample_mode(segmentation, (0, 4, 4))
+
+
+def test_target_shape():
+    """Tests target shapes of the IXI resolutions from large."""
+    large = 1.0 / RESOLUTION["large"]
+    shape = (150, 150, 150)
+    for name, expected in (("medium", 80), ("small", 42), ("tiny", 12)):
+        target = np.full(3, 1.0 / RESOLUTION[name])
+        assert (
+            target_shape(shape, np.full(3, large), target) == (expected,) * 3
+        )
+
+
+def test_build_pyramid(tmp_path):
+    """Tests every level is written with its recorded voxel size."""
+    rng = np.random.default_rng(seed=9)
+    source = tmp_path.joinpath("subject.npy")
+    np.save(source, rng.integers(0, 3, size=(30, 30, 15), dtype=np.int64))
+
+    files = build_pyramid(source, tmp_path.joinpath("levels"), 7.5)
+    assert list(files) == list(RESOLUTION)
+
+    small = np.load(files["small"])
+    assert small.dtype == np.uint8
+    assert small.shape == (8, 8, 4)
+    assert files["small"].name == "subject_small.npy"
+    assert np.allclose(voxel_size(files["small"]), [0.5, 0.5, 0.5])
+
+    large = np.load(files["large"])
+    assert np.array_equal(large, np.load(source))
+    assert np.allclose(voxel_size(files["large"]), 1.0 / 7.5)
+
+
+def test_build_pyramid_source_voxel_size(tmp_path):
+    """Tests the voxel size in the sidecar of the source takes precedence
+    over the source resolution argument."""
+    source = tmp_path.joinpath("subject.npy")
+    np.save(source, np.ones((8, 8, 8), dtype=np.uint8))
+    write_sidecar(source, voxel_size=[0.25, 0.25, 0.25])
+
+    files = build_pyramid(
+        source, tmp_path, source_resolution=100.0, levels={"half": 2.0}
+    )
+    assert np.load(files["half"]).shape == (4, 4, 4)
+    assert np.allclose(voxel_size(files["half"]), 0.5)
+    assert voxel_size(source).tolist() == [0.25, 0.25, 0.25]
@@ -0,0 +1,157 @@
+"""This module tests the binary result store.
+
+To run:
+pytest
+pytest --cov --cov-report=term-missing
+"""
+
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# the post-processing scripts run in Abaqus, outside the package
+sys.path.insert(0, str(Path(__file__).parents[1].joinpath("postproc")))
+
+from result_store import (  # noqa: E402
+    convert_text,
+    read_header,
+    read_results,
+    results_folder,
+    write_header,
+    write_results,
+)
+
+POSTPROC: Path = Path(__file__).parents[1].joinpath("postproc")
+# the header round trip under the Python 2.7 of Abaqus, which need not have
+# NumPy, so a placeholder module stands in for it
+PYTHON2_HEADER = """
+import sys, types
+numpy = types.ModuleType("numpy")
+numpy.float32 = float
+sys.modules["numpy"] = numpy
+sys.path.insert(0, sys.argv[1])
+from result_store import read_header, write_header
+header = {"n_frames": 81, "region": u"PART-1-1.EB1", "quantiles": [0.95]}
+write_header(sys.argv[2], header)
+assert read_header(sys.argv[2]) == header
+"""
+
+
+def _python2():
+    """Return a working Python 2.7 interpreter, or None."""
+    for name in ("python2.7", "python2"):
+        path = shutil.which(name)
+        if (
+            path
+            and subprocess.run([path, "-c", "pass"], check=False).returncode
+            == 0
+        ):
+            return path
+    return None
+
+
+def _results(n_frames=4, n_points=50):
+    rng = np.random.default_rng(0)
+    strain = rng.lognormal(size=(n_frames, n_points))
+    strain_rate = rng.lognormal(size=(n_frames, n_points))
+    percentiles = np.column_stack(
+        [
+            np.percentile(strain, 95, axis=1),
+            np.percentile(strain_rate, 95, axis=1),
+        ]
+    )
+    times = np.linspace(0.0, 0.08, n_frames)
+    return strain, strain_rate, percentiles, times
+
+
+def test_write_read(tmp_path):
+    """Tests the arrays and header round trip, memory-mapped."""
+    strain, strain_rate, percentiles, times = _results()
+    folder = results_folder(str(tmp_path), "a")
+    write_results(
+        folder,
+        {
+            "strain": strain,
+            "strain_rate": strain_rate,
+            "percentiles_95": percentiles,
+        },
+        times,
+        invariant="MAX_PRINCIPAL",
+        region="PART-1-1.EB1",
+    )
+    results = read_results(folder)
+    assert results.header["n_frames"] == 4
+    assert results.header["region"] == "PART-1-1.EB1"
+    assert results.header["arrays"]["strain_rate"]["units"] == "1/s"
+    assert results.frame_times.tolist() == times.tolist()
+    assert isinstance(results.arrays["strain"], np.memmap)
+    assert results.arrays["strain"].dtype == np.float32
+    assert np.allclose(results.arrays["strain"], strain, rtol=1e-6)
+    assert np.array_equal(results.arrays["percentiles_95"], percentiles)
+
+    only = read_results(folder, ["percentiles_95"], mmap_mode=None)
+    assert list(only.arrays) == ["percentiles_95"]
+    with pytest.raises(IOError, match="No array"):
+        read_results(folder, ["stress"])
+
+
+def test_read_incomplete(tmp_path):
+    """Tests results without a header are refused."""
+    with pytest.raises(IOError, match="No results header"):
+        read_results(str(tmp_path))
+
+
+def test_convert_text(tmp_path):
+    """Tests text results convert, smaller and faster to load."""
+    strain, strain_rate, percentiles, times = _results(81, 2000)
+    prefix = str(tmp_path.joinpath("a"))
+    np.savetxt(prefix + "_strain_data.txt", strain, fmt="%.6e")
+    np.savetxt(prefix + "_strainrate_data.txt", strain_rate, fmt="%.6e")
+    np.savetxt(prefix + "_strain_percentiles_95.txt", percentiles, fmt="%.6e")
+    np.savetxt(prefix + "_frame_times.txt", times, fmt="%.8e")
+
+    folder = convert_text(str(tmp_path), "a")
+    results = read_results(folder)
+    assert results.arrays["strain"].shape == (81, 2000)
+    assert np.allclose(results.arrays["strain_rate"], strain_rate, rtol=1e-5)
+    assert np.allclose(results.frame_times, times)
+
+    text = tmp_path.joinpath("a_strain_data.txt").stat().st_size
+    binary = Path(folder).joinpath("strain.npy").stat().st_size
+    assert text > 3 * binary
+
+
+def test_convert_percentiles_only(tmp_path):
+    """Tests the full fields are optional."""
+    _, _, percentiles, times = _results()
+    prefix = str(tmp_path.joinpath("a"))
+    np.savetxt(prefix + "_strain_percentiles_95.txt", percentiles)
+    np.savetxt(prefix + "_frame_times.txt", times)
+    results = read_results(convert_text(str(tmp_path), "a"))
+    assert sorted(results.arrays) == ["percentiles_95"]
+
+    with pytest.raises(IOError):
+        convert_text(str(tmp_path), "b")
+
+
+def test_header_bytes(tmp_path):
+    """Tests the header is written as bytes, and reads back."""
+    path = tmp_path.joinpath("header.json")
+    write_header(str(path), {"n_frames": 2, "region": "PART-1-1.EB1"})
+    assert path.read_bytes().startswith(b"{")
+    assert read_header(str(path)) == {"n_frames": 2, "region": "PART-1-1.EB1"}
+
+
+@pytest.mark.skipif(_python2() is None, reason="needs Python 2.7")
+def test_header_python2(tmp_path):
+    """Tests the header round trip under Python 2.7, as abaqus python."""
+    path = tmp_path.joinpath("header.json")
+    subprocess.run(
+        [_python2(), "-c", PYTHON2_HEADER, str(POSTPROC), str(path)],
+        check=True,
+    )
+    assert read_header(str(path))["region"] == "PART-1-1.EB1"
@@ -0,0 +1,90 @@
+"""This module tests the SQLite run state of a campaign.
+
+To run:
+pytest
+pytest --cov --cov-report=term-missing
+"""
+
+from pathlib import Path
+
+import pytest
+
+from autosim.ssm.executor import JobResult
+from autosim.ssm.run_state import (
+    add_subjects,
+    connect,
+    DONE,
+    failed,
+    FAILED,
+    incomplete,
+    record_result,
+    record_stage,
+    RUNNING,
+    runs,
+    summary,
+    track,
+)
+
+
+def test_stages_and_queries(tmp_path):
+    """Tests records across stages answer what is incomplete and what
+    failed where, and survive reopening the database."""
+    path = tmp_path.joinpath("state", "run_state.sqlite")
+    connection = connect(path)
+    add_subjects(connection, ["a", "b", "c"])
+
+    record_stage(connection, "a", "submit", DONE, outputs=["42"])
+    record_result(
+        connection,
+        "b",
+        "submit",
+        JobResult("b", 2, 1.5, Path("b.log")),
+        inputs=[Path("b.inp")],
+    )
+    with track(connection, "a", "extract", inputs=["a.odb"]) as outputs:
+        outputs.append("a_strain_percentiles_95.txt")
+    connection.close()
+
+    connection = connect(path)
+    assert incomplete(connection, "submit") == ["b", "c"]
+    assert incomplete(connection, "extract") == ["b", "c"]
+    (item,) = failed(connection)
+    assert (item.subject, item.stage) == ("b", "submit")
+    assert item.inputs == ["b.inp"]
+    assert item.message == "exit status 2, see b.log"
+    assert item.ended - item.started == pytest.approx(1.5)
+
+    a = runs(connection, "a")
+    assert [run.stage for run in a] == ["submit", "extract"]
+    assert a[1].outputs == ["a_strain_percentiles_95.txt"]
+    counts = summary(connection)
+    assert counts["submit"] == {"missing": 1, DONE: 1, FAILED: 1}
+    assert counts["plot"] == {"missing": 3}
+
+    # a rerun replaces the record
+    record_stage(connection, "b", "submit", DONE)
+    assert failed(connection) == []
+
+
+def test_track_failure(tmp_path):
+    """Tests a stage that raises is recorded as failed with its error."""
+    connection = connect(tmp_path.joinpath("run_state.sqlite"))
+    with pytest.raises(RuntimeError):
+        with track(connection, "a", "plot"):
+            (run,) = runs(connection, "a")
+            assert run.status == RUNNING
+            raise RuntimeError("no percentiles")
+
+    (run,) = runs(connection, "a")
+    assert run.status == FAILED
+    assert "no percentiles" in run.message
+    assert incomplete(connection, "plot") == ["a"]
+
+
+def test_unknown_stage(tmp_path):
+    """Tests an unknown stage or status raises an error."""
+    connection = connect(tmp_path.joinpath("run_state.sqlite"))
+    with pytest.raises(ValueError, match="Unknown stage"):
+        record_stage(connection, "a", "meshing", DONE)
+    with pytest.raises(ValueError, match="Unknown status"):
+        record_stage(connection, "a", "plot", "queued")
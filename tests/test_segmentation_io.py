@@ -0,0 +1,150 @@
+"""This module tests the segmentation readers and dtype narrowing with the
+letter_f segmentation in each supported format.
+
+To run:
+pytest
+pytest --cov --cov-report=term-missing
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from autosim.ssm.segmentation_io import (
+    narrow,
+    narrowest_dtype,
+    read_segmentation,
+    read_sidecar,
+    sidecar_path,
+    write_sidecar,
+)
+
+
+@pytest.fixture(scope="module")
+def letter_f():
+    """Fixture to the segmentation data from letter_f.npy"""
+    return np.load(Path(__file__).parent.joinpath("input", "letter_f.npy"))
+
+
+def test_npy_is_memory_mapped(letter_f):
+    """Tests a uint8 .npy is returned memory mapped, without a copy."""
+    segmentation_file = Path(__file__).parent.joinpath("input", "letter_f.npy")
+    segmentation = read_segmentation(segmentation_file)
+
+    assert isinstance(segmentation, np.memmap)
+    assert segmentation.dtype == np.uint8
+    assert np.array_equal(segmentation, letter_f)
+
+
+def test_spn_with_sidecar(letter_f):
+    """Tests the letter_f.spn fixture, whose shape is in its sidecar."""
+    spn_file = Path(__file__).parent.joinpath("input", "letter_f.spn")
+    assert read_sidecar(spn_file) == {"shape": [3, 5, 1]}
+
+    segmentation = read_segmentation(spn_file)
+    assert segmentation.dtype == np.uint8
+    assert np.array_equal(segmentation, letter_f)
+
+
+def test_spn_without_shape(tmp_path):
+    """Tests a .spn without a shape or with a wrong shape raises an error."""
+    spn_file = tmp_path.joinpath("double.spn")
+    spn_file.write_text("11\n11\n")
+    with pytest.raises(ValueError, match="needs a shape"):
+        read_segmentation(spn_file)
+
+    with pytest.raises(ValueError, match="does not match shape"):
+        read_segmentation(spn_file, shape=(3, 1, 1))
+
+    segmentation = read_segmentation(spn_file, shape=(2, 1, 1))
+    assert segmentation.tolist() == [[[11]], [[11]]]
+
+
+def test_npz(tmp_path, letter_f):
+    """Tests .npz archives with one array or a named segmentation."""
+    single = tmp_path.joinpath("single.npz")
+    np.savez(single, letter_f.astype(np.int64))
+    segmentation = read_segmentation(single)
+    assert segmentation.dtype == np.uint8
+    assert np.array_equal(segmentation, letter_f)
+
+    named = tmp_path.joinpath("named.npz")
+    np.savez(named, other=np.zeros(3), segmentation=letter_f)
+    assert np.array_equal(read_segmentation(named), letter_f)
+
+    ambiguous = tmp_path.joinpath("ambiguous.npz")
+    np.savez(ambiguous, aa=letter_f, bb=letter_f)
+    with pytest.raises(ValueError, match="must contain one array"):
+        read_segmentation(ambiguous)
+
+
+@pytest.mark.parametrize("order", ["C", "F"])
+def test_raw_with_sidecar(tmp_path, letter_f, order):
+    """Tests a headerless .raw volume, with shape, dtype, and order in its
+    sidecar, is memory mapped when not narrowed."""
+    raw_file = tmp_path.joinpath("letter_f.raw")
+    # tofile() writes C order; the transpose in C order is F order
+    wide = letter_f.astype(np.int32)
+    (wide if order == "C" else wide.T).tofile(raw_file)
+    with pytest.raises(ValueError, match="needs a shape"):
+        read_segmentation(raw_file)
+
+    write_sidecar(raw_file, shape=list(letter_f.shape))
+    with pytest.raises(ValueError, match="needs a dtype"):
+        read_segmentation(raw_file)
+
+    write_sidecar(raw_file, dtype="int32", order=order)
+    assert sidecar_path(raw_file).name == "letter_f.raw.json"
+
+    wide = read_segmentation(raw_file, narrow_dtype=False)
+    assert isinstance(wide, np.memmap)
+    assert wide.dtype == np.int32
+    assert np.array_equal(wide, letter_f)
+
+    segmentation = read_segmentation(raw_file)
+    assert segmentation.dtype == np.uint8
+    assert np.array_equal(segmentation, letter_f)
+
+    write_sidecar(raw_file, dtype="int64")
+    with pytest.raises(ValueError, match="bytes, expected"):
+        read_segmentation(raw_file)
+
+
+def test_unsupported_and_missing(tmp_path):
+    """Tests unsupported suffixes and missing files raise errors."""
+    with pytest.raises(FileNotFoundError):
+        read_segmentation(tmp_path.joinpath("no_such_file.npy"))
+
+    inp_file = Path(__file__).parent.joinpath("input", "letter_f.inp")
+    with pytest.raises(ValueError, match="must be one of"):
+        read_segmentation(inp_file)
+
+
+@pytest.mark.parametrize(
+    "low, high, expected",
+    [
+        (0, 11, np.uint8),
+        (0, 255, np.uint8),
+        (0, 256, np.uint16),
+        (0, 70000, np.uint32),
+        (-1, 11, np.int8),
+        (-200, 11, np.int16),
+    ],
+)
+def test_narrowest_dtype(low, high, expected):
+    """Tests the narrowest integer type for ranges of IDs."""
+    assert narrowest_dtype(low, high) == np.dtype(expected)
+
+
+def test_narrow_in_slabs():
+    """Tests narrowing copies slab by slab and keeps narrow arrays as is."""
+    wide = np.arange(2 * 3 * 4, dtype=np.int64).reshape(2, 3, 4) * 10
+    narrowed = narrow(wide, slab_size=1)
+    assert narrowed.dtype == np.uint8
+    assert np.array_equal(narrowed, wide)
+
+    assert narrow(narrowed) is narrowed
+
+    floats = np.zeros((2, 2, 2))
+    assert narrow(floats) is floats
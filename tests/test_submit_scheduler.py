@@ -0,0 +1,98 @@
+"""This module tests the cost-aware job submission scheduler.
+
+To run:
+pytest
+pytest --cov --cov-report=term-missing
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from autosim.ssm.backends import FakeScheduler, Submission
+from autosim.ssm.explicit_cost import read_model
+from autosim.ssm.submit_scheduler import plan, run_schedule, slots_for
+from autosim.ssm.voxel_mesh import voxel_mesh, write_inp
+
+REPO: Path = Path(__file__).parents[1]
+
+
+def test_slots_for():
+    """Tests slots grow with the mesh size."""
+    assert slots_for(1) == 4
+    assert slots_for(250_000) == 4
+    assert slots_for(250_001) == 8
+    assert slots_for(5_000_000) == 16
+
+
+def test_plan_longest_first(tmp_path, capsys):
+    """Tests larger meshes are submitted first with a longer h_rt, and a
+    capped h_rt is reported."""
+    model = read_model(REPO.joinpath("base_template.inp"))
+    for name, size in (("small.inp", 3), ("large.inp", 8), ("mid.inp", 5)):
+        segmentation = np.ones((size, size, size), dtype=np.uint8)
+        write_inp(voxel_mesh(segmentation, [], (0.001,) * 3), tmp_path / name)
+
+    submissions = plan(
+        ["small.inp", "large.inp", "mid.inp"], tmp_path, model, 1e-2
+    )
+    assert [item.mesh for item in submissions] == [
+        "large.inp",
+        "mid.inp",
+        "small.inp",
+    ]
+    assert all(item.slots == 4 for item in submissions)
+    hours = [int(item.h_rt.split(":")[0]) for item in submissions]
+    assert hours == sorted(hours, reverse=True)
+    assert hours[0] == 24  # capped at the queue limit
+    assert 1 <= hours[-1] < 24
+    warnings = capsys.readouterr().out.splitlines()
+    assert len(warnings) == 1
+    assert warnings[0].startswith("Warning: large.inp is expected")
+    assert "capped at the 24 h queue limit" in warnings[0]
+    # no .npz sidecars unless asked for
+    assert list(tmp_path.glob("*.npz")) == []
+    plan(["small.inp"], tmp_path, model, 1e-2, cache=True)
+    assert [item.name for item in tmp_path.glob("*.npz")] == ["small.inp.npz"]
+
+
+def _submissions(n: int) -> list[Submission]:
+    return [
+        Submission(f"m{ii}.inp", 4, "01:00:00", float(n - ii))
+        for ii in range(n)
+    ]
+
+
+def test_keeps_jobs_in_flight():
+    """Tests a job is submitted whenever one in flight finishes."""
+    durations = {f"m{ii}.inp": 60.0 for ii in range(5)}
+    durations["m0.inp"] = 180.0
+    queue = FakeScheduler(slots=64, durations=durations)
+    polls = []
+
+    def sleep(seconds: float) -> None:
+        polls.append(seconds)
+        queue.sleep(seconds)
+
+    submitted = {}
+    job_ids = run_schedule(
+        _submissions(5),
+        queue,
+        max_in_flight=2,
+        sleep=sleep,
+        on_submit=lambda item, job_id: submitted.update({item.mesh: job_id}),
+    )
+
+    assert list(job_ids) == [f"m{ii}.inp" for ii in range(5)]
+    assert submitted == job_ids
+    assert [item.mesh for item in queue.submitted] == list(job_ids)
+    # m1 finishes at the first poll, m2 at the second, m0 at the third
+    assert len(polls) == 3
+    assert set(polls) == {60.0}
+
+
+def test_invalid_in_flight():
+    """Tests a non-positive target raises an error."""
+    with pytest.raises(ValueError, match="must be positive"):
+        run_schedule(_submissions(1), FakeScheduler(), max_in_flight=0)
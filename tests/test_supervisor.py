@@ -0,0 +1,139 @@
+"""This module tests the supervisor of job batches.
+
+To run:
+pytest
+pytest --cov --cov-report=term-missing
+"""
+
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+from autosim.ssm.executor import Job
+from autosim.ssm.supervisor import status_report, supervise
+
+REPO: Path = Path(__file__).parents[1]
+
+# Fails with status 75 until it has run a given number of times
+FLAKY = """\
+import sys
+from pathlib import Path
+count = Path(sys.argv[1])
+n = int(count.read_text()) + 1 if count.exists() else 1
+count.write_text(str(n))
+print("attempt", n)
+sys.exit(0 if n >= int(sys.argv[2]) else 75)
+"""
+
+# Detaches, then writes a file after the launching process has exited
+DETACHED = """\
+import sys
+import time
+from pathlib import Path
+from autosim.ssm.supervisor import detach
+log_file = Path(sys.argv[1])
+detach(log_file)
+time.sleep(0.5)
+print("still running")
+"""
+
+
+def _flaky(tmp_path: Path, name: str, succeeds_on: int) -> Job:
+    script = tmp_path.joinpath("flaky.py")
+    script.write_text(FLAKY)
+    return Job(
+        name=name,
+        command=[
+            sys.executable,
+            str(script),
+            str(tmp_path / f"{name}.count"),
+            str(succeeds_on),
+        ],
+        log_file=tmp_path.joinpath(name, "job.log"),
+    )
+
+
+def test_retries_with_backoff(tmp_path):
+    """Tests transient failures are retried, with a doubling backoff and a
+    log per attempt, until the retries run out."""
+    jobs = [
+        _flaky(tmp_path, "a", 1),
+        _flaky(tmp_path, "b", 2),
+        _flaky(tmp_path, "c", 9),
+    ]
+    waits = []
+    supervised = supervise(
+        jobs,
+        max_concurrent=2,
+        retries=2,
+        backoff=10.0,
+        transient={75},
+        sleep=waits.append,
+    )
+
+    assert waits == [10.0, 20.0]
+    assert [item.attempts for item in supervised] == [1, 2, 3]
+    assert [item.result.ok for item in supervised] == [True, True, False]
+    assert supervised[2].result.returncode == 75
+    assert tmp_path.joinpath("b", "job.log.retry1").read_text() == (
+        "attempt 2\n"
+    )
+
+    report = status_report(supervised)
+    assert "2 job(s) succeeded, 1 job(s) failed." in report
+    assert "  b: ok after 2 attempt(s)" in report
+    assert "  c: failed after 3 attempt(s)" in report
+
+
+def test_permanent_failure_not_retried(tmp_path):
+    """Tests a status outside the transient ones is not retried."""
+    (item,) = supervise(
+        [_flaky(tmp_path, "a", 2)],
+        max_concurrent=1,
+        transient={1},
+        sleep=pytest.fail,
+    )
+    assert item.attempts == 1
+    assert not item.result.ok
+
+
+def test_no_retry_by_default(tmp_path):
+    """Tests no failure is retried without transient statuses."""
+    (item,) = supervise(
+        [_flaky(tmp_path, "a", 2)], max_concurrent=1, sleep=pytest.fail
+    )
+    assert item.attempts == 1
+    assert item.result.returncode == 75
+
+
+def test_unique_names(tmp_path):
+    """Tests repeated job names raise an error."""
+    with pytest.raises(ValueError, match="unique"):
+        supervise([_flaky(tmp_path, "a", 1)] * 2, max_concurrent=1)
+
+
+def test_detach(tmp_path):
+    """Tests a detached program outlives its launching process."""
+    script = tmp_path.joinpath("detached.py")
+    script.write_text(DETACHED)
+    log_file = tmp_path.joinpath("batch.log")
+
+    result = subprocess.run(
+        [sys.executable, str(script), str(log_file)],
+        capture_output=True,
+        text=True,
+        timeout=10,
+        cwd=REPO,
+    )
+    assert result.returncode == 0
+    assert "Detached" in result.stdout
+
+    for _ in range(100):
+        if "still running" in log_file.read_text():
+            break
+        time.sleep(0.05)
+    assert "still running" in log_file.read_text()
+    assert tmp_path.joinpath("batch.log.pid").read_text().strip().isdigit()
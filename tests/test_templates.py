@@ -0,0 +1,108 @@
+"""This module tests the in-memory rendering of simulation decks.
+
+To run:
+pytest
+pytest --cov --cov-report=term-missing
+"""
+
+from pathlib import Path
+
+import pytest
+
+from autosim.ssm.templates import (
+    abaqus_values,
+    compile_template,
+    read_sweep,
+    read_template,
+    render,
+    RENDERED,
+    render_abaqus_sweep,
+    SSM_PLACEHOLDERS,
+    ssm_values,
+    SUBMIT_PLACEHOLDERS,
+    submit_values,
+    write_decks,
+)
+
+REPO: Path = Path(__file__).parents[1]
+SSM: Path = REPO.joinpath("src", "autosim", "ssm")
+
+
+def _replace_lines(text: str, replacements: dict[str, str]) -> str:
+    """The line-by-line replacement of mesh_to_sim.py, for reference."""
+    cc = text.split("\n")
+    for i, line in enumerate(cc):
+        for key, value in replacements.items():
+            if key in line:
+                cc[i] = line = line.replace(key, value)
+    return "\n".join(cc)
+
+
+def test_compile_and_render():
+    """Tests every occurrence of a placeholder is replaced."""
+    template = compile_template("a @X@ b @Y@ c @X@", ["@X@", "@Y@"])
+    assert template.keys == ("@X@", "@Y@", "@X@")
+    assert render(template, {"@X@": "1", "@Y@": "2"}) == "a 1 b 2 c 1"
+
+    with pytest.raises(ValueError, match="No value"):
+        render(template, {"@X@": "1"})
+    with pytest.raises(ValueError, match="not in the template"):
+        compile_template("a", ["@X@"])
+
+
+def test_ssm_templates_match_line_replacement():
+    """Tests the SSM decks match those of the line-by-line replacement."""
+    for name, placeholders, values in (
+        ("ssm_input_template.i", SSM_PLACEHOLDERS, ssm_values("IXI", 0.002)),
+        ("submit_script_template.sh", SUBMIT_PLACEHOLDERS, submit_values(32)),
+    ):
+        path = SSM.joinpath(name)
+        rendered = render(read_template(path, placeholders), values)
+        assert rendered == _replace_lines(path.read_text(), values)
+    assert "PROCS=32\n" in rendered
+
+
+def test_abaqus_sweep(tmp_path):
+    """Tests a sweep table renders a deck per job, with its material."""
+    sweep = tmp_path.joinpath("sweep.csv")
+    sweep.write_text(
+        "job,mesh,graymatter\n"
+        "a,IXI012.inp,\n"
+        "b,IXI012.inp,material_graymatter.inp\n"
+    )
+    template = read_template(
+        REPO.joinpath("base_template.inp"),
+        ["@MESHFILE@", "material_graymatter_neohookean.inp"],
+    )
+    decks = render_abaqus_sweep(template, read_sweep(sweep), tmp_path)
+    write_decks(decks)
+
+    a = tmp_path.joinpath("a", "a.inp").read_text()
+    b = tmp_path.joinpath("b", "b.inp").read_text()
+    assert a.startswith(f"{RENDERED}\n")
+    assert "INPUT=../../abaqus_mesh/IXI012.inp" in a
+    assert "material_graymatter_neohookean.inp" in a
+    assert "material_graymatter_neohookean.inp" not in b
+    assert "/material_graymatter.inp" in b
+
+
+def test_read_sweep_mesh_list(tmp_path):
+    """Tests a mesh list makes a case per mesh, named after the mesh."""
+    mesh_list = tmp_path.joinpath("mesh_list.txt")
+    mesh_list.write_text("IXI012.inp\nIXI013.inp\n")
+    cases = read_sweep(mesh_list)
+    assert [case["job"] for case in cases] == ["IXI012", "IXI013"]
+
+    with pytest.raises(ValueError, match="Unknown"):
+        abaqus_values({"mesh": "a.inp", "density": "1"})
+
+
+def test_profile_selects_step():
+    """Tests an output profile includes the step file of the profile."""
+    values = abaqus_values({"mesh": "a.inp", "profile": "postproc-minimal"})
+    assert values["step_case1.inp"] == "step_case1_postproc-minimal.inp"
+    assert abaqus_values({"mesh": "a.inp"})["step_case1.inp"] == (
+        "step_case1.inp"
+    )
+    with pytest.raises(ValueError, match="Unknown output profile"):
+        abaqus_values({"mesh": "a.inp", "profile": "tiny"})
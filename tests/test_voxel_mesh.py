@@ -0,0 +1,82 @@
+"""This module tests the NumPy hex mesher against automesh output.
+
+To run:
+pytest
+pytest --cov --cov-report=term-missing
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+import autosim.ssm.voxel_mesh as vm
+from autosim.ssm.voxel_mesh import voxel_mesh, write_inp
+
+INPUT: Path = Path(__file__).parent.joinpath("input")
+
+
+@pytest.mark.parametrize("name", ["letter_f", "double"])
+def test_matches_automesh(tmp_path, name):
+    """Tests the .inp file matches automesh, after the header."""
+    segmentation = np.load(INPUT.joinpath(f"{name}.npy"))
+    output_file = tmp_path.joinpath(f"{name}.inp")
+    write_inp(voxel_mesh(segmentation, []), output_file)
+
+    lines = output_file.read_text().splitlines()
+    known = INPUT.joinpath(f"{name}.inp").read_text().splitlines()
+    assert lines[:2] == ["*HEADING", "autotwin.autosim"]
+    assert lines[4:] == known[4:]
+
+
+def test_remove_scale_translate():
+    """Tests removed IDs leave no elements or unused nodes, and nodes are
+    scaled, then translated."""
+    segmentation = np.load(INPUT.joinpath("letter_f.npy"))
+    mesh = voxel_mesh(
+        segmentation, [0], scale=(0.5, 2.0, 1.0), translate=(1.0, 0.0, -1.0)
+    )
+
+    assert mesh.blocks.tolist() == [11] * 8
+    assert mesh.element_ids.tolist() == list(range(1, 9))
+    assert np.unique(mesh.connectivity).tolist() == list(
+        range(1, len(mesh.coordinates) + 1)
+    )
+    # first element: voxel (0, 0, 0)
+    first = mesh.coordinates[mesh.connectivity[0] - 1]
+    assert first[0].tolist() == [1.0, 0.0, -1.0]
+    assert first[6].tolist() == [1.5, 2.0, 0.0]
+
+
+def test_chunked_writing(tmp_path, monkeypatch):
+    """Tests writing in small chunks gives the same file body."""
+    rng = np.random.default_rng(seed=3)
+    segmentation = rng.integers(0, 4, size=(6, 5, 4), dtype=np.uint8)
+    mesh = voxel_mesh(
+        segmentation, [0], scale=(0.13, 0.13, 0.13), translate=(-0.4, 0, 2)
+    )
+
+    write_inp(mesh, tmp_path.joinpath("whole.inp"))
+    monkeypatch.setattr(vm, "CHUNK_SIZE", 7)
+    write_inp(mesh, tmp_path.joinpath("chunked.inp"))
+
+    whole = tmp_path.joinpath("whole.inp").read_text().splitlines()
+    chunked = tmp_path.joinpath("chunked.inp").read_text().splitlines()
+    assert whole[4:] == chunked[4:]
+    assert "*ELEMENT, TYPE=C3D8R, ELSET=EB3" in whole
+    assert "*ELEMENT, TYPE=C3D8R, ELSET=EB0" not in whole
+
+    # the nodes read back as written, in the automesh float format
+    start = whole.index("*NODE, NSET=ALLNODES") + 1
+    rows = whole[start : start + len(mesh.coordinates)]
+    values = np.array([[float(x) for x in row.split(",")] for row in rows])
+    assert np.allclose(values[:, 1:], mesh.coordinates, rtol=1e-6)
+    assert all("e+" not in row for row in rows)
+
+
+def test_invalid_segmentation():
+    """Tests a non-3D segmentation or one without kept IDs raises."""
+    with pytest.raises(ValueError, match="must be 3D"):
+        voxel_mesh(np.zeros((2, 2), dtype=np.uint8), [])
+    with pytest.raises(ValueError, match="does not include valid IDs"):
+        voxel_mesh(np.zeros((2, 2, 2), dtype=np.uint8), [0])